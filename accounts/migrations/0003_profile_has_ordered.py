@@ -0,0 +1,35 @@
+"""
+Adds UserProfile.has_ordered and backfills it from the existing orders,
+so customers who ordered before the flag existed aren't offered the
+first-order promo again.
+"""
+
+from django.db import migrations, models
+
+
+def backfill_has_ordered(apps, schema_editor):
+    UserProfile = apps.get_model("accounts", "UserProfile")
+    Order = apps.get_model("orders", "Order")
+    UserProfile.objects.filter(
+        user_id__in=Order.objects.filter(user__isnull=False).values("user_id")
+    ).update(has_ordered=True)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("accounts", "0002_saved_basket"),
+        ("orders", "0010_order_indexes"),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name="userprofile",
+            name="has_ordered",
+            field=models.BooleanField(
+                default=False,
+                help_text="Set with the customer's first order; ends first-order promo eligibility.",
+            ),
+        ),
+        migrations.RunPython(backfill_has_ordered, reverse_code=migrations.RunPython.noop),
+    ]
@@ -34,6 +34,10 @@ class UserProfile(models.Model):
         default="",
         help_text="JSON snapshot of basket saved on logout."
     )
+    has_ordered = models.BooleanField(
+        default=False,
+        help_text="Set with the customer's first order; ends first-order promo eligibility."
+    )
     created_at = models.DateTimeField(auto_now_add=True)
 
     def __str__(self):
@@ -0,0 +1,263 @@
+"""
+Two-tier cache backend: a small in-process LRU in front of DatabaseCache.
+
+Every cache read on the stock DatabaseCache is a SQL query against the same
+Postgres that takes orders. TieredCache keeps hot, read-mostly keys — the
+menu snapshot and cards, opening hours, the announcement banner, the
+first-order promo — in a bounded per-process LRU so they stop reaching the
+database after the first hit. Only keys starting with one of
+``LOCAL_PREFIXES`` are held locally; everything else (dashboard stats,
+...) goes straight to the database exactly as before.
+
+Writes are write-through: the value is stored in the database first, then
+in the local tier. Each locally held key has its own *stamp* — a random
+token stored in the database next to it and read in the same query as the
+value. Writing a key gives it a fresh stamp and deleting it deletes the
+stamp, so only that key's copies go stale; everything else in the local
+tier stays put. Each process re-reads the stamps of the keys it holds in
+one query at most every ``STAMP_INTERVAL`` seconds and drops the entries
+whose stamp has changed, so a change made by another worker is seen within
+that interval.
+
+Because it subclasses DatabaseCache, ``createcachetable`` still creates the
+backing table. Per-process hit/miss counters are available from
+``cache.stats()`` and the staff-only ``/ops/cache-stats/`` endpoint.
+
+Settings::
+
+    CACHES = {"default": {
+        "BACKEND": "despair.cache.TieredCache",
+        "LOCATION": "django_cache",
+        "OPTIONS": {
+            "LOCAL_PREFIXES": ["menu:", "hours:", "announcement:", "promo:"],
+            "LOCAL_MAX_ENTRIES": 1000,   # LRU size
+            "LOCAL_TIMEOUT": 300,        # max seconds an entry lives locally
+            "STAMP_INTERVAL": 1,         # seconds between stamp checks
+        },
+    }}
+"""
+
+import pickle
+import threading
+import time
+import uuid
+from collections import OrderedDict
+
+from django.core.cache.backends.base import DEFAULT_TIMEOUT
+from django.core.cache.backends.db import DatabaseCache
+
+STAMP_KEY = "tiered:stamp:{key}"
+
+
+class TieredCache(DatabaseCache):
+    def __init__(self, table, params):
+        params = dict(params)
+        options = dict(params.get("OPTIONS", {}))
+        self.local_prefixes = tuple(options.pop("LOCAL_PREFIXES", ()))
+        self.local_max_entries = int(options.pop("LOCAL_MAX_ENTRIES", 1000))
+        self.local_timeout = float(options.pop("LOCAL_TIMEOUT", 300))
+        self.stamp_interval = float(options.pop("STAMP_INTERVAL", 1))
+        params["OPTIONS"] = options
+        super().__init__(table, params)
+        self._lock = threading.RLock()
+        self._local = OrderedDict()   # full key -> (stamp key, stamp, expires_at, pickled value)
+        self._stamps_checked = time.monotonic()
+        self._stats = dict.fromkeys(
+            ("local_hits", "shared_hits", "misses", "stamp_checks", "evictions"), 0
+        )
+
+    # ── Local tier helpers ────────────────────────────────────────────
+
+    def _is_local(self, key):
+        return key.startswith(self.local_prefixes)
+
+    def _count(self, name, n=1):
+        with self._lock:
+            self._stats[name] += n
+
+    def _stamp_key(self, key, version=None):
+        return STAMP_KEY.format(key=self.make_and_validate_key(key, version=version))
+
+    def _new_stamps(self, keys, timeout, version=None):
+        """A write to these keys: give each a fresh stamp so every process drops its copy."""
+        stamps = {key: uuid.uuid4().hex for key in keys}
+        for key, stamp in stamps.items():
+            DatabaseCache.set(self, self._stamp_key(key, version), stamp, timeout)
+        return stamps
+
+    def _revalidate(self):
+        """
+        At most every STAMP_INTERVAL, re-read the stamps of everything held
+        locally in one query and drop the entries whose stamp has changed or gone.
+        """
+        now = time.monotonic()
+        with self._lock:
+            if now - self._stamps_checked < self.stamp_interval:
+                return
+            self._stamps_checked = now
+            held = {full_key: entry[:2] for full_key, entry in self._local.items()}
+            self._stats["stamp_checks"] += 1
+        if not held:
+            return
+        current = DatabaseCache.get_many(self, list({stamp_key for stamp_key, _ in held.values()}))
+        stale = [
+            full_key for full_key, (stamp_key, stamp) in held.items()
+            if current.get(stamp_key) != stamp
+        ]
+        self._local_discard(stale)
+
+    def _fetch(self, keys, version=None):
+        """
+        Read values and their stamps together in one query. A value found
+        without a stamp (evicted or never written through this backend)
+        gets one, so it can still be invalidated.
+        """
+        stamp_keys = {key: self._stamp_key(key, version) for key in keys}
+        found = DatabaseCache.get_many(self, list(keys) + list(stamp_keys.values()), version=version)
+        values = {}
+        for key in keys:
+            if key not in found:
+                continue
+            stamp = found.get(stamp_keys[key])
+            if stamp is None:
+                stamp = uuid.uuid4().hex
+                if not DatabaseCache.add(self, stamp_keys[key], stamp):
+                    stamp = DatabaseCache.get(self, stamp_keys[key]) or stamp
+            values[key] = (found[key], stamp)
+        return values, stamp_keys
+
+    def _local_get(self, full_key):
+        with self._lock:
+            entry = self._local.get(full_key)
+            if entry is None:
+                return None
+            if entry[2] <= time.monotonic():
+                del self._local[full_key]
+                return None
+            self._local.move_to_end(full_key)
+            data = entry[3]
+        # Stored pickled, like LocMemCache, so callers can't mutate the cached copy
+        return pickle.loads(data)
+
+    def _local_set(self, full_key, stamp_key, stamp, value, timeout):
+        timeout = self.get_backend_timeout(timeout)
+        ttl = self.local_timeout if timeout is None else min(self.local_timeout, timeout - time.time())
+        if ttl <= 0:
+            return
+        data = pickle.dumps(value, self.pickle_protocol)
+        with self._lock:
+            self._local[full_key] = (stamp_key, stamp, time.monotonic() + ttl, data)
+            self._local.move_to_end(full_key)
+            while len(self._local) > self.local_max_entries:
+                self._local.popitem(last=False)
+                self._stats["evictions"] += 1
+
+    def _local_discard(self, full_keys):
+        with self._lock:
+            for full_key in full_keys:
+                self._local.pop(full_key, None)
+
+    # ── Cache API ─────────────────────────────────────────────────────
+
+    def get(self, key, default=None, version=None):
+        return self.get_many([key], version=version).get(key, default)
+
+    def get_many(self, keys, version=None):
+        keys = list(keys)
+        if not keys:
+            return {}
+        local_keys = [key for key in keys if self._is_local(key)]
+        if local_keys:
+            self._revalidate()
+        result = {}
+        for key in local_keys:
+            value = self._local_get(self.make_and_validate_key(key, version=version))
+            if value is not None:
+                result[key] = value
+        self._count("local_hits", len(result))
+        misses = [key for key in local_keys if key not in result]
+        if misses:
+            values, stamp_keys = self._fetch(misses, version)
+            for key, (value, stamp) in values.items():
+                full_key = self.make_and_validate_key(key, version=version)
+                self._local_set(full_key, stamp_keys[key], stamp, value, self.local_timeout)
+                result[key] = value
+            self._count("shared_hits", len(values))
+            self._count("misses", len(misses) - len(values))
+        shared_keys = [key for key in keys if not self._is_local(key)]
+        if shared_keys:
+            found = DatabaseCache.get_many(self, shared_keys, version=version)
+            self._count("shared_hits", len(found))
+            self._count("misses", len(shared_keys) - len(found))
+            result.update(found)
+        return result
+
+    def set(self, key, value, timeout=DEFAULT_TIMEOUT, version=None):
+        self.set_many({key: value}, timeout, version=version)
+
+    def set_many(self, data, timeout=DEFAULT_TIMEOUT, version=None):
+        # Value first, then its new stamp: a reader that fetches both in
+        # between gets the new value under the old stamp, and drops it on
+        # the next stamp check
+        for key, value in data.items():
+            DatabaseCache.set(self, key, value, timeout, version=version)
+        local = {key: value for key, value in data.items() if self._is_local(key)}
+        stamps = self._new_stamps(local, timeout, version)
+        for key, value in local.items():
+            full_key = self.make_and_validate_key(key, version=version)
+            self._local_set(full_key, self._stamp_key(key, version), stamps[key], value, timeout)
+        return []
+
+    def add(self, key, value, timeout=DEFAULT_TIMEOUT, version=None):
+        added = DatabaseCache.add(self, key, value, timeout, version=version)
+        if added and self._is_local(key):
+            self._local_discard([self.make_and_validate_key(key, version=version)])
+            self._new_stamps([key], timeout, version)
+        return added
+
+    def touch(self, key, timeout=DEFAULT_TIMEOUT, version=None):
+        self._local_discard([self.make_and_validate_key(key, version=version)])
+        return DatabaseCache.touch(self, key, timeout, version=version)
+
+    def delete(self, key, version=None):
+        deleted = DatabaseCache.delete(self, key, version=version)
+        if self._is_local(key):
+            self._local_discard([self.make_and_validate_key(key, version=version)])
+            DatabaseCache.delete(self, self._stamp_key(key, version))
+        return deleted
+
+    def delete_many(self, keys, version=None):
+        keys = list(keys)
+        DatabaseCache.delete_many(self, keys, version=version)
+        local = [key for key in keys if self._is_local(key)]
+        if local:
+            self._local_discard([self.make_and_validate_key(key, version=version) for key in local])
+            DatabaseCache.delete_many(self, [self._stamp_key(key, version) for key in local])
+
+    def has_key(self, key, version=None):
+        return DatabaseCache.has_key(self, key, version=version)
+
+    def incr(self, key, delta=1, version=None):
+        # BaseCache.incr reads through self.get(); always read the shared value
+        value = DatabaseCache.get(self, key, version=version)
+        if value is None:
+            raise ValueError("Key '%s' not found" % key)
+        new_value = value + delta
+        self.set(key, new_value, version=version)
+        return new_value
+
+    def clear(self):
+        DatabaseCache.clear(self)
+        with self._lock:
+            self._local.clear()
+
+    # ── Monitoring ────────────────────────────────────────────────────
+
+    def stats(self):
+        """This process's counters plus the current LRU size."""
+        with self._lock:
+            stats = dict(self._stats)
+            stats["local_entries"] = len(self._local)
+        lookups = stats["local_hits"] + stats["shared_hits"] + stats["misses"]
+        stats["local_hit_ratio"] = round(stats["local_hits"] / lookups, 3) if lookups else None
+        return stats
@@ -156,11 +156,38 @@ MODELTRANSLATION_LANGUAGES = ("en", "zh-hans")
 # ---------------------------------------------------------------------------
 CACHES = {
     "default": {
-        "BACKEND": "django.core.cache.backends.db.DatabaseCache",
+        # DatabaseCache with an in-process LRU in front for hot keys (despair/cache.py)
+        "BACKEND": "despair.cache.TieredCache",
         "LOCATION": "django_cache",
+        "OPTIONS": {
+            "LOCAL_PREFIXES": ["menu:", "hours:", "announcement:", "promo:", "reviews:"],
+            "LOCAL_MAX_ENTRIES": 1000,
+            "LOCAL_TIMEOUT": 300,
+            "STAMP_INTERVAL": 1,
+            # Once the table holds this many rows, each write culls
+            # 1/CULL_FREQUENCY of them, whatever the key — keep it well clear
+            # of the working set (checkout tokens, rate-limit counters, stamps)
+            "MAX_ENTRIES": 10000,
+            "CULL_FREQUENCY": 3,
+        },
     }
 }
 
+
+# ---------------------------------------------------------------------------
+# Basket — logged-in basket changes are written to UserProfile.saved_basket
+# at most once per this many seconds; pending changes are flushed on
+# logout and checkout (orders/signals.py)
+# ---------------------------------------------------------------------------
+BASKET_SYNC_WINDOW = 30
+
+# ---------------------------------------------------------------------------
+# Background tasks — post-order side effects are queued in the database and
+# run by a thread in each web process after the order commits. Set False to
+# leave them to `manage.py run_tasks` alone (orders/tasks.py)
+# ---------------------------------------------------------------------------
+BACKGROUND_TASKS_IN_PROCESS = True
+
 # Static & media files
 # ---------------------------------------------------------------------------
 STATIC_URL = "/static/"
@@ -0,0 +1,88 @@
+"""
+Unit tests for the project-level helpers in the despair package: the
+two-tier cache backend.
+"""
+
+from django.contrib.auth.models import User
+from django.core.cache.backends.db import DatabaseCache
+from django.test import TestCase
+
+from despair.cache import TieredCache
+
+
+# ---------------------------------------------------------------------------
+# Two-tier cache (in-process LRU in front of the database cache)
+# ---------------------------------------------------------------------------
+
+def make_tiered_cache(**options):
+    options.setdefault("LOCAL_PREFIXES", ["menu:"])
+    return TieredCache("django_cache", {"OPTIONS": options})
+
+
+class TieredCacheTest(TestCase):
+    def test_hot_key_served_locally_after_first_hit(self):
+        tiered = make_tiered_cache(STAMP_INTERVAL=60)
+        tiered.set("menu:snapshot:en:1", {"items": 3})
+        with self.assertNumQueries(0):
+            self.assertEqual(tiered.get("menu:snapshot:en:1"), {"items": 3})
+        self.assertEqual(tiered.stats()["local_hits"], 1)
+
+    def test_other_keys_always_read_the_database(self):
+        tiered = make_tiered_cache(STAMP_INTERVAL=60)
+        tiered.set("rl:checkout:1.2.3.4:1", 2)
+        with self.assertNumQueries(1):
+            self.assertEqual(tiered.get("rl:checkout:1.2.3.4:1"), 2)
+
+    def test_write_in_another_process_invalidates_local_copy(self):
+        # Two instances stand in for two gunicorn workers sharing the table
+        worker_a = make_tiered_cache(STAMP_INTERVAL=0)
+        worker_b = make_tiered_cache(STAMP_INTERVAL=0)
+        worker_a.set("menu:version", 1)
+        self.assertEqual(worker_a.get("menu:version"), 1)
+        worker_b.incr("menu:version")
+        self.assertEqual(worker_a.get("menu:version"), 2)
+
+    def test_write_leaves_other_local_keys_alone(self):
+        worker_a = make_tiered_cache(STAMP_INTERVAL=0)
+        worker_b = make_tiered_cache(STAMP_INTERVAL=0)
+        worker_a.set("menu:snapshot:en:1", {"items": 3})
+        worker_b.set("menu:cards:en:1:public", {1: "<div></div>"})
+        with self.assertNumQueries(1):  # just the stamp check
+            self.assertEqual(worker_a.get("menu:snapshot:en:1"), {"items": 3})
+        self.assertEqual(worker_a.stats()["local_hits"], 1)
+
+    def test_delete_in_another_process_invalidates_local_copy(self):
+        worker_a = make_tiered_cache(STAMP_INTERVAL=0)
+        worker_b = make_tiered_cache(STAMP_INTERVAL=0)
+        worker_a.set("menu:version", 1)
+        worker_b.delete("menu:version")
+        self.assertIsNone(worker_a.get("menu:version"))
+
+    def test_value_without_stamp_gets_one(self):
+        worker_a = make_tiered_cache(STAMP_INTERVAL=0)
+        worker_b = make_tiered_cache(STAMP_INTERVAL=0)
+        DatabaseCache.set(worker_b, "menu:version", 1)
+        self.assertEqual(worker_a.get("menu:version"), 1)
+        worker_b.set("menu:version", 2)
+        self.assertEqual(worker_a.get("menu:version"), 2)
+
+    def test_cached_values_cannot_be_mutated_by_callers(self):
+        tiered = make_tiered_cache()
+        tiered.set("menu:list", [1, 2])
+        tiered.get("menu:list").append(3)
+        self.assertEqual(tiered.get("menu:list"), [1, 2])
+
+    def test_lru_is_bounded(self):
+        tiered = make_tiered_cache(LOCAL_MAX_ENTRIES=2)
+        tiered.set_many({f"menu:card:{i}": i for i in range(3)})
+        stats = tiered.stats()
+        self.assertEqual(stats["local_entries"], 2)
+        self.assertEqual(stats["evictions"], 1)
+
+    def test_stats_endpoint_is_staff_only(self):
+        self.assertEqual(self.client.get("/ops/cache-stats/").status_code, 302)
+        User.objects.create_user(username="ops", password="pass123", is_staff=True)
+        self.client.login(username="ops", password="pass123")
+        response = self.client.get("/ops/cache-stats/")
+        self.assertEqual(response.json()["backend"], "TieredCache")
+        self.assertIn("local_hits", response.json()["stats"])
@@ -11,6 +11,7 @@ from django.conf.urls.static import static
 from django.conf.urls.i18n import i18n_patterns
 from django.contrib.sitemaps.views import sitemap
 from .sitemaps import sitemaps
+from .views import cache_stats
 
 # Custom 403 / 404 handlers (must be at module level, NOT inside i18n_patterns)
 handler403 = "despair.views.handler403"
@@ -25,6 +26,8 @@ urlpatterns = [
     ), name="robots_txt"),
     path("sitemap.xml", sitemap, {"sitemaps": sitemaps},
          name="django.contrib.sitemaps.views.sitemap"),
+    # Staff-only monitoring: per-worker cache tier counters
+    path("ops/cache-stats/", cache_stats, name="cache_stats"),
 ]
 
 # i18n_patterns adds /en/ or /zh-hans/ prefix automatically
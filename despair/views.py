@@ -1,6 +1,9 @@
 """
-Project-level views — custom error handlers.
+Project-level views — custom error handlers and ops endpoints.
 """
+from django.contrib.admin.views.decorators import staff_member_required
+from django.core.cache import caches
+from django.http import JsonResponse
 from django.shortcuts import render
 
 
@@ -10,3 +13,11 @@ def handler403(request, exception=None):
 
 def handler404(request, exception=None):
     return render(request, "404.html", status=404)
+
+
+@staff_member_required
+def cache_stats(request):
+    """Hit/miss counters for this worker's in-process cache tier (see despair/cache.py)."""
+    cache = caches["default"]
+    stats = cache.stats() if hasattr(cache, "stats") else {}
+    return JsonResponse({"backend": type(cache).__name__, "stats": stats})
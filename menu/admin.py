@@ -8,6 +8,7 @@ from django.db.models import Count
 from django.utils.html import format_html
 from modeltranslation.admin import TranslationAdmin, TranslationTabularInline
 from .models import Category, MenuItem, DealSlot
+from .snapshot import menu_changed
 
 
 class MenuItemInline(TranslationTabularInline):
@@ -36,12 +37,14 @@ class CategoryAdmin(TranslationAdmin):
 @admin.action(description="Mark selected items as Sold Out")
 def mark_sold_out(modeladmin, request, queryset):
     updated = queryset.update(is_available=False)
+    menu_changed()  # queryset.update() skips the post_save signal
     modeladmin.message_user(request, f"{updated} item(s) marked as sold out.")
 
 
 @admin.action(description="Mark selected items as Available")
 def mark_available(modeladmin, request, queryset):
     updated = queryset.update(is_available=True)
+    menu_changed()
     modeladmin.message_user(request, f"{updated} item(s) marked as available.")
 
 
@@ -0,0 +1,108 @@
+"""
+Management command: bench_menu_render
+
+Measures how long the menu item cards take to render for a synthetic menu,
+comparing the old inline render (every card rendered on every request) with
+the cached card fragments served by menu.snapshot.render_menu_cards.
+
+The synthetic menu is created inside a transaction that is always rolled
+back, and a private in-memory cache is used, so nothing touches real data.
+
+Usage:
+    python manage.py bench_menu_render               # 150 items, 20 runs
+    python manage.py bench_menu_render --items 300 --runs 50
+"""
+
+import statistics
+import time
+from decimal import Decimal
+
+from django.core.management.base import BaseCommand
+from django.db import transaction
+from django.template import engines
+from django.test.utils import override_settings
+from django.utils import translation
+
+from menu.models import Category, MenuItem
+from menu.snapshot import get_menu_snapshot, render_menu_cards
+
+BENCH_CACHES = {
+    "default": {
+        "BACKEND": "django.core.cache.backends.locmem.LocMemCache",
+        "LOCATION": "bench-menu-render",
+    }
+}
+
+# Same loop the menu page used before cards were cached
+INLINE_TEMPLATE = (
+    "{% for category, items in categories %}{% for item in items %}"
+    '{% include "menu/_item_card.html" %}'
+    "{% endfor %}{% endfor %}"
+)
+
+
+class Command(BaseCommand):
+    help = "Benchmark menu card rendering before/after the fragment cache."
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--items", type=int, default=150,
+            help="Number of synthetic menu items (default: 150)."
+        )
+        parser.add_argument(
+            "--runs", type=int, default=20,
+            help="Timed runs per scenario (default: 20)."
+        )
+
+    def handle(self, *args, **options):
+        n_items = options["items"]
+        runs = options["runs"]
+
+        with override_settings(CACHES=BENCH_CACHES), translation.override("en"):
+            with transaction.atomic():
+                self._seed(n_items)
+                snapshot = get_menu_snapshot()
+                inline = engines["django"].from_string(INLINE_TEMPLATE)
+
+                before = self._time(runs, lambda: inline.render({
+                    "categories": snapshot.categories, "is_staff": False,
+                }))
+                cold = self._time(1, lambda: render_menu_cards(snapshot))
+                after = self._time(runs, lambda: render_menu_cards(snapshot))
+                transaction.set_rollback(True)
+
+        self.stdout.write(f"Menu card render — {n_items} items, {runs} runs (median ms)")
+        self.stdout.write(f"  before (inline render every request): {before:8.2f}")
+        self.stdout.write(f"  after, cold cache (first request):    {cold:8.2f}")
+        self.stdout.write(f"  after, warm cache (steady state):     {after:8.2f}")
+        if after:
+            self.stdout.write(self.style.SUCCESS(f"Speed-up: {before / after:.1f}x"))
+
+    def _seed(self, n_items):
+        """Create n_items spread across eight categories, with some variety."""
+        categories = [
+            Category.objects.create(name=f"Bench Category {i}", order=900 + i)
+            for i in range(8)
+        ]
+        MenuItem.objects.bulk_create([
+            MenuItem(
+                category=categories[i % len(categories)],
+                name=f"Bench Dish {i}",
+                description="Wok-fried with spring onion, ginger and a touch of chilli oil.",
+                price=Decimal("6.50") + i % 7,
+                spice_level=i % 4,
+                is_vegetarian=i % 3 == 0,
+                is_popular=i % 10 == 0,
+                is_available=i % 15 != 0,
+                allergens="gluten, soy, sesame" if i % 2 else "",
+            )
+            for i in range(n_items)
+        ])
+
+    def _time(self, runs, fn):
+        samples = []
+        for _ in range(runs):
+            start = time.perf_counter()
+            fn()
+            samples.append((time.perf_counter() - start) * 1000)
+        return statistics.median(samples)
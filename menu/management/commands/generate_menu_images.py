@@ -17,6 +17,7 @@ from django.conf import settings
 from django.core.management.base import BaseCommand
 
 from menu.models import MenuItem
+from menu.snapshot import bump_menu_version
 
 # ── Per-category theme ──────────────────────────────────────────────────────
 # keyword → (bg_dark, bg_light, accent_hex, label)
@@ -286,6 +287,8 @@ class Command(BaseCommand):
                 self.stderr.write(f"  ✗ Upload failed for {item.name}: {e}")
                 fail += 1
 
+        if ok and not options["dry_run"]:
+            bump_menu_version()  # update() skips the menu signals
         self.stdout.write(
             self.style.SUCCESS(f"\nDone: {ok} uploaded, {fail} failed.")
         )
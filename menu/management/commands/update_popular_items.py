@@ -1,28 +1,32 @@
 """
 Management command: update_popular_items
 
-Recalculates which menu items are marked as 'popular' based on how often
-they appear in completed orders over the past 90 days.
+Recalculates which menu items are marked as 'popular' based on how much
+they were ordered over the past 90 days.
 
-The top N items (default 8) by order frequency are flagged is_popular=True;
-all others are set to False.
+Items are scored from the per-item daily counters (MenuItemDailyStat, kept
+up to date as orders are placed — see orders/popularity.py), by order
+lines (default), quantity or revenue. The top N items (default 8) are
+flagged is_popular=True and the rest False, but only rows whose flag
+actually changes are written; if none do, the menu cache is left alone.
 
 Usage:
-    python manage.py update_popular_items          # marks top 8
-    python manage.py update_popular_items --top 5  # marks top 5
+    python manage.py update_popular_items                  # marks top 8
+    python manage.py update_popular_items --top 5          # marks top 5
     python manage.py update_popular_items --days 30
+    python manage.py update_popular_items --rank-by revenue
 
 Run this from the Heroku scheduler (daily) or call it manually from the
 admin shell to refresh badges on the menu.
 """
 
-from django.core.management.base import BaseCommand
-from django.db.models import Count
-from django.utils import timezone
-from datetime import timedelta
+import time
+
+from django.core.management.base import BaseCommand, CommandError
 
 from menu.models import MenuItem
-from orders.models import OrderItem
+from menu.snapshot import bump_menu_version
+from orders.popularity import RANK_FIELDS, popular_item_ids
 
 
 class Command(BaseCommand):
@@ -37,30 +41,42 @@ class Command(BaseCommand):
             "--days", type=int, default=90,
             help="Look back this many days when counting orders (default: 90)."
         )
+        parser.add_argument(
+            "--rank-by", choices=sorted(RANK_FIELDS), default="orders",
+            help="Rank by order lines, quantity sold or revenue (default: orders)."
+        )
 
     def handle(self, *args, **options):
         top_n = options["top"]
         days = options["days"]
-        since = timezone.now() - timedelta(days=days)
+        rank_by = options["rank_by"]
+        if top_n < 0:
+            raise CommandError("--top must not be negative.")
+        if days < 1:
+            raise CommandError("--days must be at least 1.")
 
-        # Count how many order items reference each MenuItem in the window
-        top_ids = (
-            OrderItem.objects
-            .filter(order__created_at__gte=since)
-            .values("menu_item_id")
-            .annotate(cnt=Count("id"))
-            .order_by("-cnt")[:top_n]
-            .values_list("menu_item_id", flat=True)
-        )
-        top_ids = list(top_ids)
+        started = time.perf_counter()
+        top_ids = set(popular_item_ids(top_n, days, rank_by))
+        current_ids = set(MenuItem.objects.filter(is_popular=True).values_list("pk", flat=True))
+        scored = time.perf_counter()
 
-        # Mark popular / unpopular
-        marked = MenuItem.objects.filter(pk__in=top_ids).update(is_popular=True)
-        cleared = MenuItem.objects.exclude(pk__in=top_ids).update(is_popular=False)
+        # Only touch the items whose flag changes
+        marked = cleared = 0
+        if top_ids - current_ids:
+            marked = MenuItem.objects.filter(pk__in=top_ids - current_ids).update(is_popular=True)
+        if current_ids - top_ids:
+            cleared = MenuItem.objects.filter(pk__in=current_ids - top_ids).update(is_popular=False)
+        if marked or cleared:
+            bump_menu_version()  # bulk updates bypass the menu signals
+        finished = time.perf_counter()
 
         self.stdout.write(
             self.style.SUCCESS(
-                f"Updated popular items: {marked} marked popular, {cleared} cleared "
-                f"(top {top_n} over last {days} days)."
+                f"Updated popular items: {marked} marked popular, {cleared} cleared, "
+                f"{len(top_ids & current_ids)} unchanged (top {top_n} by {rank_by} over last {days} days)."
             )
         )
+        self.stdout.write(
+            f"Scored in {(scored - started) * 1000:.1f} ms, "
+            f"updated in {(finished - scored) * 1000:.1f} ms."
+        )
@@ -0,0 +1,32 @@
+"""
+Menu cache invalidation.
+Any save or delete of a MenuItem, Category or DealSlot (including admin
+list_editable changes and inline edits) bumps the menu version so the next
+menu page request rebuilds its snapshot.
+Bulk ``queryset.update()`` calls bypass these signals — callers that use
+them must call ``menu_changed()`` themselves.
+"""
+
+from django.db.models.signals import post_save, post_delete, m2m_changed
+from django.dispatch import receiver
+
+from .models import Category, MenuItem, DealSlot
+from .snapshot import menu_changed
+
+
+@receiver(post_save, sender=MenuItem)
+@receiver(post_save, sender=Category)
+@receiver(post_save, sender=DealSlot)
+@receiver(post_delete, sender=MenuItem)
+@receiver(post_delete, sender=Category)
+@receiver(post_delete, sender=DealSlot)
+def invalidate_menu_on_write(sender, **kwargs):
+    """Bump the menu version whenever catalog data changes."""
+    menu_changed()
+
+
+@receiver(m2m_changed, sender=DealSlot.categories.through)
+def invalidate_menu_on_slot_categories(sender, action, **kwargs):
+    """Slot category changes alter which deals are choosable."""
+    if action in ("post_add", "post_remove", "post_clear"):
+        menu_changed()
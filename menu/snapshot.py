@@ -0,0 +1,212 @@
+"""
+Versioned, pre-rendered menu snapshot.
+
+The menu page used to rebuild every category and item from the database
+on each request. Instead we build an immutable, per-language snapshot once
+and keep it in the cache under the current *menu version*. Any write to
+MenuItem, Category or DealSlot bumps the version (see menu/signals.py and
+the bulk admin actions) — once straight away and again on commit, see
+``menu_changed()`` — so the next request simply builds a new snapshot and
+the old one ages out of the cache.
+
+Item cards are rendered once per (language, menu version) and cached as
+HTML fragments too, all of a version's cards under a single key. They
+hold nothing session-specific, so every visitor shares the same markup;
+basket quantities are layered on by the page JS.
+"""
+
+import time
+from dataclasses import dataclass
+
+from django.core.cache import cache
+from django.db import transaction
+from django.template.loader import render_to_string
+from django.utils import translation
+from django.utils.safestring import mark_safe
+
+from .models import Category, DealSlot
+
+MENU_VERSION_KEY = "menu:version"
+SNAPSHOT_KEY = "menu:snapshot:{lang}:{version}"
+SNAPSHOT_TIMEOUT = 60 * 60 * 24
+CARDS_KEY = "menu:cards:{lang}:{version}:{variant}"
+CARD_TEMPLATE = "menu/_item_card.html"
+
+
+@dataclass(frozen=True)
+class MenuItemEntry:
+    """Read-only copy of a MenuItem with everything the menu card needs."""
+
+    pk: int
+    category_id: int
+    name: str
+    description: str
+    price: object  # Decimal
+    image_url: str
+    spice_level: int
+    spice_label: str
+    is_vegetarian: bool
+    is_vegan: bool
+    is_available: bool
+    is_popular: bool
+    allergens: str
+    is_deal: bool
+
+    @property
+    def spice_icons(self):
+        """Returns a range used by templates to render chilli icons."""
+        return range(self.spice_level)
+
+
+@dataclass(frozen=True)
+class CategoryEntry:
+    """Read-only copy of a Category for the menu page."""
+
+    pk: int
+    name: str
+    description: str
+    icon: str
+
+
+@dataclass(frozen=True)
+class MenuSnapshot:
+    """
+    The whole menu for one language at one menu version.
+    ``categories`` is a tuple of (CategoryEntry, items) pairs and only
+    contains sections with at least one available item.
+    """
+
+    version: int
+    language: str
+    categories: tuple
+    items_by_pk: dict
+
+    def get_item(self, pk):
+        """Return the MenuItemEntry for ``pk``, or None if it isn't on the menu."""
+        return self.items_by_pk.get(pk)
+
+
+def get_menu_version():
+    """
+    Current menu version. Seeded from the clock rather than 1 so that a
+    version key evicted from the cache can never collide with snapshots
+    stored under an older number.
+    """
+    version = cache.get(MENU_VERSION_KEY)
+    if version is None:
+        version = int(time.time() * 1000)
+        if not cache.add(MENU_VERSION_KEY, version, None):
+            version = cache.get(MENU_VERSION_KEY, version)
+    return version
+
+
+def bump_menu_version():
+    """Invalidate every cached snapshot by moving to a new menu version."""
+    try:
+        return cache.incr(MENU_VERSION_KEY)
+    except ValueError:
+        # Key missing (first write or evicted) — start a fresh sequence
+        version = int(time.time() * 1000)
+        cache.set(MENU_VERSION_KEY, version, None)
+        return version
+
+
+def menu_changed():
+    """
+    Call after writing catalog rows. The version is bumped straight away and
+    again once the write commits, so a request that rebuilds the snapshot in
+    between (still reading the old rows) doesn't leave that snapshot cached
+    under the current version.
+    """
+    bump_menu_version()
+    transaction.on_commit(bump_menu_version)
+
+
+def _image_url(item):
+    if not item.image:
+        return ""
+    try:
+        return item.image.url
+    except Exception:
+        return ""
+
+
+def build_menu_snapshot(version, language):
+    """Query the catalog and freeze it into a MenuSnapshot (3 queries)."""
+    deal_pks = set(DealSlot.objects.values_list("deal_id", flat=True).distinct())
+    categories = []
+    items_by_pk = {}
+    for cat in Category.objects.prefetch_related("items"):
+        entries = tuple(
+            MenuItemEntry(
+                pk=item.pk,
+                category_id=cat.pk,
+                name=item.name,
+                description=item.description,
+                price=item.price,
+                image_url=_image_url(item),
+                spice_level=item.spice_level,
+                spice_label=item.get_spice_level_display(),
+                is_vegetarian=item.is_vegetarian,
+                is_vegan=item.is_vegan,
+                is_available=item.is_available,
+                is_popular=item.is_popular,
+                allergens=item.allergens,
+                is_deal=item.pk in deal_pks,
+            )
+            for item in cat.items.all()
+        )
+        # Show section only if at least one item is available;
+        # unavailable items are included so they display with a "Sold Out" badge.
+        if not any(entry.is_available for entry in entries):
+            continue
+        category = CategoryEntry(
+            pk=cat.pk,
+            name=cat.name,
+            description=cat.description,
+            icon=cat.icon,
+        )
+        categories.append((category, entries))
+        items_by_pk.update((entry.pk, entry) for entry in entries)
+    return MenuSnapshot(
+        version=version,
+        language=language,
+        categories=tuple(categories),
+        items_by_pk=items_by_pk,
+    )
+
+
+def get_menu_snapshot(language=None):
+    """
+    Return the MenuSnapshot for the active language, building and caching
+    it on the first request after a menu change.
+    """
+    language = language or translation.get_language() or "en"
+    version = get_menu_version()
+    key = SNAPSHOT_KEY.format(lang=language, version=version)
+    snapshot = cache.get(key)
+    if snapshot is None:
+        with translation.override(language):
+            snapshot = build_menu_snapshot(version, language)
+        cache.set(key, snapshot, SNAPSHOT_TIMEOUT)
+    return snapshot
+
+
+def render_menu_cards(snapshot, is_staff=False):
+    """
+    Return {item_pk: card_html} for every item in the snapshot.
+    All cards for a (language, version, variant) live under one cache key,
+    so a cold menu costs one read and one write however many items there
+    are. Staff get a separate variant with the image/sold-out buttons.
+    """
+    variant = "staff" if is_staff else "public"
+    key = CARDS_KEY.format(lang=snapshot.language, version=snapshot.version, variant=variant)
+    cards = cache.get(key)
+    if cards is None:
+        with translation.override(snapshot.language):
+            cards = {
+                pk: render_to_string(CARD_TEMPLATE, {"item": entry, "is_staff": is_staff})
+                for pk, entry in snapshot.items_by_pk.items()
+            }
+        cache.set(key, cards, SNAPSHOT_TIMEOUT)
+    return {pk: mark_safe(html) for pk, html in cards.items()}
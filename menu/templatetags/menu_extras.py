@@ -13,3 +13,9 @@ def split_allergens(value):
     if not value:
         return []
     return [a.strip() for a in value.split(",") if a.strip()]
+
+
+@register.filter
+def card_for(cards, pk):
+    """Look up a pre-rendered menu card by item pk (empty string if missing)."""
+    return cards.get(pk, "")
@@ -1,13 +1,21 @@
 """
 Unit tests for the menu app.
 Covers Category model, MenuItem model (including properties),
-DealSlot.get_choices(), and the public menu page view.
+DealSlot.get_choices(), the public menu page view and the menu snapshot
+cache.
 """
 
 from decimal import Decimal
+from unittest.mock import MagicMock, patch
+from django.contrib.auth.models import User
+from django.core.cache import cache
+from django.db import connection
 from django.test import TestCase
+from django.test.utils import CaptureQueriesContext
 
+from menu.admin import mark_sold_out
 from menu.models import Category, MenuItem, DealSlot
+from menu.snapshot import get_menu_snapshot, get_menu_version, render_menu_cards
 
 
 # ---------------------------------------------------------------------------
@@ -175,3 +183,119 @@ class MenuPageViewTest(TestCase):
     def test_category_heading_shown(self):
         response = self.client.get("/menu/")
         self.assertContains(response, "Noodles")
+
+
+# ---------------------------------------------------------------------------
+# Menu snapshot cache
+# ---------------------------------------------------------------------------
+
+class MenuSnapshotTest(TestCase):
+    def setUp(self):
+        self.cat = make_category(name="Rice")
+        self.item = make_item(self.cat, name="Egg Fried Rice", price="4.00")
+        make_item(self.cat, name="Boiled Rice", price="3.00")
+
+    def _catalog_queries(self):
+        """Run the menu page and return only queries that touch menu tables."""
+        with CaptureQueriesContext(connection) as ctx:
+            response = self.client.get("/menu/")
+        self.assertEqual(response.status_code, 200)
+        return [q["sql"] for q in ctx.captured_queries if "menu_" in q["sql"]]
+
+    def test_steady_state_runs_no_catalog_queries(self):
+        self.client.get("/menu/")  # warm the snapshot
+        self.assertEqual(self._catalog_queries(), [])
+
+    def test_item_save_bumps_version(self):
+        before = get_menu_version()
+        self.item.price = Decimal("4.50")
+        self.item.save()
+        self.assertNotEqual(get_menu_version(), before)
+
+    def test_edit_is_visible_after_warm_cache(self):
+        self.client.get("/menu/")
+        self.item.name = "Special Fried Rice"
+        self.item.save()
+        self.assertContains(self.client.get("/menu/"), "Special Fried Rice")
+
+    def test_delete_bumps_version(self):
+        before = get_menu_version()
+        self.item.delete()
+        self.assertNotEqual(get_menu_version(), before)
+
+    def test_snapshot_built_before_commit_is_not_kept(self):
+        with self.captureOnCommitCallbacks(execute=True):
+            self.item.name = "Special Fried Rice"
+            self.item.save()
+            # A concurrent request rebuilding from the rows it can still see
+            get_menu_snapshot()
+            mid_write = get_menu_version()
+        self.assertNotEqual(get_menu_version(), mid_write)
+
+    def test_deal_slot_marks_item_as_deal(self):
+        deal = make_item(self.cat, name="Rice Deal", price="12.00")
+        DealSlot.objects.create(deal=deal, label="Choice")
+        snapshot = get_menu_snapshot()
+        self.assertTrue(snapshot.get_item(deal.pk).is_deal)
+        self.assertFalse(snapshot.get_item(self.item.pk).is_deal)
+
+    def test_staff_toggle_invalidates_snapshot(self):
+        User.objects.create_user(username="chef", password="pass123", is_staff=True)
+        self.client.login(username="chef", password="pass123")
+        self.assertTrue(get_menu_snapshot().get_item(self.item.pk).is_available)
+        self.client.post(f"/menu/staff/toggle-availability/{self.item.pk}/")
+        self.assertFalse(get_menu_snapshot().get_item(self.item.pk).is_available)
+
+    def test_admin_bulk_action_invalidates_snapshot(self):
+        self.assertTrue(get_menu_snapshot().get_item(self.item.pk).is_available)
+        mark_sold_out(MagicMock(), None, MenuItem.objects.filter(pk=self.item.pk))
+        self.assertFalse(get_menu_snapshot().get_item(self.item.pk).is_available)
+
+    def test_category_without_available_items_hidden(self):
+        empty = make_category(name="Desserts", order=5)
+        make_item(empty, name="Gone", available=False)
+        names = [cat.name for cat, _ in get_menu_snapshot().categories]
+        self.assertNotIn("Desserts", names)
+
+
+# ---------------------------------------------------------------------------
+# Menu card fragment cache
+# ---------------------------------------------------------------------------
+
+class MenuCardCacheTest(TestCase):
+    def setUp(self):
+        cat = make_category(name="Soups")
+        self.item = make_item(cat, name="Hot and Sour Soup", price="4.20")
+
+    def test_cards_rendered_once_then_shared(self):
+        snapshot = get_menu_snapshot()
+        first = render_menu_cards(snapshot)
+        with patch("menu.snapshot.render_to_string") as render:
+            second = render_menu_cards(snapshot)
+        render.assert_not_called()
+        self.assertEqual(first, second)
+
+    def test_all_cards_stored_under_one_key(self):
+        make_item(self.item.category, name="Wonton Soup", price="3.80")
+        snapshot = get_menu_snapshot()
+        with patch.object(cache, "set", wraps=cache.set) as cache_set:
+            cards = render_menu_cards(snapshot)
+        cache_set.assert_called_once()
+        self.assertEqual(set(cards), set(snapshot.items_by_pk))
+
+    def test_staff_variant_has_staff_controls(self):
+        snapshot = get_menu_snapshot()
+        public = render_menu_cards(snapshot)[self.item.pk]
+        staff = render_menu_cards(snapshot, is_staff=True)[self.item.pk]
+        self.assertNotIn("staff-avail-toggle-btn", public)
+        self.assertIn("staff-avail-toggle-btn", staff)
+
+    def test_basket_quantities_sent_as_json(self):
+        self.client.post(
+            f"/orders/basket/add/{self.item.pk}/",
+            {"quantity": 2},
+            HTTP_X_REQUESTED_WITH="XMLHttpRequest",
+        )
+        response = self.client.get("/menu/")
+        self.assertContains(response, 'id="basket-quantities"')
+        self.assertContains(response, f'{{"{self.item.pk}": 2}}')
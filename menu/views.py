@@ -3,17 +3,17 @@ Menu app views — homepage and full menu page.
 """
 
 from django.shortcuts import render, get_object_or_404
-from django.db.models import Count
 from django.http import JsonResponse
 from django.contrib.admin.views.decorators import staff_member_required
 from django.views.decorators.http import require_POST
-from .models import Category, MenuItem, DealSlot
-from orders.models import OpeningHours, OrderItem
+from .models import MenuItem, DealSlot
+from .snapshot import get_menu_snapshot, render_menu_cards
+from orders.favourites import favourite_item_ids
+from orders.schedule import LONDON_TZ, get_opening_schedule
 from orders.basket import Basket
 import datetime
-from zoneinfo import ZoneInfo
 
-LONDON_TZ = ZoneInfo("Europe/London")
+FAVOURITES_SHOWN = 6
 
 
 def homepage(request):
@@ -26,25 +26,15 @@ def homepage(request):
         is_popular=True, is_available=True
     ).select_related("category")[:8]
 
-    opening_hours = OpeningHours.objects.all()
-
-    # Use London local time so BST/GMT is handled automatically
+    # One cached schedule answers open/closed (London time, BST/GMT aware)
+    schedule = get_opening_schedule()
     now_london = datetime.datetime.now(tz=LONDON_TZ)
-    today = now_london.weekday()   # 0=Monday, 6=Sunday
-    now_time = now_london.time()
-
-    is_open = False
-    today_hours = None
-    for hours in opening_hours:
-        if hours.day == today:
-            today_hours = hours
-            if not hours.is_closed and hours.opening_time and hours.closing_time:
-                is_open = hours.opening_time <= now_time <= hours.closing_time
-            break
+    is_open = schedule.is_open(now_london)
+    today_hours = schedule.hours_for(now_london.weekday())
 
     context = {
         "popular_items": popular_items,
-        "opening_hours": opening_hours,
+        "opening_hours": schedule.days,
         "is_open": is_open,
         "today_hours": today_hours,
     }
@@ -57,16 +47,11 @@ def menu_page(request):
     Only shows available items and supports a 'category' query param
     to scroll/highlight a specific section.
     Passes basket quantities so cards can show +/- controls.
+    The catalog itself comes from the cached menu snapshot and the item cards
+    from the shared fragment cache, so a steady-state request runs no catalog
+    queries and renders no card markup.
     """
-    categories = Category.objects.prefetch_related("items").all()
-
-    filtered_categories = []
-    for cat in categories:
-        all_items = cat.items.all()
-        # Show section only if at least one item is available;
-        # unavailable items are included so they display with a "Sold Out" badge.
-        if all_items.filter(is_available=True).exists():
-            filtered_categories.append((cat, all_items))
+    snapshot = get_menu_snapshot()
 
     active_category = request.GET.get("category", None)
 
@@ -76,35 +61,25 @@ def menu_page(request):
     basket_count = basket.get_total_quantity()
     basket_subtotal = basket.get_subtotal()
 
-    # PKs of deal items that have at least one choosable slot
-    deal_item_pks = set(
-        DealSlot.objects.values_list("deal_id", flat=True).distinct()
-    )
-
-    # Favourite items for logged-in users — top 6 most-ordered available items
+    # Favourite items for logged-in users — the most-ordered available items,
+    # read from the precomputed counts (orders/favourites.py). Availability is
+    # checked against the snapshot, so over-fetch a little.
     favourite_items = []
     if request.user.is_authenticated:
-        fav_ids = (
-            OrderItem.objects
-            .filter(order__user=request.user, menu_item__is_available=True)
-            .values("menu_item_id")
-            .annotate(cnt=Count("id"))
-            .order_by("-cnt")[:6]
-            .values_list("menu_item_id", flat=True)
-        )
-        if fav_ids:
-            # Preserve ordering by count
-            fav_map = {pk: i for i, pk in enumerate(fav_ids)}
-            qs = MenuItem.objects.filter(pk__in=fav_ids).select_related("category")
-            favourite_items = sorted(qs, key=lambda m: fav_map.get(m.pk, 99))
+        for pk in favourite_item_ids(request.user, FAVOURITES_SHOWN * 2):
+            entry = snapshot.get_item(pk)
+            if entry is not None and entry.is_available:
+                favourite_items.append(entry)
+            if len(favourite_items) == FAVOURITES_SHOWN:
+                break
 
     return render(request, "menu/menu.html", {
-        "categories": filtered_categories,
+        "categories": snapshot.categories,
+        "item_cards": render_menu_cards(snapshot, is_staff=request.user.is_staff),
         "active_category": active_category,
         "basket_quantities": basket_quantities,
         "basket_count": basket_count,
         "basket_subtotal": basket_subtotal,
-        "deal_item_pks": deal_item_pks,
         "favourite_items": favourite_items,
     })
 
@@ -5,9 +5,13 @@ visible at a glance. Status can be changed directly from the list view.
 """
 
 from django.contrib import admin
+from django.utils import timezone
 from django.utils.html import format_html
 from django.urls import reverse
-from .models import Order, OrderItem, OpeningHours, PromoCode, SiteAnnouncement
+from . import kitchen_feed
+from .models import (
+    BackgroundTask, Order, OrderItem, OpeningHours, PromoCode, PromoRedemption, SiteAnnouncement,
+)
 
 
 class OrderItemInline(admin.TabularInline):
@@ -23,7 +27,7 @@ class OrderItemInline(admin.TabularInline):
 class OrderAdmin(admin.ModelAdmin):
     list_display = (
         "reference", "full_name", "customer_link", "delivery_type",
-        "payment_method", "total", "status", "created_at"
+        "payment_method", "item_count", "items_summary", "total", "status", "created_at"
     )
     list_filter = ("status", "delivery_type", "payment_method", "created_at", "user")
     list_editable = ("status",)
@@ -32,7 +36,7 @@ class OrderAdmin(admin.ModelAdmin):
         "user__email", "user__username",
     )
     readonly_fields = (
-        "reference", "customer_link",
+        "reference", "customer_link", "item_count", "items_summary",
         "subtotal", "delivery_charge", "discount_amount", "promo_code", "total", "created_at",
         "full_name", "email", "phone",
         "address_line1", "address_line2", "city", "postcode",
@@ -43,7 +47,7 @@ class OrderAdmin(admin.ModelAdmin):
     ordering = ("-created_at",)
     fieldsets = (
         ("📋  Order", {
-            "fields": (("reference", "status"), "created_at"),
+            "fields": (("reference", "status"), "created_at", ("item_count", "items_summary")),
         }),
         ("👤  Customer", {
             "fields": ("customer_link", "user", ("full_name", "email"), "phone"),
@@ -72,6 +76,12 @@ class OrderAdmin(admin.ModelAdmin):
         # Orders are created by customers via the website, not manually in admin
         return False
 
+    def save_model(self, request, obj, form, change):
+        """Push status changes made here (including the list view) to the kitchen display."""
+        super().save_model(request, obj, form, change)
+        if "status" in form.changed_data:
+            kitchen_feed.publish(obj)
+
 
 @admin.register(OpeningHours)
 class OpeningHoursAdmin(admin.ModelAdmin):
@@ -103,6 +113,20 @@ class PromoCodeAdmin(admin.ModelAdmin):
     )
 
 
+@admin.register(PromoRedemption)
+class PromoRedemptionAdmin(admin.ModelAdmin):
+    """Read-only ledger of promo code uses, one row per order."""
+    list_display = ("code", "order", "user", "discount_amount", "created_at")
+    search_fields = ("code", "order__reference", "user__username", "user__email")
+    list_select_related = ("order", "user")
+
+    def has_add_permission(self, request):
+        return False
+
+    def has_change_permission(self, request, obj=None):
+        return False
+
+
 @admin.register(SiteAnnouncement)
 class SiteAnnouncementAdmin(admin.ModelAdmin):
     list_display = ("short_message", "style", "is_active", "created_at")
@@ -114,3 +138,20 @@ class SiteAnnouncementAdmin(admin.ModelAdmin):
     @admin.display(description="Message")
     def short_message(self, obj):
         return obj.message[:80]
+
+
+@admin.register(BackgroundTask)
+class BackgroundTaskAdmin(admin.ModelAdmin):
+    """Queued side effects — mainly for inspecting and retrying failed ones."""
+    list_display = ("name", "status", "attempts", "run_after", "created_at")
+    list_filter = ("status", "name")
+    readonly_fields = ("name", "payload", "attempts", "last_error", "locked_at", "created_at")
+    fields = ("name", "payload", "status", "run_after", "attempts", "locked_at", "last_error", "created_at")
+    actions = ["retry_now"]
+
+    @admin.action(description="Retry selected tasks now")
+    def retry_now(self, request, queryset):
+        updated = queryset.exclude(status=BackgroundTask.STATUS_RUNNING).update(
+            status=BackgroundTask.STATUS_PENDING, run_after=timezone.now(), attempts=0,
+        )
+        self.message_user(request, f"{updated} task(s) queued to run again.")
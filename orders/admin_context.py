@@ -2,12 +2,136 @@
 Context processor that injects live stats into every admin template.
 Stats are only computed when the request path starts with the admin prefix
 to avoid unnecessary DB queries on front-end pages.
+
+All order counts and revenue come from a single conditional-aggregation
+query over DailySalesRollup (one row per day, not per order), with one
+query each for reviews and top items. The result is cached for a short TTL
+and dropped whenever an Order is written (see orders/signals.py), so staff
+clicking around the admin during service don't compete with checkout.
 """
 
+from django.core.cache import cache
 from django.utils import timezone
 from datetime import timedelta
 from decimal import Decimal
 
+ADMIN_STATS_CACHE_KEY = "admin:stats"
+ADMIN_STATS_TTL = 30  # seconds
+
+
+def invalidate_admin_stats():
+    """Drop the cached dashboard so the next admin page recomputes it."""
+    cache.delete(ADMIN_STATS_CACHE_KEY)
+
+
+def _money(value):
+    return f"{(value or Decimal('0.00')):.2f}"
+
+
+def _compute_admin_stats():
+    """Run the dashboard queries and return the template context dict."""
+    from orders.models import DailySalesRollup, Order, OrderItem
+    from orders.models import PromoCode
+    from reviews.models import Review
+    from django.db.models import Sum, Count, Q, Window
+
+    today       = timezone.localdate()
+    week_start  = today - timedelta(days=today.weekday())   # Monday
+    month_start = today.replace(day=1)
+    month_ago   = timezone.now() - timedelta(days=30)
+
+    # Every order figure in one pass over the daily rollups (one row per
+    # day/type/bucket) rather than over the orders themselves
+    is_today = Q(date=today)
+    settled  = Q(status_bucket__in=[DailySalesRollup.BUCKET_COMPLETED, DailySalesRollup.BUCKET_DISPATCHED])
+    o = DailySalesRollup.objects.aggregate(
+        today_orders=Sum("order_count", filter=is_today),
+        today_revenue=Sum("revenue", filter=is_today),
+        today_cancelled=Sum("order_count", filter=is_today & Q(status_bucket=DailySalesRollup.BUCKET_CANCELLED)),
+        delivery_today=Sum("order_count", filter=is_today & Q(delivery_type=Order.DELIVERY)),
+        collection_today=Sum("order_count", filter=is_today & Q(delivery_type=Order.COLLECTION)),
+        week_orders=Sum("order_count", filter=Q(date__gte=week_start)),
+        week_revenue=Sum("revenue", filter=Q(date__gte=week_start)),
+        month_orders=Sum("order_count", filter=Q(date__gte=month_start)),
+        month_revenue=Sum("revenue", filter=Q(date__gte=month_start)),
+        # Average order value (all time, completed/out for delivery)
+        settled_orders=Sum("order_count", filter=settled),
+        settled_revenue=Sum("revenue", filter=settled),
+        pending_orders=Sum("order_count", filter=Q(status_bucket__in=[
+            DailySalesRollup.BUCKET_OPEN, DailySalesRollup.BUCKET_DISPATCHED,
+        ])),
+    )
+    o = {key: value or 0 for key, value in o.items()}
+    avg_order_value = o["settled_revenue"] / o["settled_orders"] if o["settled_orders"] else None
+
+    # Last 4 unapproved reviews (for the quick-approve panel); the window
+    # count carries the total number pending on every row
+    pending_review_list = list(
+        Review.objects.filter(is_approved=False)
+        .select_related("user", "order")
+        .annotate(pending_total=Window(Count("id")))
+        .order_by("-created_at")[:4]
+    )
+    pending_reviews = pending_review_list[0].pending_total if pending_review_list else 0
+
+    # Registered users (total)
+    from django.contrib.auth import get_user_model
+    User = get_user_model()
+    total_users = User.objects.count()
+
+    # Item lines and quantities over the last 30 days, in one grouping.
+    # "Top item" ranks by number of order lines, the chart by quantity.
+    item_rows = list(
+        OrderItem.objects
+        .filter(order__created_at__gte=month_ago)
+        .values("item_name")
+        .annotate(total=Count("id"), qty=Sum("quantity"))
+    )
+    top_item_row = max(item_rows, key=lambda r: r["total"], default=None)
+    top_item = top_item_row["item_name"] if top_item_row else None
+    top_items_30d = [
+        {"item_name": r["item_name"], "qty": r["qty"]}
+        for r in sorted(item_rows, key=lambda r: r["qty"], reverse=True)[:5]
+    ]
+
+    # Recent orders (last 6)
+    recent_orders = list(
+        Order.objects
+        .select_related("user")
+        .order_by("-created_at")[:6]
+    )
+
+    # Active promo codes
+    active_promos = list(PromoCode.objects.filter(active=True).order_by("code"))
+
+    # Active announcement (if any)
+    from orders.announcements import get_active_announcement
+    current_announcement = get_active_announcement()
+
+    return {
+        "stats": {
+            "today_orders":      o["today_orders"],
+            "today_revenue":     _money(o["today_revenue"]),
+            "today_cancelled":   o["today_cancelled"],
+            "week_orders":       o["week_orders"],
+            "week_revenue":      _money(o["week_revenue"]),
+            "month_orders":      o["month_orders"],
+            "month_revenue":     _money(o["month_revenue"]),
+            "avg_order_value":   _money(avg_order_value),
+            "pending_orders":    o["pending_orders"],
+            "pending_reviews":   pending_reviews,
+            "top_item":          top_item,
+            "delivery_today":    o["delivery_today"],
+            "collection_today":  o["collection_today"],
+            "total_users":       total_users,
+        },
+        "top_items_30d":           top_items_30d,
+        "recent_orders":           recent_orders,
+        "active_promos":           active_promos,
+        "current_announcement":    current_announcement,
+        "pending_review_list":     pending_review_list,
+    }
+
 
 def admin_stats(request):
     """
@@ -21,127 +145,10 @@ def admin_stats(request):
         return {}
 
     try:
-        from orders.models import Order, OrderItem
-        from orders.models import PromoCode
-        from reviews.models import Review
-        from django.db.models import Sum, Count, Avg
-
-        now        = timezone.now()
-        today_start = now.replace(hour=0, minute=0, second=0, microsecond=0)
-        week_start  = today_start - timedelta(days=now.weekday())   # Monday
-        month_ago   = now - timedelta(days=30)
-
-        # Today
-        today_qs      = Order.objects.filter(created_at__gte=today_start)
-        today_orders  = today_qs.count()
-        today_revenue = today_qs.aggregate(s=Sum("total"))["s"] or Decimal("0.00")
-
-        # This week
-        week_qs      = Order.objects.filter(created_at__gte=week_start)
-        week_orders  = week_qs.count()
-        week_revenue = week_qs.aggregate(s=Sum("total"))["s"] or Decimal("0.00")
-
-        # This month
-        month_start  = now.replace(day=1, hour=0, minute=0, second=0, microsecond=0)
-        month_qs     = Order.objects.filter(created_at__gte=month_start)
-        month_orders  = month_qs.count()
-        month_revenue = month_qs.aggregate(s=Sum("total"))["s"] or Decimal("0.00")
-
-        # Average order value (all time, completed/out for delivery)
-        avg_row = Order.objects.filter(
-            status__in=[Order.STATUS_COMPLETED, Order.STATUS_OUT_FOR_DELIVERY]
-        ).aggregate(avg=Avg("total"))
-        avg_order_value = avg_row["avg"] or Decimal("0")
-
-        # Delivery vs collection split today
-        delivery_today    = today_qs.filter(delivery_type="delivery").count()
-        collection_today  = today_qs.filter(delivery_type="collection").count()
-
-        # Pending (active) orders
-        pending_orders = Order.objects.filter(
-            status__in=[
-                Order.STATUS_PENDING,
-                Order.STATUS_CONFIRMED,
-                Order.STATUS_PREPARING,
-                Order.STATUS_OUT_FOR_DELIVERY,
-                Order.STATUS_READY,
-            ]
-        ).count()
-
-        # Cancelled orders today
-        today_cancelled = today_qs.filter(status=Order.STATUS_CANCELLED).count()
-
-        # Unapproved reviews
-        pending_reviews = Review.objects.filter(is_approved=False).count()
-
-        # Last 4 unapproved reviews (for the quick-approve panel)
-        pending_review_list = list(
-            Review.objects.filter(is_approved=False)
-            .select_related("user", "order")
-            .order_by("-created_at")[:4]
-        )
-
-        # Registered users (total)
-        from django.contrib.auth import get_user_model
-        User = get_user_model()
-        total_users = User.objects.count()
-
-        # Most-ordered item in the last 30 days
-        top_item_row = (
-            OrderItem.objects
-            .filter(order__created_at__gte=month_ago)
-            .values("item_name")
-            .annotate(total=Count("id"))
-            .order_by("-total")
-            .first()
-        )
-        top_item = top_item_row["item_name"] if top_item_row else None
-
-        # Top 5 items last 30 days for the chart
-        top_items_30d = list(
-            OrderItem.objects
-            .filter(order__created_at__gte=month_ago)
-            .values("item_name")
-            .annotate(qty=Sum("quantity"))
-            .order_by("-qty")[:5]
-        )
-
-        # Recent orders (last 6)
-        recent_orders = (
-            Order.objects
-            .select_related("user")
-            .order_by("-created_at")[:6]
-        )
-
-        # Active promo codes
-        active_promos = PromoCode.objects.filter(active=True).order_by("code")
-
-        # Active announcement (if any)
-        from .models import SiteAnnouncement
-        current_announcement = SiteAnnouncement.objects.filter(is_active=True).first()
-
-        return {
-            "stats": {
-                "today_orders":      today_orders,
-                "today_revenue":     f"{today_revenue:.2f}",
-                "today_cancelled":   today_cancelled,
-                "week_orders":       week_orders,
-                "week_revenue":      f"{week_revenue:.2f}",
-                "month_orders":      month_orders,
-                "month_revenue":     f"{month_revenue:.2f}",
-                "avg_order_value":   f"{avg_order_value:.2f}",
-                "pending_orders":    pending_orders,
-                "pending_reviews":   pending_reviews,
-                "top_item":          top_item,
-                "delivery_today":    delivery_today,
-                "collection_today":  collection_today,
-                "total_users":       total_users,
-            },
-            "top_items_30d":           top_items_30d,
-            "recent_orders":           recent_orders,
-            "active_promos":           active_promos,
-            "current_announcement":    current_announcement,
-            "pending_review_list":     pending_review_list,
-        }
+        context = cache.get(ADMIN_STATS_CACHE_KEY)
+        if context is None:
+            context = _compute_admin_stats()
+            cache.set(ADMIN_STATS_CACHE_KEY, context, ADMIN_STATS_TTL)
+        return context
     except Exception:
         return {}
@@ -0,0 +1,41 @@
+"""
+Cached lookup of the active site announcement.
+
+The banner is rendered on every public page, so the active
+SiteAnnouncement is kept in the cache rather than queried per render.
+Any save or delete of a SiteAnnouncement — including the admin
+list_editable toggles — drops the cached copy, straight away and again
+once the write commits (see orders/signals.py).
+"""
+
+from django.core.cache import cache
+from django.db import transaction
+
+from .models import SiteAnnouncement
+
+ANNOUNCEMENT_KEY = "announcement:active"
+ANNOUNCEMENT_TIMEOUT = 60 * 60 * 24
+# Cached in place of None so "no announcement" is a cache hit too
+_NONE = "none"
+
+
+def get_active_announcement():
+    """The most recent active SiteAnnouncement, or None."""
+    announcement = cache.get(ANNOUNCEMENT_KEY)
+    if announcement is None:
+        announcement = SiteAnnouncement.objects.filter(is_active=True).first() or _NONE
+        cache.set(ANNOUNCEMENT_KEY, announcement, ANNOUNCEMENT_TIMEOUT)
+    return None if announcement == _NONE else announcement
+
+
+def _drop_cached_announcement():
+    cache.delete(ANNOUNCEMENT_KEY)
+
+
+def invalidate_active_announcement():
+    """
+    Drop the cached banner now and again on commit, so a page rendered in
+    between (still seeing the old row) doesn't leave it cached for a day.
+    """
+    _drop_cached_announcement()
+    transaction.on_commit(_drop_cached_announcement)
@@ -6,4 +6,4 @@ class OrdersConfig(AppConfig):
     name = 'orders'
 
     def ready(self):
-        import orders.signals  # noqa: F401 – register auth signals
+        import orders.signals  # noqa: F401 – register order + auth signals
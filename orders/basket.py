@@ -2,8 +2,14 @@
 Session-based shopping basket.
 The basket is stored in the Django session as a dictionary keyed by
 menu item ID. No database writes occur until the user places the order.
+
+Prices are worked out once per basket state: ``Basket.totals()`` returns an
+immutable BasketTotals (subtotal, delivery, discount, total and free-delivery
+progress) computed in a single pass and kept on the instance until the next
+add/update/remove/promo change.
 """
 
+from dataclasses import dataclass
 from decimal import Decimal
 from menu.models import MenuItem
 
@@ -14,6 +20,23 @@ FREE_DELIVERY_THRESHOLD = Decimal("20.00")
 MIN_ORDER_DELIVERY = Decimal("10.00")
 
 
+@dataclass(frozen=True)
+class BasketTotals:
+    """Everything the basket summary shows, for one delivery type."""
+
+    quantity: int
+    subtotal: Decimal
+    delivery_charge: Decimal
+    discount: Decimal
+    total: Decimal
+    free_delivery_remaining: Decimal
+    free_delivery_pct: int
+
+    @property
+    def delivery_is_free(self):
+        return self.delivery_charge == Decimal("0.00")
+
+
 class Basket:
     """
     Manages the customer's basket using Django's session framework.
@@ -32,6 +55,7 @@ class Basket:
                 item_data["price"] = str(item_data["price"])
                 self.session.modified = True
         self.basket = basket
+        self._totals = {}
 
     # ------------------------------------------------------------------
     # Mutation methods
@@ -74,7 +98,7 @@ class Basket:
         del self.session[BASKET_SESSION_KEY]
         if PROMO_SESSION_KEY in self.session:
             del self.session[PROMO_SESSION_KEY]
-        self.session.modified = True
+        self._save()
 
     # ------------------------------------------------------------------
     # Promo code helpers
@@ -86,13 +110,13 @@ class Basket:
             "code": code_str.upper(),
             "discount": str(discount_amount),
         }
-        self.session.modified = True
+        self._save()
 
     def remove_promo(self):
         """Clear any applied promo code from the session."""
         if PROMO_SESSION_KEY in self.session:
             del self.session[PROMO_SESSION_KEY]
-        self.session.modified = True
+        self._save()
 
     @property
     def promo_code(self):
@@ -108,8 +132,9 @@ class Basket:
         return Decimal("0.00")
 
     def _save(self):
-        """Mark the session as modified so Django persists the change."""
+        """Mark the session as modified and drop the memoized totals."""
         self.session.modified = True
+        self._totals = {}
 
     # ------------------------------------------------------------------
     # Query methods
@@ -138,34 +163,51 @@ class Basket:
             entry["notes"] = raw.get("notes", "")
             yield entry
 
+    def totals(self, delivery_type="delivery"):
+        """
+        Price the basket in one pass. Delivery is free over
+        FREE_DELIVERY_THRESHOLD and collection is always free. The result
+        is memoized until the basket or promo changes.
+        """
+        totals = self._totals.get(delivery_type)
+        if totals is not None:
+            return totals
+        quantity = 0
+        subtotal = 0
+        for data in self.basket.values():
+            quantity += data["quantity"]
+            subtotal += Decimal(data["price"]) * data["quantity"]
+        if delivery_type == "collection" or subtotal >= FREE_DELIVERY_THRESHOLD:
+            delivery_charge = Decimal("0.00")
+        else:
+            delivery_charge = DELIVERY_CHARGE
+        discount = self.get_discount()
+        totals = self._totals[delivery_type] = BasketTotals(
+            quantity=quantity,
+            subtotal=subtotal,
+            delivery_charge=delivery_charge,
+            discount=discount,
+            total=max(Decimal("0.00"), subtotal + delivery_charge - discount),
+            free_delivery_remaining=max(Decimal("0.00"), FREE_DELIVERY_THRESHOLD - subtotal),
+            free_delivery_pct=min(100, int(subtotal / FREE_DELIVERY_THRESHOLD * 100)) if subtotal > 0 else 0,
+        )
+        return totals
+
     def get_total_quantity(self):
         """Total number of individual items (sum of all quantities)."""
-        return sum(item["quantity"] for item in self.basket.values())
+        return self.totals().quantity
 
     def get_subtotal(self):
         """Basket subtotal before delivery charge."""
-        return sum(
-            Decimal(data["price"]) * data["quantity"]
-            for data in self.basket.values()
-        )
+        return self.totals().subtotal
 
     def get_delivery_charge(self, delivery_type="delivery"):
-        """
-        Returns the delivery charge.
-        Delivery is free over FREE_DELIVERY_THRESHOLD.
-        Collection is always free.
-        """
-        if delivery_type == "collection":
-            return Decimal("0.00")
-        subtotal = self.get_subtotal()
-        if subtotal >= FREE_DELIVERY_THRESHOLD:
-            return Decimal("0.00")
-        return DELIVERY_CHARGE
+        """Returns the delivery charge (see ``totals()``)."""
+        return self.totals(delivery_type).delivery_charge
 
     def get_total(self, delivery_type="delivery"):
         """Total including delivery charge and minus any promo discount."""
-        before_discount = self.get_subtotal() + self.get_delivery_charge(delivery_type)
-        return max(Decimal("0.00"), before_discount - self.get_discount())
+        return self.totals(delivery_type).total
 
     def __len__(self):
         return self.get_total_quantity()
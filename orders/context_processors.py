@@ -1,9 +1,13 @@
 """
 Orders context processor.
 Injects the basket item count into every template so the navbar
-basket icon always shows the current number of items.
+basket icon always shows the current number of items, plus the
+site announcement banner.
 """
 
+from django.utils.functional import SimpleLazyObject
+
+from .announcements import get_active_announcement
 from .basket import Basket
 
 
@@ -23,15 +27,19 @@ def basket_context(request):
     }
 
 
+def _active_announcement_or_none():
+    try:
+        return get_active_announcement()
+    except Exception:
+        return None
+
+
 def announcement_context(request):
     """Injects the latest active SiteAnnouncement into every template.
-    Silently returns empty dict on any error so the site never breaks.
+    The value is lazy and served from the cache (see orders/announcements.py),
+    so templates that never read it cost nothing. Any error yields None so
+    the site never breaks.
     """
-    try:
-        if not hasattr(request, 'session'):
-            return {"site_announcement": None}
-        from .models import SiteAnnouncement
-        announcement = SiteAnnouncement.objects.filter(is_active=True).first()
-        return {"site_announcement": announcement}
-    except Exception:
+    if not hasattr(request, 'session'):
         return {"site_announcement": None}
+    return {"site_announcement": SimpleLazyObject(_active_announcement_or_none)}
@@ -0,0 +1,58 @@
+"""
+Per-customer favourite items for the menu page.
+
+The menu page used to find a customer's favourites with a GROUP BY over
+every OrderItem they had ever ordered, on every menu view. FavouriteItem
+keeps those counts instead: placing an order queues a record_favourites
+task (see orders/services.py and orders/tasks.py) that adds the order's
+lines to the customer's rows, and the menu page reads the top few rows
+from one index.
+
+Counts are of order lines, like the old query. Availability changes all
+the time, so it isn't stored here; the menu page checks each id against
+the menu snapshot and skips sold-out items.
+"""
+
+from collections import Counter
+
+from django.db.models import F
+from django.utils import timezone
+
+from menu.models import MenuItem
+
+from .models import FavouriteItem
+
+
+def record_favourites(user_id, menu_item_ids, ordered_at=None):
+    """
+    Add one order's lines to the customer's favourite counts. ``menu_item_ids``
+    has one entry per order line. The missing rows are inserted empty in one
+    query, then counted up with one UPDATE per distinct line count (almost
+    always just one), however many items the order had.
+    """
+    lines = Counter(menu_item_ids)
+    # Items deleted since the order was placed have nothing to point at
+    lines = {pk: lines[pk] for pk in MenuItem.objects.filter(pk__in=lines).values_list("pk", flat=True)}
+    if not lines:
+        return
+    ordered_at = ordered_at or timezone.now()
+    FavouriteItem.objects.bulk_create(
+        [FavouriteItem(user_id=user_id, menu_item_id=pk) for pk in lines],
+        ignore_conflicts=True,
+    )
+    by_count = {}
+    for pk, count in lines.items():
+        by_count.setdefault(count, []).append(pk)
+    for count, pks in by_count.items():
+        FavouriteItem.objects.filter(user_id=user_id, menu_item_id__in=pks).update(
+            times_ordered=F("times_ordered") + count, last_ordered_at=ordered_at,
+        )
+
+
+def favourite_item_ids(user, limit):
+    """The customer's most-ordered menu item ids, most ordered first."""
+    return list(
+        FavouriteItem.objects.filter(user=user)
+        .order_by("-times_ordered", "-last_ordered_at")
+        .values_list("menu_item_id", flat=True)[:limit]
+    )
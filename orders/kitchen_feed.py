@@ -0,0 +1,250 @@
+"""
+Kitchen display change feed and Server-Sent Events stream.
+
+Views call ``publish()`` whenever an order is placed or its status changes;
+that appends a KitchenEvent row. Open kitchen tablets hold a long-lived
+``/orders/kitchen/stream/`` connection that replays events newer than the
+last one they saw, sending each changed order card as a single SSE message.
+
+Waking the streams:
+- On PostgreSQL ``publish()`` also issues ``NOTIFY kitchen_feed`` in the
+  same transaction, and each stream ``LISTEN``s on its connection, so an
+  idle kitchen costs no queries at all — just a heartbeat comment.
+- Elsewhere (SQLite in development) streams in the same process are woken
+  through a condition variable, and other processes are caught up by a
+  cheap indexed poll every FALLBACK_POLL_SECONDS.
+
+Event pks are assigned before commit, so two checkouts can make their
+events visible out of order; streams keep re-reading the pks they skipped
+for a while (see ``stream()``) rather than assuming pk order is commit order.
+
+Streams end after STREAM_SECONDS; the browser's EventSource reconnects on
+its own and resumes from the Last-Event-ID header. Old events are pruned as
+streams connect, not on every publish.
+
+Thread and connection budget: each open stream holds one of the worker's
+gunicorn threads (8, see Procfile) for up to STREAM_SECONDS and, on
+PostgreSQL, that thread's database connection for as long, since it is
+LISTENing. So a process serves at most MAX_STREAMS of them (see
+``open_stream()``), leaving the other threads and their connections to
+checkout and menu traffic. Tablets over the limit get a 503 and fall back
+to polling the kitchen partial, which answers 304 while the board is
+unchanged.
+"""
+
+import json
+import select
+import threading
+import time
+
+from django.db import connection, transaction
+from django.db.models import Q
+from django.template.loader import render_to_string
+
+from .models import KITCHEN_STATUSES, KitchenEvent, Order
+
+CHANNEL = "kitchen_feed"
+KEEP_EVENTS = 500
+HOLE_WINDOW = 50       # how far below the newest pk to look for late commits
+HOLE_SECONDS = 60      # after this long a missing pk is taken as rolled back
+STREAM_SECONDS = 300
+MAX_STREAMS = 2        # per process, out of the Procfile's 8 threads
+HEARTBEAT_SECONDS = 15
+FALLBACK_POLL_SECONDS = 10
+RETRY_MS = 3000
+
+_stream_slots = threading.BoundedSemaphore(MAX_STREAMS)
+
+# In-process wake-up for the non-PostgreSQL fallback
+_condition = threading.Condition()
+_generation = 0
+
+
+def _wake_local_streams():
+    global _generation
+    with _condition:
+        _generation += 1
+        _condition.notify_all()
+
+
+def publish(order, kind=KitchenEvent.KIND_STATUS):
+    """Record a kitchen-visible change to ``order`` and wake the streams."""
+    event = KitchenEvent.objects.create(
+        order_reference=order.reference, kind=kind, status=order.status,
+    )
+    if connection.vendor == "postgresql":
+        # NOTIFY is delivered when the surrounding transaction commits
+        with connection.cursor() as cursor:
+            cursor.execute("SELECT pg_notify(%s, %s)", [CHANNEL, str(event.pk)])
+    transaction.on_commit(_wake_local_streams)
+    return event
+
+
+def latest_event_id():
+    return KitchenEvent.objects.order_by("-pk").values_list("pk", flat=True).first() or 0
+
+
+def prune_events():
+    """Drop all but the newest KEEP_EVENTS rows. Called as streams (re)connect."""
+    KitchenEvent.objects.filter(pk__lte=latest_event_id() - KEEP_EVENTS).delete()
+
+
+def render_events(events, last_id):
+    """
+    Turn a batch of events into SSE messages, one per affected order, each
+    carrying the stream's position ``last_id`` as its SSE id.
+    Orders still on the board get their freshly rendered card; orders that
+    left it (completed/cancelled) get an empty ``html`` so the client drops them.
+    """
+    latest = {}
+    for event in events:
+        latest.pop(event.order_reference, None)
+        latest[event.order_reference] = event
+    orders = {
+        order.reference: order
+        for order in Order.objects.filter(
+            reference__in=latest, status__in=KITCHEN_STATUSES
+        ).prefetch_related("items")
+    }
+    messages = []
+    for reference, event in latest.items():
+        order = orders.get(reference)
+        payload = {
+            "reference": reference,
+            "status": order.status if order else event.status,
+            "html": render_to_string("orders/_kitchen_card.html", {"order": order}) if order else "",
+        }
+        messages.append(f"id: {last_id}\nevent: order\ndata: {json.dumps(payload)}\n\n")
+    return messages
+
+
+class _PostgresWaiter:
+    """Blocks on LISTEN/NOTIFY using this thread's database connection."""
+
+    def __init__(self):
+        connection.ensure_connection()
+        with connection.cursor() as cursor:
+            cursor.execute(f"LISTEN {CHANNEL}")
+        self.raw = connection.connection
+
+    def wait(self, timeout):
+        if not select.select([self.raw], [], [], max(timeout, 0))[0]:
+            return False
+        self.raw.poll()
+        self.raw.notifies.clear()
+        return True
+
+    def close(self):
+        try:
+            with connection.cursor() as cursor:
+                cursor.execute(f"UNLISTEN {CHANNEL}")
+        except Exception:
+            pass
+
+
+class _LocalWaiter:
+    """Condition-variable wake-ups within the process, slow polling across processes."""
+
+    def __init__(self):
+        self.seen = _generation
+        self.last_poll = time.monotonic()
+
+    def wait(self, timeout):
+        with _condition:
+            woke = _condition.wait_for(
+                lambda: _generation != self.seen, min(timeout, FALLBACK_POLL_SECONDS)
+            )
+            self.seen = _generation
+        now = time.monotonic()
+        if woke or now - self.last_poll >= FALLBACK_POLL_SECONDS:
+            self.last_poll = now
+            return True
+        return False
+
+    def close(self):
+        pass
+
+
+def stream(last_id):
+    """
+    Generator of SSE text for one client, starting after event ``last_id``.
+    Only touches the database when woken by a publish (or the fallback poll).
+
+    Event pks are assigned before commit, so a lower pk can become visible
+    after a higher one. Any pk up to HOLE_WINDOW below the stream's position
+    that hasn't been seen yet is kept as a *hole* and re-read on each check
+    until it turns up or is HOLE_SECONDS old (rolled back). On connect the
+    holes are worked out from the rows below ``last_id``.
+    """
+    waiter = _PostgresWaiter() if connection.vendor == "postgresql" else _LocalWaiter()
+    deadline = time.monotonic() + STREAM_SECONDS
+    last_sent = time.monotonic()
+    holes = {}  # pk -> monotonic time it was noticed missing
+    connecting = True
+    check = True
+    try:
+        yield f"retry: {RETRY_MS}\n\n"
+        while True:
+            if check:
+                now = time.monotonic()
+                holes = {pk: noticed for pk, noticed in holes.items() if now - noticed < HOLE_SECONDS}
+                start = max(last_id - HOLE_WINDOW, 0) if connecting else last_id
+                events = list(
+                    KitchenEvent.objects.filter(Q(pk__gt=start) | Q(pk__in=holes)).order_by("pk")[:100]
+                )
+                if connecting:
+                    # Rows at or below last_id were already seen; missing pks are holes
+                    present = {event.pk for event in events}
+                    holes.update((pk, now) for pk in range(start + 1, last_id + 1) if pk not in present)
+                    events = [event for event in events if event.pk > last_id]
+                    connecting = False
+                for event in events:
+                    holes.pop(event.pk, None)
+                new = [event for event in events if event.pk > last_id]
+                if new:
+                    present = {event.pk for event in new}
+                    gap = range(max(last_id, new[-1].pk - HOLE_WINDOW) + 1, new[-1].pk)
+                    holes.update((pk, now) for pk in gap if pk not in present)
+                    last_id = new[-1].pk
+                if events:
+                    yield from render_events(events, last_id)
+                    last_sent = time.monotonic()
+                    continue
+            now = time.monotonic()
+            if now >= deadline:
+                break
+            if now - last_sent >= HEARTBEAT_SECONDS:
+                yield ": keep-alive\n\n"
+                last_sent = now
+            check = waiter.wait(min(HEARTBEAT_SECONDS - (now - last_sent), deadline - now))
+    finally:
+        waiter.close()
+
+
+class _Stream:
+    """A ``stream()`` holding a slot, given back when the response is closed."""
+
+    def __init__(self, last_id):
+        self._messages = stream(last_id)
+        self._lock = threading.Lock()
+        self._open = True
+
+    def __iter__(self):
+        return self._messages
+
+    def close(self):
+        self._messages.close()
+        with self._lock:
+            if self._open:
+                self._open = False
+                _stream_slots.release()
+
+
+def open_stream(last_id):
+    """
+    The SSE stream for one client starting after ``last_id``, or None if
+    this process is already serving MAX_STREAMS of them.
+    """
+    if not _stream_slots.acquire(blocking=False):
+        return None
+    return _Stream(last_id)
@@ -0,0 +1,61 @@
+"""
+Management command: backfill_order_summaries
+
+Fills Order.item_count and Order.items_summary from the OrderItem rows.
+New orders get them at placement (see orders/services.py) and migration
+0019 filled them in for older orders, so this is for recomputing them after
+a bulk data fix. Orders are read in primary-key
+batches with their items prefetched, and each batch is written back with
+one bulk update.
+
+Usage:
+    python manage.py backfill_order_summaries                  # orders without a summary
+    python manage.py backfill_order_summaries --all            # recompute every order
+    python manage.py backfill_order_summaries --batch-size 500
+"""
+
+from django.core.management.base import BaseCommand, CommandError
+
+from orders.models import Order
+
+
+class Command(BaseCommand):
+    help = "Fill in the stored item count and summary of existing orders."
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--all", action="store_true",
+            help="Recompute every order, not only those without a summary."
+        )
+        parser.add_argument(
+            "--batch-size", type=int, default=1000,
+            help="Orders read and updated per batch (default: 1000)."
+        )
+
+    def handle(self, *args, **options):
+        batch_size = options["batch_size"]
+        if batch_size < 1:
+            raise CommandError("--batch-size must be at least 1.")
+
+        orders = Order.objects.all()
+        if not options["all"]:
+            orders = orders.filter(item_count=0)
+
+        last_pk = 0
+        updated = 0
+        while True:
+            batch = list(
+                orders.filter(pk__gt=last_pk)
+                .order_by("pk")
+                .only("pk", "item_count", "items_summary")
+                .prefetch_related("items")[:batch_size]
+            )
+            if not batch:
+                break
+            for order in batch:
+                order.set_item_summary(order.items.all())
+            Order.objects.bulk_update(batch, ["item_count", "items_summary"])
+            last_pk = batch[-1].pk
+            updated += len(batch)
+
+        self.stdout.write(self.style.SUCCESS(f"Updated the item summary of {updated} order(s)."))
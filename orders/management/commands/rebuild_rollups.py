@@ -0,0 +1,108 @@
+"""
+Management command: rebuild_rollups
+
+Recomputes the DailySalesRollup table from the Order history. Orders are
+read in primary-key batches so memory stays flat however many years of
+orders there are. The scan and the swap of old rows for new ones run in
+one transaction that holds the rollup table's write lock, so the signal
+handlers' updates for orders placed or changed meanwhile wait and are
+applied on top of the rebuilt rows rather than lost. Checkouts and status
+changes therefore pause until the rebuild finishes; run it at a quiet
+time.
+
+Migration 0016 fills the table from the existing orders; run this after
+any bulk data fix that bypassed Order.save() (e.g. a queryset.update()).
+
+Usage:
+    python manage.py rebuild_rollups                    # full rebuild
+    python manage.py rebuild_rollups --since 2025-01-01 # only from this date
+    python manage.py rebuild_rollups --batch-size 5000
+"""
+
+from collections import defaultdict
+from datetime import datetime, time
+from decimal import Decimal
+
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection, transaction
+from django.utils import timezone
+
+from orders.models import DailySalesRollup, Order
+from orders.rollups import status_bucket
+
+
+class Command(BaseCommand):
+    help = "Rebuild the daily sales rollup table from the order history."
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--since", type=str, default=None,
+            help="Only rebuild days on or after this date (YYYY-MM-DD)."
+        )
+        parser.add_argument(
+            "--batch-size", type=int, default=2000,
+            help="Orders read per query (default: 2000)."
+        )
+
+    def handle(self, *args, **options):
+        batch_size = options["batch_size"]
+        if batch_size < 1:
+            raise CommandError("--batch-size must be at least 1.")
+
+        orders = Order.objects.all()
+        since = None
+        if options["since"]:
+            try:
+                since = datetime.strptime(options["since"], "%Y-%m-%d").date()
+            except ValueError:
+                raise CommandError("--since must be a date in YYYY-MM-DD format.")
+            orders = orders.filter(
+                created_at__gte=timezone.make_aware(datetime.combine(since, time.min))
+            )
+
+        stale = DailySalesRollup.objects.all()
+        if since:
+            stale = stale.filter(date__gte=since)
+        totals = defaultdict(lambda: [0, Decimal("0.00")])
+        last_pk = 0
+        scanned = 0
+        batches = 0
+        with transaction.atomic():
+            if connection.vendor == "postgresql":
+                # Blocks rollup writes (not reads) until this transaction ends
+                table = connection.ops.quote_name(DailySalesRollup._meta.db_table)
+                with connection.cursor() as cursor:
+                    cursor.execute(f"LOCK TABLE {table} IN EXCLUSIVE MODE")
+            # Deleting first also takes SQLite's database write lock
+            stale.delete()
+            while True:
+                batch = list(
+                    orders.filter(pk__gt=last_pk)
+                    .order_by("pk")
+                    .values_list("pk", "created_at", "delivery_type", "status", "total")[:batch_size]
+                )
+                if not batch:
+                    break
+                for pk, created_at, delivery_type, status, total in batch:
+                    key = (timezone.localdate(created_at), delivery_type, status_bucket(status))
+                    totals[key][0] += 1
+                    totals[key][1] += total or 0
+                last_pk = batch[-1][0]
+                scanned += len(batch)
+                batches += 1
+
+            rows = [
+                DailySalesRollup(
+                    date=date, delivery_type=delivery_type, status_bucket=bucket,
+                    order_count=count, revenue=revenue,
+                )
+                for (date, delivery_type, bucket), (count, revenue) in totals.items()
+            ]
+            DailySalesRollup.objects.bulk_create(rows, batch_size=batch_size)
+
+        self.stdout.write(
+            self.style.SUCCESS(
+                f"Rebuilt {len(rows)} rollup row(s) from {scanned} order(s) "
+                f"in {batches} batch(es)."
+            )
+        )
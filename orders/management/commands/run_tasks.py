@@ -0,0 +1,58 @@
+"""
+Management command: run_tasks
+
+Runs queued background tasks (admin log entries, favourite-item counts
+and profile address saves — see orders/tasks.py). Web processes already
+run tasks on a background thread after each order; this is the standalone
+worker for when that is disabled (BACKGROUND_TASKS_IN_PROCESS = False),
+and a way to drain anything left behind by a restart.
+
+Usage:
+    python manage.py run_tasks                # keep running, polling for work
+    python manage.py run_tasks --once         # drain due tasks, then exit
+    python manage.py run_tasks --sleep 10     # seconds between polls
+    python manage.py run_tasks --once --limit 100
+"""
+
+import time
+
+from django.core.management.base import BaseCommand, CommandError
+from django.db import close_old_connections
+
+from orders.tasks import requeue_stale, run_pending
+
+
+class Command(BaseCommand):
+    help = "Run queued background tasks."
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--once", action="store_true",
+            help="Run the tasks that are due now, then exit."
+        )
+        parser.add_argument(
+            "--sleep", type=float, default=5,
+            help="Seconds to wait between polls when idle (default: 5)."
+        )
+        parser.add_argument(
+            "--limit", type=int, default=None,
+            help="Run at most this many tasks per pass."
+        )
+
+    def handle(self, *args, **options):
+        if options["limit"] is not None and options["limit"] < 1:
+            raise CommandError("--limit must be at least 1.")
+        if options["sleep"] <= 0:
+            raise CommandError("--sleep must be greater than 0.")
+
+        while True:
+            requeue_stale()
+            ok, failed = run_pending(limit=options["limit"])
+            if ok or failed or options["once"]:
+                self.stdout.write(
+                    self.style.SUCCESS(f"Ran {ok + failed} task(s): {ok} succeeded, {failed} failed.")
+                )
+            if options["once"]:
+                return
+            close_old_connections()
+            time.sleep(options["sleep"])
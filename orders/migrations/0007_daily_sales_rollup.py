@@ -0,0 +1,33 @@
+# Generated by Django 4.2.28 on 2026-10-16 22:45
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('orders', '0006_promoCode_first_order_only'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='DailySalesRollup',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('date', models.DateField()),
+                ('delivery_type', models.CharField(choices=[('delivery', 'Delivery'), ('collection', 'Collection')], max_length=15)),
+                ('status_bucket', models.CharField(choices=[('open', 'Open'), ('dispatched', 'Out for Delivery'), ('completed', 'Completed'), ('cancelled', 'Cancelled')], max_length=15)),
+                ('order_count', models.IntegerField(default=0)),
+                ('revenue', models.DecimalField(decimal_places=2, default=0, max_digits=12)),
+            ],
+            options={
+                'verbose_name': 'Daily Sales Rollup',
+                'verbose_name_plural': 'Daily Sales Rollups',
+                'ordering': ['-date'],
+            },
+        ),
+        migrations.AddConstraint(
+            model_name='dailysalesrollup',
+            constraint=models.UniqueConstraint(fields=('date', 'delivery_type', 'status_bucket'), name='unique_daily_sales_rollup'),
+        ),
+    ]
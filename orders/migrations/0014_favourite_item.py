@@ -0,0 +1,60 @@
+# Generated by Django 4.2.28 on 2026-10-16 23:42
+
+from django.conf import settings
+from django.db import migrations, models
+from django.db.models import Count, Max
+import django.db.models.deletion
+
+
+def backfill_favourites(apps, schema_editor):
+    """Count every customer's past order lines into FavouriteItem."""
+    OrderItem = apps.get_model("orders", "OrderItem")
+    FavouriteItem = apps.get_model("orders", "FavouriteItem")
+    rows = (
+        OrderItem.objects
+        .filter(order__user__isnull=False, menu_item__isnull=False)
+        .values("order__user_id", "menu_item_id")
+        .annotate(times=Count("id"), last=Max("order__created_at"))
+        .order_by()
+    )
+    FavouriteItem.objects.bulk_create(
+        (
+            FavouriteItem(
+                user_id=row["order__user_id"], menu_item_id=row["menu_item_id"],
+                times_ordered=row["times"], last_ordered_at=row["last"],
+            )
+            for row in rows.iterator()
+        ),
+        batch_size=1000,
+    )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('menu', '0003_seed_deal_slots'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+        ('orders', '0013_order_item_summary'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='FavouriteItem',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('times_ordered', models.PositiveIntegerField(default=0, help_text='Order lines with this item.')),
+                ('last_ordered_at', models.DateTimeField(blank=True, null=True)),
+                ('menu_item', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='+', to='menu.menuitem')),
+                ('user', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='favourite_items', to=settings.AUTH_USER_MODEL)),
+            ],
+            options={
+                'ordering': ['user', '-times_ordered', '-last_ordered_at'],
+                'indexes': [models.Index(fields=['user', '-times_ordered', '-last_ordered_at'], name='favourite_item_rank')],
+            },
+        ),
+        migrations.AddConstraint(
+            model_name='favouriteitem',
+            constraint=models.UniqueConstraint(fields=('user', 'menu_item'), name='unique_favourite_item'),
+        ),
+        migrations.RunPython(backfill_favourites, reverse_code=migrations.RunPython.noop),
+    ]
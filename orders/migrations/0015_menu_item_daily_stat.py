@@ -0,0 +1,66 @@
+# Generated by Django 4.2.28 on 2026-10-16 23:47
+
+from django.db import migrations, models
+from django.db.models import Count, DecimalField, F, Sum
+from django.db.models.functions import TruncDate
+import django.db.models.deletion
+
+
+def backfill_daily_stats(apps, schema_editor):
+    """Count the existing order lines into per-item daily rows (local dates)."""
+    OrderItem = apps.get_model("orders", "OrderItem")
+    MenuItemDailyStat = apps.get_model("orders", "MenuItemDailyStat")
+    rows = (
+        OrderItem.objects
+        .filter(menu_item__isnull=False)
+        .annotate(day=TruncDate("order__created_at"))
+        .values("day", "menu_item_id")
+        .annotate(
+            lines=Count("id"),
+            units=Sum("quantity"),
+            takings=Sum(F("item_price") * F("quantity"), output_field=DecimalField(max_digits=10, decimal_places=2)),
+        )
+        .order_by()
+    )
+    MenuItemDailyStat.objects.bulk_create(
+        (
+            MenuItemDailyStat(
+                date=row["day"], menu_item_id=row["menu_item_id"],
+                order_count=row["lines"], quantity=row["units"], revenue=row["takings"],
+            )
+            for row in rows.iterator()
+        ),
+        batch_size=1000,
+    )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('menu', '0003_seed_deal_slots'),
+        ('orders', '0014_favourite_item'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='MenuItemDailyStat',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('date', models.DateField()),
+                ('order_count', models.PositiveIntegerField(default=0, help_text='Order lines with this item.')),
+                ('quantity', models.PositiveIntegerField(default=0)),
+                ('revenue', models.DecimalField(decimal_places=2, default=0, max_digits=10)),
+                ('menu_item', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='daily_stats', to='menu.menuitem')),
+            ],
+            options={
+                'verbose_name': 'Menu Item Daily Stat',
+                'verbose_name_plural': 'Menu Item Daily Stats',
+                'ordering': ['-date'],
+            },
+        ),
+        migrations.AddConstraint(
+            model_name='menuitemdailystat',
+            constraint=models.UniqueConstraint(fields=('date', 'menu_item'), name='unique_menu_item_daily_stat'),
+        ),
+        migrations.RunPython(backfill_daily_stats, reverse_code=migrations.RunPython.noop),
+    ]
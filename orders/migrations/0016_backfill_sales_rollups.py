@@ -0,0 +1,53 @@
+from collections import defaultdict
+from decimal import Decimal
+
+from django.db import migrations
+from django.db.models import Count, Sum
+from django.db.models.functions import TruncDate
+
+# Status -> rollup bucket, as in orders/rollups.py at the time of writing
+STATUS_BUCKETS = {
+    "out_for_delivery": "dispatched",
+    "completed": "completed",
+    "cancelled": "cancelled",
+}
+
+
+def backfill_sales_rollups(apps, schema_editor):
+    """Rebuild the rollup rows from the existing orders (local dates), like rebuild_rollups."""
+    Order = apps.get_model("orders", "Order")
+    DailySalesRollup = apps.get_model("orders", "DailySalesRollup")
+    rows = (
+        Order.objects
+        .annotate(day=TruncDate("created_at"))
+        .values("day", "delivery_type", "status")
+        .annotate(orders=Count("id"), takings=Sum("total"))
+        .order_by()
+    )
+    totals = defaultdict(lambda: [0, Decimal("0.00")])
+    for row in rows.iterator():
+        key = (row["day"], row["delivery_type"], STATUS_BUCKETS.get(row["status"], "open"))
+        totals[key][0] += row["orders"]
+        totals[key][1] += row["takings"] or 0
+    DailySalesRollup.objects.all().delete()
+    DailySalesRollup.objects.bulk_create(
+        (
+            DailySalesRollup(
+                date=date, delivery_type=delivery_type, status_bucket=bucket,
+                order_count=count, revenue=revenue,
+            )
+            for (date, delivery_type, bucket), (count, revenue) in totals.items()
+        ),
+        batch_size=1000,
+    )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('orders', '0015_menu_item_daily_stat'),
+    ]
+
+    operations = [
+        migrations.RunPython(backfill_sales_rollups, reverse_code=migrations.RunPython.noop),
+    ]
@@ -0,0 +1,32 @@
+from django.db import migrations, models
+import django.db.models.deletion
+
+
+def copy_promo_codes(apps, schema_editor):
+    """Fill the new code column from each redemption's PromoCode."""
+    PromoCode = apps.get_model("orders", "PromoCode")
+    PromoRedemption = apps.get_model("orders", "PromoRedemption")
+    for promo_id, code in PromoCode.objects.filter(redemptions__isnull=False).distinct().values_list("pk", "code"):
+        PromoRedemption.objects.filter(promo_id=promo_id).update(code=code)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('orders', '0017_rate_limit_counter'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='promoredemption',
+            name='code',
+            field=models.CharField(default='', max_length=30),
+            preserve_default=False,
+        ),
+        migrations.AlterField(
+            model_name='promoredemption',
+            name='promo',
+            field=models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.SET_NULL, related_name='redemptions', to='orders.promocode'),
+        ),
+        migrations.RunPython(copy_promo_codes, reverse_code=migrations.RunPython.noop),
+    ]
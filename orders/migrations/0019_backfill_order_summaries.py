@@ -0,0 +1,40 @@
+from django.db import migrations
+
+# Order.items_summary's max_length at the time of writing
+ITEMS_SUMMARY_LENGTH = 255
+BATCH_SIZE = 1000
+
+
+def backfill_order_summaries(apps, schema_editor):
+    """Fill item_count and items_summary of existing orders, like backfill_order_summaries."""
+    Order = apps.get_model("orders", "Order")
+    last_pk = 0
+    while True:
+        batch = list(
+            Order.objects.filter(pk__gt=last_pk, item_count=0)
+            .order_by("pk")
+            .only("pk", "item_count", "items_summary")
+            .prefetch_related("items")[:BATCH_SIZE]
+        )
+        if not batch:
+            break
+        for order in batch:
+            items = list(order.items.all())
+            order.item_count = sum(item.quantity for item in items)
+            summary = ", ".join(f"{item.quantity}× {item.item_name}" for item in items)
+            if len(summary) > ITEMS_SUMMARY_LENGTH:
+                summary = summary[:ITEMS_SUMMARY_LENGTH - 1].rstrip(", ") + "…"
+            order.items_summary = summary
+        Order.objects.bulk_update(batch, ["item_count", "items_summary"])
+        last_pk = batch[-1].pk
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('orders', '0018_promo_redemption_code'),
+    ]
+
+    operations = [
+        migrations.RunPython(backfill_order_summaries, reverse_code=migrations.RunPython.noop),
+    ]
@@ -1,5 +1,8 @@
 """
-Orders app models — OpeningHours, Order, and OrderItem.
+Orders app models — OpeningHours, Order, OrderItem, DailySalesRollup,
+MenuItemDailyStat, FavouriteItem, the KitchenEvent change feed, the
+BackgroundTask queue, RateLimitCounter, and PromoCode with its
+PromoRedemption ledger.
 Orders are linked to the user account so they appear in order history.
 OrderItem stores a snapshot of the item price at time of purchase,
 so the receipt remains accurate even if prices change later.
@@ -7,7 +10,8 @@ so the receipt remains accurate even if prices change later.
 
 import uuid
 from decimal import Decimal
-from django.db import models
+from django.db import models, transaction
+from django.utils import timezone
 from django.contrib.auth.models import User
 from menu.models import MenuItem
 
@@ -44,6 +48,12 @@ class OpeningHours(models.Model):
         return f"{self.get_day_display()}: {self.opening_time} \u2013 {self.closing_time}"
 
 
+# Orders still on the kitchen display (also the condition of a partial index)
+KITCHEN_STATUSES = ["pending", "confirmed", "preparing", "ready"]
+
+ITEMS_SUMMARY_LENGTH = 255
+
+
 class Order(models.Model):
     """
     Represents a customer order. Linked to a User account.
@@ -120,26 +130,63 @@ class Order(models.Model):
     discount_amount = models.DecimalField(max_digits=6, decimal_places=2, default=0)
     promo_code = models.CharField(max_length=30, blank=True)
     total = models.DecimalField(max_digits=8, decimal_places=2, default=0)
+
+    # Written once at placement so lists can show the items without loading
+    # OrderItem rows; ``manage.py backfill_order_summaries`` fills older orders
+    item_count = models.PositiveIntegerField(default=0, help_text="Total quantity of items in the order.")
+    items_summary = models.CharField(max_length=ITEMS_SUMMARY_LENGTH, blank=True)
+
     created_at = models.DateTimeField(auto_now_add=True)
     updated_at = models.DateTimeField(auto_now=True)
 
     class Meta:
         ordering = ["-created_at"]
+        indexes = [
+            # Newest-first lists, dashboard "recent orders", and date-range
+            # filters (popular items, stats)
+            models.Index(fields=["created_at"], name="order_created_at"),
+            # Order history (keyset pages on created_at, id) and "has this
+            # customer ordered before?"
+            models.Index(fields=["user", "-created_at", "-id"], name="order_user_created_id"),
+            # The kitchen board: only the few active orders, oldest first
+            models.Index(
+                fields=["created_at"],
+                name="order_kitchen_active",
+                condition=models.Q(status__in=KITCHEN_STATUSES),
+            ),
+        ]
 
     def __str__(self):
         return f"Order #{self.reference} — {self.full_name}"
 
     def save(self, *args, **kwargs):
-        """Generate a short unique reference on first save."""
+        """
+        Generate a short unique reference on first save.
+        The save runs in a transaction so the post_save sales rollup update
+        (see orders/rollups.py) commits or rolls back together with the order.
+        """
         if not self.reference:
             self.reference = uuid.uuid4().hex[:8].upper()
-        super().save(*args, **kwargs)
+        with transaction.atomic():
+            super().save(*args, **kwargs)
 
     @property
     def is_delivery(self):
         """Returns True if this is a delivery order."""
         return self.delivery_type == self.DELIVERY
 
+    def set_item_summary(self, items):
+        """
+        Fill ``item_count`` and ``items_summary`` ("2× Kung Pao Chicken,
+        1× Egg Fried Rice") from the order's OrderItems. Doesn't save.
+        """
+        items = list(items)
+        self.item_count = sum(item.quantity for item in items)
+        summary = ", ".join(f"{item.quantity}\u00d7 {item.item_name}" for item in items)
+        if len(summary) > ITEMS_SUMMARY_LENGTH:
+            summary = summary[:ITEMS_SUMMARY_LENGTH - 1].rstrip(", ") + "\u2026"
+        self.items_summary = summary
+
 
 class OrderItem(models.Model):
     """
@@ -171,6 +218,178 @@ class OrderItem(models.Model):
         return self.item_price * self.quantity
 
 
+class DailySalesRollup(models.Model):
+    """
+    Order count and revenue per (local date, delivery type, status bucket).
+    Maintained incrementally from Order writes by orders/rollups.py so
+    dashboards read one row per day instead of scanning every order.
+    Rebuild from scratch with ``manage.py rebuild_rollups``.
+    """
+
+    BUCKET_OPEN = "open"
+    BUCKET_DISPATCHED = "dispatched"
+    BUCKET_COMPLETED = "completed"
+    BUCKET_CANCELLED = "cancelled"
+
+    BUCKET_CHOICES = [
+        (BUCKET_OPEN, "Open"),
+        (BUCKET_DISPATCHED, "Out for Delivery"),
+        (BUCKET_COMPLETED, "Completed"),
+        (BUCKET_CANCELLED, "Cancelled"),
+    ]
+
+    date = models.DateField()
+    delivery_type = models.CharField(max_length=15, choices=Order.DELIVERY_CHOICES)
+    status_bucket = models.CharField(max_length=15, choices=BUCKET_CHOICES)
+    order_count = models.IntegerField(default=0)
+    revenue = models.DecimalField(max_digits=12, decimal_places=2, default=0)
+
+    class Meta:
+        ordering = ["-date"]
+        verbose_name = "Daily Sales Rollup"
+        verbose_name_plural = "Daily Sales Rollups"
+        constraints = [
+            models.UniqueConstraint(
+                fields=["date", "delivery_type", "status_bucket"],
+                name="unique_daily_sales_rollup",
+            ),
+        ]
+
+    def __str__(self):
+        return f"{self.date} {self.delivery_type}/{self.status_bucket}: {self.order_count} (£{self.revenue})"
+
+
+class MenuItemDailyStat(models.Model):
+    """
+    How much of one menu item was ordered on one (local) day: order lines,
+    quantity and revenue. Counted up as each order is placed, in the same
+    transaction (see orders/popularity.py), so ``update_popular_items``
+    ranks items from a few rows per day instead of scanning OrderItem.
+    """
+
+    date = models.DateField()
+    menu_item = models.ForeignKey(MenuItem, on_delete=models.CASCADE, related_name="daily_stats")
+    order_count = models.PositiveIntegerField(default=0, help_text="Order lines with this item.")
+    quantity = models.PositiveIntegerField(default=0)
+    revenue = models.DecimalField(max_digits=10, decimal_places=2, default=0)
+
+    class Meta:
+        ordering = ["-date"]
+        verbose_name = "Menu Item Daily Stat"
+        verbose_name_plural = "Menu Item Daily Stats"
+        constraints = [
+            models.UniqueConstraint(fields=["date", "menu_item"], name="unique_menu_item_daily_stat"),
+        ]
+
+    def __str__(self):
+        return f"{self.date} {self.menu_item_id}: {self.quantity} (£{self.revenue})"
+
+
+class FavouriteItem(models.Model):
+    """
+    How often a customer has ordered a menu item — the "Your favourites"
+    row on the menu page. Counted up after each order by the
+    record_favourites background task (see orders/favourites.py), so the
+    menu page reads a few rows instead of aggregating the order history.
+    """
+
+    user = models.ForeignKey(User, on_delete=models.CASCADE, related_name="favourite_items")
+    menu_item = models.ForeignKey(MenuItem, on_delete=models.CASCADE, related_name="+")
+    times_ordered = models.PositiveIntegerField(default=0, help_text="Order lines with this item.")
+    last_ordered_at = models.DateTimeField(null=True, blank=True)
+
+    class Meta:
+        ordering = ["user", "-times_ordered", "-last_ordered_at"]
+        constraints = [
+            models.UniqueConstraint(fields=["user", "menu_item"], name="unique_favourite_item"),
+        ]
+        indexes = [
+            models.Index(fields=["user", "-times_ordered", "-last_ordered_at"], name="favourite_item_rank"),
+        ]
+
+    def __str__(self):
+        return f"{self.user} — {self.menu_item.name} (×{self.times_ordered})"
+
+
+class KitchenEvent(models.Model):
+    """
+    Append-only change feed for the kitchen display: one row per order
+    placed or status change. The kitchen stream (orders/kitchen_feed.py)
+    replays rows newer than the client's last seen id. Only the most
+    recent few hundred rows are kept.
+    """
+
+    KIND_CREATED = "created"
+    KIND_STATUS = "status"
+
+    KIND_CHOICES = [
+        (KIND_CREATED, "Order placed"),
+        (KIND_STATUS, "Status changed"),
+    ]
+
+    order_reference = models.CharField(max_length=12)
+    kind = models.CharField(max_length=10, choices=KIND_CHOICES)
+    status = models.CharField(max_length=20, choices=Order.STATUS_CHOICES)
+    created_at = models.DateTimeField(auto_now_add=True)
+
+    class Meta:
+        ordering = ["id"]
+
+    def __str__(self):
+        return f"#{self.pk} {self.order_reference} {self.kind} → {self.status}"
+
+
+class BackgroundTask(models.Model):
+    """
+    A queued side effect (admin log entry, favourite-item counts, profile
+    address) that runs after the request that created it has returned.
+    Rows are written in the same transaction as the change that caused
+    them and deleted once they succeed. See orders/tasks.py.
+    """
+
+    STATUS_PENDING = "pending"
+    STATUS_RUNNING = "running"
+    STATUS_FAILED = "failed"
+
+    STATUS_CHOICES = [
+        (STATUS_PENDING, "Pending"),
+        (STATUS_RUNNING, "Running"),
+        (STATUS_FAILED, "Failed"),
+    ]
+
+    name = models.CharField(max_length=50)
+    payload = models.JSONField(default=dict)
+    status = models.CharField(max_length=10, choices=STATUS_CHOICES, default=STATUS_PENDING)
+    attempts = models.PositiveSmallIntegerField(default=0)
+    last_error = models.TextField(blank=True)
+    run_after = models.DateTimeField(default=timezone.now)
+    locked_at = models.DateTimeField(null=True, blank=True)
+    created_at = models.DateTimeField(auto_now_add=True)
+
+    class Meta:
+        ordering = ["id"]
+        indexes = [models.Index(fields=["status", "run_after"], name="background_task_due")]
+
+    def __str__(self):
+        return f"{self.name} #{self.pk} ({self.status})"
+
+
+class RateLimitCounter(models.Model):
+    """
+    Shared hit count for one client in one rate-limit window, keyed
+    ``rl:<scope>:<client>:<window>``. Only ever changed with a single
+    atomic upsert or decrement (see orders/ratelimit.py), so workers
+    racing on the same key each get their own total.
+    """
+
+    key = models.CharField(max_length=200, unique=True)
+    hits = models.PositiveIntegerField(default=0)
+    expires_at = models.DateTimeField(db_index=True)
+
+    def __str__(self):
+        return f"{self.key}: {self.hits}"
+
+
 class PromoCode(models.Model):
     """
     Discount/promo codes redeemable at checkout.
@@ -240,6 +459,57 @@ class PromoCode(models.Model):
             discount = self.value
         return min(discount, subtotal).quantize(Decimal("0.01"))
 
+    def redeem(self, order):
+        """
+        Use the code for ``order``: one conditional UPDATE that only adds a
+        use while the code is active, in date and under ``max_uses``, then a
+        PromoRedemption row. Returns the redemption, or None if the code
+        can't be used any more. Call inside the order's transaction so the
+        use is given back if the order fails.
+        """
+        now = timezone.now()
+        claimed = PromoCode.objects.filter(
+            models.Q(max_uses=0) | models.Q(uses_count__lt=models.F("max_uses")),
+            models.Q(valid_from__isnull=True) | models.Q(valid_from__lte=now),
+            models.Q(valid_until__isnull=True) | models.Q(valid_until__gte=now),
+            pk=self.pk,
+            active=True,
+        ).update(uses_count=models.F("uses_count") + 1)
+        if not claimed:
+            return None
+        return PromoRedemption.objects.create(
+            promo=self, code=self.code, order=order, user=order.user,
+            discount_amount=order.discount_amount,
+        )
+
+
+class PromoRedemption(models.Model):
+    """
+    Ledger of promo code uses — one row per order that used a code.
+    Written together with the ``uses_count`` increment (see
+    PromoCode.redeem), so the two always agree. The code is copied onto
+    the row so the ledger still reads correctly once the PromoCode itself
+    has been deleted.
+    """
+
+    promo = models.ForeignKey(
+        PromoCode, on_delete=models.SET_NULL, null=True, blank=True, related_name="redemptions"
+    )
+    code = models.CharField(max_length=30)
+    order = models.OneToOneField(Order, on_delete=models.CASCADE, related_name="promo_redemption")
+    user = models.ForeignKey(
+        User, on_delete=models.SET_NULL, null=True, blank=True, related_name="promo_redemptions"
+    )
+    discount_amount = models.DecimalField(max_digits=6, decimal_places=2)
+    created_at = models.DateTimeField(auto_now_add=True)
+
+    class Meta:
+        ordering = ["-created_at"]
+        indexes = [models.Index(fields=["promo", "user"], name="promo_redemption_user")]
+
+    def __str__(self):
+        return f"{self.code} on #{self.order.reference}"
+
 
 class SiteAnnouncement(models.Model):
     """Admin-controlled banner displayed at the top of every public page."""
@@ -0,0 +1,77 @@
+"""
+Per-item daily order counters and the popularity ranking built on them.
+
+Placing an order adds its lines to today's MenuItemDailyStat rows (one per
+menu item per local day) inside the order's transaction, like the sales
+rollups. It takes two queries however many lines the order has: the
+missing rows are inserted empty, then all of them are counted up in one
+UPDATE with a CASE per item.
+
+``popular_item_ids`` scores items over a sliding window of the last N days
+by summing their daily rows — order lines (the old OrderItem count),
+quantity or revenue — so ``update_popular_items`` reads at most
+days × items small rows instead of every OrderItem in the window.
+"""
+
+from collections import defaultdict
+from datetime import timedelta
+from decimal import Decimal
+
+from django.db.models import Case, DecimalField, F, IntegerField, Sum, Value, When
+from django.utils import timezone
+
+from .models import MenuItemDailyStat
+
+RANK_FIELDS = {
+    "orders": "order_count",
+    "quantity": "quantity",
+    "revenue": "revenue",
+}
+
+
+def _increments(lines, field, output_field):
+    return Case(
+        *(When(menu_item_id=pk, then=Value(totals[field])) for pk, totals in lines.items()),
+        default=Value(0),
+        output_field=output_field,
+    )
+
+
+def record_item_stats(items, ordered_at=None):
+    """Count an order's OrderItems into the day's MenuItemDailyStat rows."""
+    lines = defaultdict(lambda: {"order_count": 0, "quantity": 0, "revenue": Decimal("0.00")})
+    for item in items:
+        if item.menu_item_id is None:
+            continue
+        totals = lines[item.menu_item_id]
+        totals["order_count"] += 1
+        totals["quantity"] += item.quantity
+        totals["revenue"] += item.item_price * item.quantity
+    if not lines:
+        return
+    date = timezone.localdate(ordered_at or timezone.now())
+    MenuItemDailyStat.objects.bulk_create(
+        [MenuItemDailyStat(date=date, menu_item_id=pk) for pk in lines],
+        ignore_conflicts=True,
+    )
+    MenuItemDailyStat.objects.filter(date=date, menu_item_id__in=lines).update(
+        order_count=F("order_count") + _increments(lines, "order_count", IntegerField()),
+        quantity=F("quantity") + _increments(lines, "quantity", IntegerField()),
+        revenue=F("revenue") + _increments(lines, "revenue", DecimalField(max_digits=10, decimal_places=2)),
+    )
+
+
+def popular_item_ids(top, days, rank_by="orders"):
+    """
+    The ``top`` menu item ids with the highest ``rank_by`` score (a key of
+    RANK_FIELDS) over the last ``days`` days, including today.
+    """
+    since = timezone.localdate() - timedelta(days=days - 1)
+    return list(
+        MenuItemDailyStat.objects
+        .filter(date__gte=since)
+        .values("menu_item_id")
+        .annotate(score=Sum(RANK_FIELDS[rank_by]))
+        .order_by("-score", "menu_item_id")[:top]
+        .values_list("menu_item_id", flat=True)
+    )
@@ -0,0 +1,130 @@
+"""
+In-memory promo code registry and first-order eligibility.
+
+Every basket interaction used to look promo codes up in the database —
+to revalidate the applied code, to see whether it is a locked first-order
+code, to find the first-order discount, to apply a typed-in code — often
+more than once per request. ``PromoRegistry`` loads every PromoCode once
+into a dict keyed by the normalised (upper-case) code and answers all of
+those locally.
+
+The registry belongs to a *promo version* held in the cache. Any PromoCode
+save or delete, and a checkout that redeems a code (whose ``update()``
+skips the signals), bump the version (see orders/signals.py and
+orders/services.py); each process notices on its next lookup and
+reloads. "promo:" is a local prefix of the tiered cache, so checking the
+version costs no query.
+
+Validity and discounts are computed from the registry's copies, so a
+``uses_count`` seen here can be slightly behind. Checkout re-reads the code
+from the database before placing the order, so capped codes are still
+enforced there.
+
+First-order eligibility is the ``UserProfile.has_ordered`` flag, set in the
+same transaction as the customer's first order (see orders/signals.py).
+"""
+
+import time
+
+from django.core.cache import cache
+from django.db import transaction
+
+from .models import Order, PromoCode
+
+PROMO_VERSION_KEY = "promo:version"
+
+
+def normalize_code(code):
+    return (code or "").strip().upper()
+
+
+class PromoRegistry:
+    """Every PromoCode at one promo version, keyed by normalised code."""
+
+    def __init__(self, version, promos):
+        self.version = version
+        self.promos = {normalize_code(promo.code): promo for promo in promos}
+        # PromoCode is ordered newest first, so the newest active one wins
+        self.first_order_promo = next(
+            (promo for promo in promos if promo.first_order_only and promo.active), None
+        )
+
+    @classmethod
+    def from_database(cls, version):
+        return cls(version, list(PromoCode.objects.all()))
+
+    def get(self, code):
+        """The PromoCode for ``code`` (any case, surrounding spaces ignored), or None."""
+        return self.promos.get(normalize_code(code))
+
+    def is_first_order_code(self, code):
+        promo = self.get(code)
+        return promo is not None and promo.first_order_only
+
+
+def get_promo_version():
+    """Current promo version, seeded from the clock like the menu version."""
+    version = cache.get(PROMO_VERSION_KEY)
+    if version is None:
+        version = int(time.time() * 1000)
+        if not cache.add(PROMO_VERSION_KEY, version, None):
+            version = cache.get(PROMO_VERSION_KEY, version)
+    return version
+
+
+def bump_promo_version():
+    """Make every process reload its registry on the next lookup."""
+    try:
+        return cache.incr(PROMO_VERSION_KEY)
+    except ValueError:
+        version = int(time.time() * 1000)
+        cache.set(PROMO_VERSION_KEY, version, None)
+        return version
+
+
+def promo_codes_changed():
+    """
+    Call after writing PromoCode rows. The version is bumped straight away
+    and again once the write commits, so a process that reloads in between
+    (still seeing the old rows) doesn't keep that registry.
+    """
+    bump_promo_version()
+    transaction.on_commit(bump_promo_version)
+
+
+_registry = None
+
+
+def get_promo_registry():
+    """This process's registry, reloaded if the promo version has moved on."""
+    global _registry
+    version = get_promo_version()
+    registry = _registry
+    if registry is None or registry.version != version:
+        registry = _registry = PromoRegistry.from_database(version)
+    return registry
+
+
+def get_promo(code):
+    """The PromoCode for a code typed or stored in the basket, or None."""
+    return get_promo_registry().get(code)
+
+
+def get_first_order_promo():
+    """The PromoCode auto-applied to a customer's first order, or None."""
+    return get_promo_registry().first_order_promo
+
+
+def is_first_order_code(code):
+    """True if ``code`` is a first-order-only code (these can't be removed)."""
+    return bool(code) and get_promo_registry().is_first_order_code(code)
+
+
+def is_first_order_customer(user):
+    """True for a signed-in customer who has never placed an order."""
+    if not user.is_authenticated:
+        return False
+    profile = getattr(user, "profile", None)
+    if profile is None:
+        return not Order.objects.filter(user=user).exists()
+    return not profile.has_ordered
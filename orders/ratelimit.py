@@ -0,0 +1,258 @@
+"""
+Sliding-window rate limiting for the orders and reviews views.
+
+Each limiter counts hits per client in fixed windows of ``period`` seconds
+and estimates the sliding window as
+
+    previous_window_count * (fraction of it still in range) + current_count
+
+Counts live in the RateLimitCounter table under
+``rl:<scope>:<client>:<window>`` and are only ever changed with one atomic
+upsert that returns the new total (``add_hits``), never a read-then-write,
+so hits racing in different workers each see their own total. (The cache
+can't do this: DatabaseCache's ``incr`` is a get followed by a set.)
+
+In front of that sits a per-worker in-memory tier, guarded by a lock.
+While a client is well under the limit (``local_share`` of it), hits are
+only counted locally and pushed in one upsert every ``sync_interval``
+seconds. Close to the limit, every hit is synced, so the shared count
+decides. The limiter's lock only covers the local bookkeeping; database
+round trips happen after it is released, one client's at a time.
+
+Within one process the limit is exact. Across processes it can be
+overshot by at most the hits other workers are still holding locally
+(each below ``limit * local_share``). Set ``local_share=0`` to sync every
+hit. Each limiter deletes expired counters once per window.
+
+Usage:
+
+    @rate_limit("checkout", limit=5, period=60)
+    def checkout(request):
+        if request.rate_limited:
+            ...
+
+    if is_rate_limited(request, "guest_review_lookup", limit=10):
+        ...
+"""
+
+import threading
+import time
+from contextlib import nullcontext
+from datetime import timedelta
+from functools import wraps
+
+from django.db import connection
+from django.db.models import F
+from django.utils import timezone
+
+from .models import RateLimitCounter
+
+MAX_LOCAL_CLIENTS = 10000
+
+
+def client_ip(request):
+    """Best-effort client address — first X-Forwarded-For hop behind Heroku's router."""
+    return (
+        request.META.get("HTTP_X_FORWARDED_FOR", "").split(",")[0].strip()
+        or request.META.get("REMOTE_ADDR", "anon")
+    )
+
+
+class _ClientState:
+    __slots__ = (
+        "window", "previous", "shared", "pending", "in_flight", "synced_at", "previous_synced", "sync_lock",
+    )
+
+    def __init__(self, window):
+        self.window = window
+        self.previous = 0          # count for window - 1 (local view until synced)
+        self.shared = 0            # current-window count as last read from the database
+        self.pending = 0           # hits accepted locally, not yet pushed
+        self.in_flight = 0         # hits being pushed by other threads right now
+        self.sync_lock = threading.Lock()  # one push at a time per client
+        self.synced_at = 0.0
+        self.previous_synced = False
+
+
+class SlidingWindowLimiter:
+    """Allow ``limit`` hits per client in any ``period``-second sliding window."""
+
+    def __init__(self, scope, limit, period=60, sync_interval=1.0, local_share=0.5):
+        self.scope = scope
+        self.limit = limit
+        self.period = period
+        self.sync_interval = sync_interval
+        self.local_share = local_share
+        self._lock = threading.Lock()
+        self._clients = {}
+        self._purged_window = None
+
+    def _key(self, ident, window):
+        return f"rl:{self.scope}:{ident}:{window}"
+
+    def _push(self, ident, window, count):
+        """Atomically add ``count`` to a window counter; return the new total."""
+        expires_at = timezone.now() + timedelta(seconds=self.period * 2 + 5)
+        return add_hits(self._key(ident, window), count, expires_at)
+
+    def _state(self, ident, window):
+        """
+        This client's local state, moved on to ``window``. Also returns the
+        (window, hits) still pending from an earlier window, for the caller
+        to push once it has released the lock.
+        """
+        unpushed = None
+        state = self._clients.get(ident)
+        if state is None:
+            if len(self._clients) >= MAX_LOCAL_CLIENTS:
+                self._clients = {
+                    k: s for k, s in self._clients.items() if s.window >= window - 1
+                }
+            state = self._clients[ident] = _ClientState(window)
+        elif state.window != window:
+            if state.pending:
+                unpushed = (state.window, state.pending)
+            last_total = state.shared + state.pending
+            state.previous = last_total if state.window == window - 1 else 0
+            state.window = window
+            state.shared = state.pending = state.in_flight = 0
+            state.synced_at = 0.0
+            state.previous_synced = False
+        return state, unpushed
+
+    def hit(self, ident):
+        """Record one hit for ``ident``; return True if it's within the limit."""
+        now = time.time()
+        window = int(now // self.period)
+        weight = 1 - (now % self.period) / self.period
+        with self._lock:
+            state, unpushed = self._state(ident, window)
+            purge = self._purged_window != window
+            self._purged_window = window
+            estimate = state.previous * weight + state.shared + state.pending + 1
+            # Shared counts only grow within a window, so a local "no" is final
+            if estimate > self.limit:
+                allowed = False
+            elif (estimate + state.in_flight <= self.limit * self.local_share
+                    and now - state.synced_at < self.sync_interval):
+                state.pending += 1
+                allowed = True
+            else:
+                allowed = None  # the shared count decides
+                count, state.pending = state.pending + 1, 0
+                state.in_flight += count
+                state.synced_at = now
+                read_previous = not state.previous_synced
+
+        # Database round trips happen outside the lock
+        if unpushed:
+            self._push(ident, *unpushed)
+        if purge:
+            purge_expired()
+        if allowed is not None:
+            return allowed
+
+        # The client's pushes go one at a time, so each decision has seen
+        # every hit this process accepted before it
+        with state.sync_lock:
+            shared = self._push(ident, window, count)
+            previous = read_hits(self._key(ident, window - 1)) if read_previous else 0
+            with self._lock:
+                if state.window == window:
+                    state.in_flight -= count
+                    state.shared = max(state.shared, shared)
+                    state.previous = previous = max(state.previous, previous)
+                    state.previous_synced = True
+                over = previous * weight + shared > self.limit
+            if over:
+                # Over the limit — take our hit back out so it doesn't count
+                take_back_hit(self._key(ident, window))
+                with self._lock:
+                    if state.window == window and state.shared == shared:
+                        state.shared -= 1
+            return not over
+
+
+# SQLite reports a concurrent write as an error instead of waiting, and it
+# only has one writer at a time anyway, so there threads take turns
+_sqlite_lock = threading.Lock()
+
+
+def _counter_queries():
+    return _sqlite_lock if connection.vendor == "sqlite" else nullcontext()
+
+
+def add_hits(key, count, expires_at):
+    """
+    Add ``count`` to the counter ``key`` (creating it) in one atomic
+    INSERT ... ON CONFLICT DO UPDATE ... RETURNING, and return the new total.
+    Supported by PostgreSQL and SQLite 3.35+.
+    """
+    table = connection.ops.quote_name(RateLimitCounter._meta.db_table)
+    column = connection.ops.quote_name("key")
+    with _counter_queries(), connection.cursor() as cursor:
+        cursor.execute(
+            f"INSERT INTO {table} ({column}, hits, expires_at) VALUES (%s, %s, %s) "
+            f"ON CONFLICT ({column}) DO UPDATE SET hits = {table}.hits + excluded.hits "
+            f"RETURNING hits",
+            [key, count, connection.ops.adapt_datetimefield_value(expires_at)],
+        )
+        return cursor.fetchone()[0]
+
+
+def read_hits(key):
+    with _counter_queries():
+        return RateLimitCounter.objects.filter(key=key).values_list("hits", flat=True).first() or 0
+
+
+def take_back_hit(key):
+    with _counter_queries():
+        RateLimitCounter.objects.filter(key=key, hits__gt=0).update(hits=F("hits") - 1)
+
+
+def purge_expired():
+    """Delete counters for windows that no longer count. Run once per window per limiter."""
+    with _counter_queries():
+        RateLimitCounter.objects.filter(expires_at__lt=timezone.now()).delete()
+
+
+_limiters = {}
+_limiters_lock = threading.Lock()
+
+
+def get_limiter(scope, limit, period=60, **options):
+    """Return the process-wide limiter for this scope, creating it once."""
+    key = (scope, limit, period)
+    with _limiters_lock:
+        if key not in _limiters:
+            _limiters[key] = SlidingWindowLimiter(scope, limit, period, **options)
+        return _limiters[key]
+
+
+def reset_limiters():
+    """Forget every limiter's local state (tests)."""
+    with _limiters_lock:
+        _limiters.clear()
+
+
+def is_rate_limited(request, scope, limit, period=60, key=client_ip):
+    """Count this request against ``scope``; True if it should be refused."""
+    return not get_limiter(scope, limit, period).hit(key(request))
+
+
+def rate_limit(scope, limit, period=60, key=client_ip, methods=("POST",)):
+    """
+    View decorator: counts requests with one of ``methods`` and sets
+    ``request.rate_limited``. The view decides how to answer a limited
+    request (JSON 429, message + redirect, ...).
+    """
+    def decorator(view_func):
+        @wraps(view_func)
+        def wrapped(request, *args, **kwargs):
+            request.rate_limited = (
+                request.method in methods
+                and is_rate_limited(request, scope, limit, period, key)
+            )
+            return view_func(request, *args, **kwargs)
+        return wrapped
+    return decorator
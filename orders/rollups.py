@@ -0,0 +1,104 @@
+"""
+Incremental maintenance of DailySalesRollup.
+
+Every Order contributes a small "rollup state" — (local date, delivery
+type, status bucket, total). When the order is saved or deleted the signal
+handlers in orders/signals.py read its old state from the stored row under
+a row lock, then move one order's worth of count and revenue from the old
+rollup row to the new one, inside the same transaction as the order write.
+Two stale copies of the same order saved at once therefore apply their
+changes one after the other instead of both moving the same counts.
+Orders are bucketed by the day they were placed in the restaurant's local
+time, not the day their status changed.
+
+Bulk ``queryset.update()`` calls bypass signals; run
+``manage.py rebuild_rollups`` after any such data fix.
+"""
+
+from decimal import Decimal
+
+from django.db import IntegrityError, transaction
+from django.db.models import F
+from django.utils import timezone
+
+from .models import DailySalesRollup, Order
+
+STATUS_BUCKETS = {
+    Order.STATUS_PENDING:          DailySalesRollup.BUCKET_OPEN,
+    Order.STATUS_CONFIRMED:        DailySalesRollup.BUCKET_OPEN,
+    Order.STATUS_PREPARING:        DailySalesRollup.BUCKET_OPEN,
+    Order.STATUS_READY:            DailySalesRollup.BUCKET_OPEN,
+    Order.STATUS_OUT_FOR_DELIVERY: DailySalesRollup.BUCKET_DISPATCHED,
+    Order.STATUS_COMPLETED:        DailySalesRollup.BUCKET_COMPLETED,
+    Order.STATUS_CANCELLED:        DailySalesRollup.BUCKET_CANCELLED,
+}
+
+STATE_FIELDS = ("created_at", "delivery_type", "status", "total")
+
+
+def status_bucket(status):
+    return STATUS_BUCKETS.get(status, DailySalesRollup.BUCKET_OPEN)
+
+
+def state_from_values(values):
+    """
+    Return the (date, delivery_type, bucket, total) an order with these
+    field values contributes, or None if any of them is missing.
+    """
+    if values is None or any(field not in values for field in STATE_FIELDS) or values["created_at"] is None:
+        return None
+    return (
+        timezone.localdate(values["created_at"]),
+        values["delivery_type"],
+        status_bucket(values["status"]),
+        Decimal(values["total"] or 0),
+    )
+
+
+def order_state(order):
+    """
+    The state an in-memory order contributes. Reads ``__dict__`` directly
+    so deferred fields never trigger a query.
+    """
+    return state_from_values(order.__dict__)
+
+
+def locked_values(pk):
+    """
+    Read an order's stored state fields, locking the row until the current
+    transaction ends, so a concurrent save of the same order waits and then
+    sees this one's result. None if the row doesn't exist.
+    """
+    return Order.objects.select_for_update().filter(pk=pk).values(*STATE_FIELDS).first()
+
+
+def _bump(date, delivery_type, bucket, count, revenue):
+    """Add count/revenue to one rollup row, creating it if needed."""
+    rows = DailySalesRollup.objects.filter(
+        date=date, delivery_type=delivery_type, status_bucket=bucket,
+    )
+    changes = {"order_count": F("order_count") + count, "revenue": F("revenue") + revenue}
+    if rows.update(**changes):
+        return
+    try:
+        with transaction.atomic():
+            DailySalesRollup.objects.create(
+                date=date, delivery_type=delivery_type, status_bucket=bucket,
+                order_count=count, revenue=revenue,
+            )
+    except IntegrityError:
+        # Another transaction created the row first — add to theirs
+        rows.update(**changes)
+
+
+def apply_change(old, new):
+    """Move one order's contribution from the ``old`` state to ``new``."""
+    if old == new:
+        return
+    with transaction.atomic():
+        if old is not None:
+            date, delivery_type, bucket, total = old
+            _bump(date, delivery_type, bucket, -1, -total)
+        if new is not None:
+            date, delivery_type, bucket, total = new
+            _bump(date, delivery_type, bucket, 1, total)
@@ -0,0 +1,151 @@
+"""
+Precomputed weekly opening schedule.
+
+The basket, checkout and home pages all need "are we open?" and "when do
+we next open?". Rather than loading every OpeningHours row and walking the
+week on each request, ``OpeningSchedule`` turns the rows into a sorted list
+of open intervals, measured in seconds from Monday 00:00 London time, and
+answers both questions with a binary search.
+
+``get_opening_schedule()`` keeps the schedule in the cache until the next
+opening or closing time, or until an admin edits the hours (see the
+OpeningHours receivers in orders/signals.py), whichever comes first.
+Everything is London wall-clock time, so BST/GMT is handled automatically.
+"""
+
+import datetime
+from bisect import bisect_right
+from zoneinfo import ZoneInfo
+
+from django.core.cache import cache
+
+from .models import OpeningHours
+
+LONDON_TZ = ZoneInfo("Europe/London")
+SCHEDULE_KEY = "hours:schedule"
+DAY = 24 * 60 * 60
+WEEK = 7 * DAY
+
+
+def _seconds(value):
+    return value.hour * 3600 + value.minute * 60 + value.second
+
+
+def week_position(now):
+    """Seconds since Monday 00:00 of ``now``'s week, in London time."""
+    return now.weekday() * DAY + _seconds(now)
+
+
+class OpeningSchedule:
+    """
+    The week's open intervals, built once from the OpeningHours rows.
+    ``days`` keeps the rows themselves (in day order) for templates.
+    """
+
+    def __init__(self, days):
+        self.days = tuple(days)
+        intervals = []
+        openings = set()
+        closings = set()
+        for hours in self.days:
+            if hours.is_closed or not hours.opening_time or not hours.closing_time:
+                continue
+            start = hours.day * DAY + _seconds(hours.opening_time)
+            end = hours.day * DAY + _seconds(hours.closing_time)
+            if end < start:
+                # Closes after midnight — runs into the next day
+                end += DAY
+            openings.add(start)
+            closings.add(end % WEEK)
+            if end > WEEK:
+                # Sunday night into Monday morning: split at the week boundary
+                intervals.append((0, end - WEEK))
+                end = WEEK
+            intervals.append((start, end))
+        intervals.sort()
+        self.starts = [start for start, _end in intervals]
+        self.ends = [end for _start, end in intervals]
+        # Opening times proper — not the Monday 00:00 half of a split interval
+        self.openings = sorted(openings)
+        self.boundaries = sorted(openings | closings)
+
+    @classmethod
+    def from_database(cls):
+        return cls(OpeningHours.objects.all())
+
+    def hours_for(self, day):
+        """The OpeningHours row for a weekday (0=Monday), or None."""
+        for hours in self.days:
+            if hours.day == day:
+                return hours
+        return None
+
+    def is_open(self, now):
+        """True if ``now`` (an aware datetime) falls inside opening hours."""
+        position = week_position(now.astimezone(LONDON_TZ))
+        index = bisect_right(self.starts, position) - 1
+        return index >= 0 and position <= self.ends[index]
+
+    def next_open(self, now):
+        """The next opening time strictly after ``now``, as a London datetime, or None."""
+        return self._next(self.openings, now)
+
+    def next_boundary(self, now):
+        """The next time the schedule opens or closes after ``now``, or None."""
+        return self._next(self.boundaries, now)
+
+    @staticmethod
+    def _next(positions, now):
+        if not positions:
+            return None
+        now = now.astimezone(LONDON_TZ)
+        position = week_position(now)
+        index = bisect_right(positions, position)
+        target = positions[index] if index < len(positions) else positions[0] + WEEK
+        # Step in wall-clock time, then re-attach the zone so DST is respected
+        wall = now.replace(tzinfo=None, microsecond=0) + datetime.timedelta(seconds=target - position)
+        return wall.replace(tzinfo=LONDON_TZ)
+
+    def status(self, now):
+        """
+        Return (is_open, next_open_text). next_open_text reads like
+        "Today at 5:00 PM", "Tomorrow at 12:00 PM" or "Saturday at 5:00 PM".
+        """
+        now = now.astimezone(LONDON_TZ)
+        opens = self.next_open(now)
+        if opens is None:
+            return self.is_open(now), None
+        offset = (opens.date() - now.date()).days
+        if offset == 0:
+            day_label = "Today"
+        elif offset == 1:
+            day_label = "Tomorrow"
+        else:
+            day_label = opens.strftime("%A")
+        return self.is_open(now), f"{day_label} at {opens.strftime('%-I:%M %p')}"
+
+
+def get_opening_schedule(now=None):
+    """Return the cached OpeningSchedule, rebuilding it on a miss."""
+    schedule = cache.get(SCHEDULE_KEY)
+    if schedule is None:
+        now = now or datetime.datetime.now(tz=LONDON_TZ)
+        schedule = OpeningSchedule.from_database()
+        # Also expire at the next open/close so a missed signal (e.g. a
+        # queryset.update()) can't leave the site on stale hours for long
+        boundary = schedule.next_boundary(now)
+        timeout = DAY
+        if boundary is not None:
+            timeout = max(1, min(DAY, int((boundary - now).total_seconds()) + 1))
+        cache.set(SCHEDULE_KEY, schedule, timeout)
+    return schedule
+
+
+def invalidate_opening_schedule():
+    cache.delete(SCHEDULE_KEY)
+
+
+def get_opening_status(now=None):
+    """(is_open, next_open_text) for ``now`` (default: the current time)."""
+    now = now or datetime.datetime.now(tz=LONDON_TZ)
+    return get_opening_schedule(now).status(now)
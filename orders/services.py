@@ -0,0 +1,171 @@
+"""
+Order placement.
+
+``OrderPlacementService`` turns a validated checkout into an Order: the
+order row, its items, the per-item daily counters (orders/popularity.py),
+the promo redemption and the kitchen feed event are written in one
+transaction, so a failure part way through never leaves an order without
+its items. The promo code is redeemed with a conditional
+UPDATE (see PromoCode.redeem), so concurrent checkouts can't take a capped
+code past ``max_uses``; if the last use is gone the whole order is rolled
+back and ``PromoUnavailable`` raised. Side effects the customer doesn't
+wait for — the admin log entry, saving the address to the profile,
+counting the order towards the customer's favourites — are queued as
+background tasks in the same transaction (see orders/tasks.py). Basket
+lines are resolved to menu items with a single query and the items are
+inserted with one ``bulk_create``, so the query count doesn't grow with the
+basket. The order's ``item_count`` and ``items_summary`` are filled from
+the same lines before it is inserted.
+
+Order references are short random strings (see ``Order.save``). Rather than
+checking for a clash before every insert, a clash is caught from the unique
+constraint and the insert retried with a fresh reference inside the same
+transaction.
+
+``CheckoutToken`` makes checkout submissions idempotent. Every rendered
+checkout form carries a random token. The first POST with a token claims it
+in the cache; once its order is placed the token maps to the order
+reference. A repeat POST (a double-tap, or a retry on a flaky connection)
+finds the token taken and is sent to the existing confirmation page without
+validating or inserting anything. A submission that fails releases its
+claim, so the corrected form can be sent again.
+"""
+
+import re
+import time
+import uuid
+
+from django.core.cache import cache
+
+from django.contrib.admin.models import ADDITION
+from django.db import IntegrityError, transaction
+
+from . import kitchen_feed
+from .models import KitchenEvent, OrderItem, PromoCode
+from .popularity import record_item_stats
+from .promos import promo_codes_changed
+from .tasks import admin_log_task, enqueue_many
+
+
+class PromoUnavailable(Exception):
+    """The order's promo code was used up (or withdrawn) while checking out."""
+
+
+class OrderPlacementService:
+    """Place an already-priced order for the basket in ``request``."""
+
+    MAX_REFERENCE_ATTEMPTS = 5
+
+    def __init__(self, request, basket):
+        self.request = request
+        self.basket = basket
+
+    def place(self, order, address=None):
+        """
+        Save ``order`` and its items atomically; return the saved order.
+        ``address`` (address_line1, address_line2, city, postcode, phone) is
+        saved to the customer's profile afterwards, in the background.
+        """
+        items = [
+            OrderItem(
+                order=order,
+                menu_item=line["menu_item"],
+                item_name=line["menu_item"].name,
+                item_price=line["price"],
+                quantity=line["quantity"],
+                notes=line.get("notes", ""),
+            )
+            for line in self.basket  # one MenuItem query for every line
+        ]
+        order.set_item_summary(items)
+        with transaction.atomic():
+            self._insert_order(order)
+            OrderItem.objects.bulk_create(items)
+            record_item_stats(items, order.created_at)
+            if order.promo_code:
+                self._redeem_promo(order)
+            tasks = [admin_log_task(self.request, order, ADDITION, "Order placed via website")]
+            if address is not None and order.user_id:
+                tasks.append(("save_profile_address", {"user_id": order.user_id, **address}))
+            if order.user_id:
+                tasks.append(("record_favourites", {
+                    "user_id": order.user_id,
+                    "menu_item_ids": [item.menu_item_id for item in items],
+                    "ordered_at": order.created_at.isoformat(),
+                }))
+            enqueue_many(tasks)
+            kitchen_feed.publish(order, KitchenEvent.KIND_CREATED)
+        return order
+
+    def _redeem_promo(self, order):
+        promo = PromoCode.objects.filter(code=order.promo_code).first()
+        if promo is None or promo.redeem(order) is None:
+            raise PromoUnavailable(order.promo_code)
+        promo_codes_changed()  # registries hold the old uses_count
+
+    def _insert_order(self, order):
+        # Order.save() runs in its own savepoint, so a failed insert leaves
+        # the surrounding transaction usable for the retry
+        for attempt in range(1, self.MAX_REFERENCE_ATTEMPTS + 1):
+            try:
+                order.save()
+                return
+            except IntegrityError as exc:
+                if "reference" not in str(exc).lower() or attempt == self.MAX_REFERENCE_ATTEMPTS:
+                    raise
+                order.reference = ""
+
+
+CHECKOUT_TOKEN_KEY = "checkout:token:{token}"
+CHECKOUT_TOKEN_TIMEOUT = 60 * 60
+CHECKOUT_TOKEN_WAIT = 5        # seconds a repeat waits for the first submission
+CHECKOUT_TOKEN_POLL = 0.2
+_IN_PROGRESS = "in-progress"
+_TOKEN_RE = re.compile(r"^[0-9a-f]{32}$")
+
+
+def new_checkout_token():
+    return uuid.uuid4().hex
+
+
+class CheckoutToken:
+    """One checkout form submission's idempotency claim."""
+
+    def __init__(self, token):
+        # Forms rendered before tokens existed post none — they run unprotected
+        self.token = token if token and _TOKEN_RE.match(token) else None
+        self.key = CHECKOUT_TOKEN_KEY.format(token=self.token)
+        self.claimed = False
+        self.completed = False
+
+    def claim(self):
+        """True if this submission may go ahead and place an order."""
+        if self.token is None:
+            return True
+        self.claimed = cache.add(self.key, _IN_PROGRESS, CHECKOUT_TOKEN_TIMEOUT)
+        return self.claimed
+
+    def existing_reference(self):
+        """
+        The reference of the order placed with this token, waiting briefly
+        if the first submission is still running. None if it never finishes.
+        """
+        deadline = time.monotonic() + CHECKOUT_TOKEN_WAIT
+        while True:
+            value = cache.get(self.key)
+            if value != _IN_PROGRESS:
+                return value
+            if time.monotonic() >= deadline:
+                return None
+            time.sleep(CHECKOUT_TOKEN_POLL)
+
+    def complete(self, reference):
+        if self.claimed:
+            cache.set(self.key, reference, CHECKOUT_TOKEN_TIMEOUT)
+            self.completed = True
+
+    def release(self):
+        """Give the token back unless it produced an order."""
+        if self.claimed and not self.completed:
+            cache.delete(self.key)
+            self.claimed = False
@@ -1,18 +1,119 @@
 """
-Auth signals for basket persistence.
-When a user logs out we snapshot their basket + promo to UserProfile.saved_basket.
-When they log back in we merge it into the current session basket.
+Order signals and auth signals for basket persistence.
+
+Any write to an Order drops the cached admin dashboard stats and moves its
+count/revenue between DailySalesRollup rows (see orders/rollups.py).
+A customer's first order sets UserProfile.has_ordered in the same
+transaction. Any write to OpeningHours drops the cached opening schedule,
+any write to a SiteAnnouncement drops the cached banner, and any write to a
+PromoCode bumps the promo registry version (see orders/promos.py).
+
+While a user is logged in, basket changes are mirrored to
+UserProfile.saved_basket with write-behind (unchanged snapshots are skipped,
+bursts are coalesced). When a user logs out, anything pending is written;
+when they log back in we merge it into the current session basket.
 
 Snapshot format (JSON): {"items": {item_id: {...}}, "promo": {"code": "...", "discount": "..."}}
 Backward compat: if the root JSON is a flat item dict (old format) we treat it as items only.
 """
 
+import hashlib
 import json
+import threading
+import time
 
+from django.conf import settings
 from django.contrib.auth.signals import user_logged_in, user_logged_out
+from django.db.models.signals import post_delete, post_save, pre_delete, pre_save
 from django.dispatch import receiver
 
+from accounts.models import UserProfile
+
+from . import rollups
+from .admin_context import invalidate_admin_stats
 from .basket import BASKET_SESSION_KEY, PROMO_SESSION_KEY
+from .announcements import invalidate_active_announcement
+from .models import OpeningHours, Order, PromoCode, SiteAnnouncement
+from .promos import promo_codes_changed
+from .schedule import invalidate_opening_schedule
+
+
+@receiver(post_save, sender=Order)
+@receiver(post_delete, sender=Order)
+def invalidate_admin_stats_on_order_change(sender, **kwargs):
+    """Orders feed nearly every admin dashboard figure — recompute on next view."""
+    invalidate_admin_stats()
+
+
+@receiver(post_save, sender=Order)
+def mark_customer_has_ordered(sender, instance, created, **kwargs):
+    """Runs inside Order.save()'s transaction, so the flag and the order commit together."""
+    if created and instance.user_id:
+        UserProfile.objects.filter(user_id=instance.user_id, has_ordered=False).update(has_ordered=True)
+
+
+@receiver(post_save, sender=OpeningHours)
+@receiver(post_delete, sender=OpeningHours)
+def invalidate_schedule_on_hours_change(sender, **kwargs):
+    """Admin edits (including list_editable) take effect on the next request."""
+    invalidate_opening_schedule()
+
+
+@receiver(post_save, sender=SiteAnnouncement)
+@receiver(post_delete, sender=SiteAnnouncement)
+def invalidate_announcement_on_change(sender, **kwargs):
+    """Covers list_editable toggles too; the dashboard shows the banner as well."""
+    invalidate_active_announcement()
+    invalidate_admin_stats()
+
+
+@receiver(post_save, sender=PromoCode)
+@receiver(post_delete, sender=PromoCode)
+def reload_promo_registry_on_change(sender, **kwargs):
+    """Every process reloads its promo registry on its next lookup."""
+    promo_codes_changed()
+
+
+@receiver(pre_save, sender=Order)
+def lock_rollup_state(sender, instance, update_fields=None, **kwargs):
+    """
+    Runs inside Order.save()'s transaction: read what the order contributes
+    now from its stored row, locked until the save commits. Skipped when
+    the save can't change any rollup field.
+    """
+    instance._stored_rollup_values = None
+    if instance._state.adding:
+        return
+    if update_fields is not None and not set(update_fields) & set(rollups.STATE_FIELDS):
+        return
+    instance._stored_rollup_values = rollups.locked_values(instance.pk)
+
+
+@receiver(post_save, sender=Order)
+def update_rollups_on_save(sender, instance, created, update_fields=None, **kwargs):
+    """Runs inside Order.save()'s transaction."""
+    if created:
+        rollups.apply_change(None, rollups.order_state(instance))
+        return
+    stored = getattr(instance, "_stored_rollup_values", None)
+    if stored is None:
+        return
+    # Fields this save didn't write keep their stored (locked) values
+    written = rollups.STATE_FIELDS if update_fields is None else set(update_fields) & set(rollups.STATE_FIELDS)
+    new_values = {**stored, **{field: instance.__dict__[field] for field in written if field in instance.__dict__}}
+    rollups.apply_change(rollups.state_from_values(stored), rollups.state_from_values(new_values))
+
+
+@receiver(pre_delete, sender=Order)
+def lock_rollup_state_on_delete(sender, instance, **kwargs):
+    """Runs inside the deletion's transaction, like lock_rollup_state."""
+    instance._stored_rollup_values = rollups.locked_values(instance.pk)
+
+
+@receiver(post_delete, sender=Order)
+def update_rollups_on_delete(sender, instance, **kwargs):
+    stored = getattr(instance, "_stored_rollup_values", None)
+    rollups.apply_change(rollups.state_from_values(stored), None)
 
 
 def _snapshot_to_profile(user, basket_data, promo_data):
@@ -28,18 +129,83 @@ def _snapshot_to_profile(user, basket_data, promo_data):
         pass  # never crash a request due to profile save failure
 
 
+# ── Write-behind basket sync ──────────────────────────────────────────────
+# The session remembers a hash of the snapshot last written to the profile
+# and when it was written. Unchanged snapshots are never rewritten, and
+# changes within BASKET_SYNC_WINDOW seconds of the last write are only
+# marked pending; the next mutation after the window, logout or checkout
+# writes them.
+
+SYNC_HASH_KEY = "_basket_sync_hash"
+SYNC_AT_KEY = "_basket_sync_at"
+SYNC_PENDING_KEY = "_basket_sync_pending"
+
+_sync_stats_lock = threading.Lock()
+_sync_stats = dict.fromkeys(("writes", "skipped_unchanged", "deferred"), 0)
+
+
+def _count_sync(name):
+    with _sync_stats_lock:
+        _sync_stats[name] += 1
+
+
+def basket_sync_stats():
+    """This process's profile-sync counters; writes saved = skipped + deferred."""
+    with _sync_stats_lock:
+        stats = dict(_sync_stats)
+    stats["writes_saved"] = stats["skipped_unchanged"] + stats["deferred"]
+    return stats
+
+
+def _forget_sync_state(session):
+    for key in (SYNC_HASH_KEY, SYNC_AT_KEY, SYNC_PENDING_KEY):
+        session.pop(key, None)
+
+
+def _sync_session_to_profile(request, user, force=False):
+    session = request.session
+    basket_data = session.get(BASKET_SESSION_KEY, {})
+    promo_data = session.get(PROMO_SESSION_KEY, {})
+    digest = hashlib.sha1(
+        json.dumps({"items": basket_data, "promo": promo_data}, sort_keys=True).encode()
+    ).hexdigest()
+    if digest == session.get(SYNC_HASH_KEY):
+        session.pop(SYNC_PENDING_KEY, None)
+        _count_sync("skipped_unchanged")
+        return
+    now = time.time()
+    window = getattr(settings, "BASKET_SYNC_WINDOW", 30)
+    if not force and now - session.get(SYNC_AT_KEY, 0) < window:
+        session[SYNC_PENDING_KEY] = True
+        _count_sync("deferred")
+        return
+    _snapshot_to_profile(user, basket_data, promo_data)
+    session[SYNC_HASH_KEY] = digest
+    session[SYNC_AT_KEY] = now
+    session.pop(SYNC_PENDING_KEY, None)
+    _count_sync("writes")
+
+
 def sync_basket_to_profile(request):
     """
     Sync the current session basket + promo to UserProfile.saved_basket.
     Call this after any basket mutation when the user is authenticated so the
     basket is consistent across devices even without an explicit logout.
+    Writes are skipped when nothing changed and coalesced within
+    BASKET_SYNC_WINDOW seconds (see above).
     """
     user = getattr(request, "user", None)
     if not user or not user.is_authenticated:
         return
-    basket_data = request.session.get(BASKET_SESSION_KEY, {})
-    promo_data = request.session.get(PROMO_SESSION_KEY, {})
-    _snapshot_to_profile(user, basket_data, promo_data)
+    _sync_session_to_profile(request, user)
+
+
+def flush_basket_sync(request):
+    """Write any pending basket snapshot now (checkout, logout)."""
+    user = getattr(request, "user", None)
+    if not user or not user.is_authenticated:
+        return
+    _sync_session_to_profile(request, user, force=True)
 
 
 @receiver(user_logged_out)
@@ -49,9 +215,9 @@ def save_basket_on_logout(sender, request, user, **kwargs):
         return
     basket_data = request.session.get(BASKET_SESSION_KEY, {})
     promo_data = request.session.get(PROMO_SESSION_KEY, {})
-    if not basket_data and not promo_data:
+    if not basket_data and not promo_data and not request.session.get(SYNC_PENDING_KEY):
         return
-    _snapshot_to_profile(user, basket_data, promo_data)
+    _sync_session_to_profile(request, user, force=True)
 
 
 @receiver(user_logged_in)
@@ -90,6 +256,7 @@ def restore_basket_on_login(sender, request, user, **kwargs):
     request.session.modified = True
 
     # Clear the stored snapshot so it's not re-applied on subsequent logins
+    _forget_sync_state(request.session)
     profile.saved_basket = ""
     try:
         profile.save(update_fields=["saved_basket"])
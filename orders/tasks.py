@@ -0,0 +1,235 @@
+"""
+Database-backed background task queue.
+
+Side effects that the customer doesn't need to wait for — the admin
+"Recent Actions" entry, saving a checkout address back to the profile,
+counting the order towards the customer's favourites — are queued with
+``enqueue()`` instead of run inline. Each call inserts a BackgroundTask row
+inside the caller's transaction, so a task exists if and only if the order
+(or review) that caused it was committed, and it survives restarts.
+
+Tasks run in two places:
+- In-process: after the transaction commits, a daemon thread in the same
+  worker wakes up and drains due tasks, so the response isn't held up.
+  It also re-checks every IDLE_SECONDS for retries and leftovers, and
+  every REQUEUE_SECONDS hands back tasks stuck ``running`` for longer
+  than STALE_RUNNING (their worker was killed or recycled).
+  Disable with ``BACKGROUND_TASKS_IN_PROCESS = False``.
+- ``manage.py run_tasks``: a standalone worker (or one-off ``--once``
+  drain), e.g. after a deploy or on a separate dyno.
+
+Tasks are claimed with a conditional UPDATE, so any number of runners can
+share the table. Failures are retried with backoff up to MAX_ATTEMPTS, then
+left as ``failed`` with the error for staff to inspect. A handler runs in
+one transaction with the deletion of its row, so a handler that only
+writes to the database takes effect exactly once.
+"""
+
+import logging
+import threading
+import time
+import traceback
+from datetime import timedelta
+
+from django.conf import settings
+from django.contrib.admin.models import LogEntry
+from django.contrib.auth import get_user_model
+from django.contrib.contenttypes.models import ContentType
+from django.db import close_old_connections, transaction
+from django.db.models import F
+from django.utils import timezone
+from django.utils.dateparse import parse_datetime
+
+from accounts.models import UserProfile
+
+from .favourites import record_favourites
+from .models import BackgroundTask
+
+logger = logging.getLogger(__name__)
+
+MAX_ATTEMPTS = 5
+RETRY_BASE_SECONDS = 30
+STALE_RUNNING = timedelta(minutes=10)
+IDLE_SECONDS = 30
+REQUEUE_SECONDS = 60
+BATCH_SIZE = 50
+
+_handlers = {}
+
+
+def task(name):
+    """Register a handler: ``@task("name") def handler(**payload)``."""
+    def decorator(func):
+        _handlers[name] = func
+        return func
+    return decorator
+
+
+def enqueue(name, **payload):
+    """Queue ``name`` with a JSON-serialisable payload; runs after commit."""
+    return enqueue_many([(name, payload)])[0]
+
+
+def enqueue_many(tasks):
+    """Queue several ``(name, payload)`` tasks with a single insert."""
+    for name, _payload in tasks:
+        if name not in _handlers:
+            raise ValueError(f"Unknown background task: {name}")
+    rows = BackgroundTask.objects.bulk_create(
+        [BackgroundTask(name=name, payload=payload) for name, payload in tasks]
+    )
+    transaction.on_commit(wake_worker)
+    return rows
+
+
+# ── Running tasks ─────────────────────────────────────────────────────────
+
+def requeue_stale():
+    """Hand back tasks whose runner died mid-task."""
+    return BackgroundTask.objects.filter(
+        status=BackgroundTask.STATUS_RUNNING,
+        locked_at__lt=timezone.now() - STALE_RUNNING,
+    ).update(status=BackgroundTask.STATUS_PENDING, locked_at=None)
+
+
+def _claim(pk):
+    return BackgroundTask.objects.filter(pk=pk, status=BackgroundTask.STATUS_PENDING).update(
+        status=BackgroundTask.STATUS_RUNNING,
+        locked_at=timezone.now(),
+        attempts=F("attempts") + 1,
+    ) == 1
+
+
+def run_task(row):
+    """Run one claimed task; returns True if it succeeded."""
+    try:
+        handler = _handlers[row.name]
+        with transaction.atomic():
+            handler(**row.payload)
+            BackgroundTask.objects.filter(pk=row.pk).delete()
+    except Exception:
+        attempts = row.attempts + 1
+        failed = attempts >= MAX_ATTEMPTS
+        BackgroundTask.objects.filter(pk=row.pk).update(
+            status=BackgroundTask.STATUS_FAILED if failed else BackgroundTask.STATUS_PENDING,
+            run_after=timezone.now() + timedelta(seconds=RETRY_BASE_SECONDS * 2 ** (attempts - 1)),
+            locked_at=None,
+            last_error=traceback.format_exc()[-4000:],
+        )
+        return False
+    return True
+
+
+def run_pending(limit=None):
+    """Run due tasks until none are left (or ``limit`` ran); returns (ok, failed)."""
+    ok = failed = 0
+    while limit is None or ok + failed < limit:
+        due = list(
+            BackgroundTask.objects.filter(
+                status=BackgroundTask.STATUS_PENDING, run_after__lte=timezone.now(),
+            ).order_by("run_after", "id")[:BATCH_SIZE]
+        )
+        if not due:
+            break
+        for row in due:
+            if limit is not None and ok + failed >= limit:
+                break
+            if not _claim(row.pk):
+                continue  # another runner got it
+            if run_task(row):
+                ok += 1
+            else:
+                failed += 1
+    return ok, failed
+
+
+# ── In-process worker thread ──────────────────────────────────────────────
+
+_wakeup = threading.Event()
+_worker_lock = threading.Lock()
+_worker = None
+
+
+def _worker_loop():
+    requeued_at = None
+    while True:
+        _wakeup.wait(IDLE_SECONDS)
+        _wakeup.clear()
+        close_old_connections()
+        try:
+            # Tasks left running by a killed or recycled worker come back here
+            if requeued_at is None or time.monotonic() - requeued_at >= REQUEUE_SECONDS:
+                requeued_at = time.monotonic()
+                requeue_stale()
+            run_pending()
+        except Exception:
+            logger.exception("Background task worker error")
+        finally:
+            close_old_connections()
+
+
+def wake_worker():
+    """Start (once per process) or nudge the in-process worker thread."""
+    global _worker
+    if not getattr(settings, "BACKGROUND_TASKS_IN_PROCESS", True):
+        return
+    with _worker_lock:
+        if _worker is None or not _worker.is_alive():
+            _worker = threading.Thread(target=_worker_loop, name="background-tasks", daemon=True)
+            _worker.start()
+    _wakeup.set()
+
+
+# ── Handlers ──────────────────────────────────────────────────────────────
+
+def enqueue_admin_log(request, obj, action_flag, message=""):
+    """Queue a Django admin LogEntry so the action shows in Recent Actions."""
+    enqueue(*admin_log_task(request, obj, action_flag, message))
+
+
+def admin_log_task(request, obj, action_flag, message=""):
+    """The ``(name, payload)`` for an admin log entry, for ``enqueue_many``."""
+    return ("admin_log", {
+        "user_id": request.user.pk if request.user.is_authenticated else None,
+        "content_type_id": ContentType.objects.get_for_model(obj).pk,
+        "object_id": str(obj.pk),
+        "object_repr": str(obj)[:200],
+        "action_flag": action_flag,
+        "message": message,
+    })
+
+
+@task("admin_log")
+def write_admin_log(user_id, content_type_id, object_id, object_repr, action_flag, message):
+    # Guests' actions are attributed to the first superuser
+    if user_id is None:
+        User = get_user_model()
+        user_id = User.objects.filter(is_superuser=True).values_list("pk", flat=True).first()
+    if user_id is None:
+        return
+    LogEntry.objects.log_action(
+        user_id=user_id,
+        content_type_id=content_type_id,
+        object_id=object_id,
+        object_repr=object_repr,
+        action_flag=action_flag,
+        change_message=message,
+    )
+
+
+@task("record_favourites")
+def add_order_to_favourites(user_id, menu_item_ids, ordered_at):
+    record_favourites(user_id, menu_item_ids, parse_datetime(ordered_at))
+
+
+@task("save_profile_address")
+def save_profile_address(user_id, address_line1, address_line2, city, postcode, phone=""):
+    fields = {
+        "address_line1": address_line1,
+        "address_line2": address_line2,
+        "city": city,
+        "postcode": postcode,
+    }
+    if phone:
+        fields["phone"] = phone
+    UserProfile.objects.filter(user_id=user_id).update(**fields)
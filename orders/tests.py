@@ -1,17 +1,46 @@
 """
 Unit tests for the orders app.
 Covers the Basket class, PromoCode model validation, Order model,
-OrderItem model, and core basket views.
+OrderItem model, core basket views, the daily sales rollups, the admin dashboard stats,
+the kitchen SSE stream and rate limiting.
 """
 
+import datetime
+import json
+import re
+import threading
 from decimal import Decimal
-from unittest.mock import MagicMock
-from django.test import TestCase
+from io import StringIO
+from unittest.mock import MagicMock, patch
+from django.core.cache import cache
+from django.core.management import call_command
+from django.db import OperationalError, connection, transaction
+from django.db.models import Count
+from django.http import HttpResponse
+from django.test import RequestFactory, TestCase, TransactionTestCase, override_settings
+from django.test.utils import CaptureQueriesContext
+from django.contrib.admin.models import LogEntry
 from django.contrib.auth.models import User
 from django.utils import timezone
 
+from despair.pagination import after_cursor, decode_cursor, encode_cursor
 from menu.models import Category, MenuItem
-from orders.models import Order, OrderItem, PromoCode
+from menu.snapshot import get_menu_version
+from orders import kitchen_feed, tasks
+from orders.admin_context import admin_stats
+from orders.announcements import ANNOUNCEMENT_KEY
+from orders.context_processors import announcement_context
+from orders.favourites import favourite_item_ids, record_favourites
+from orders.models import (
+    ITEMS_SUMMARY_LENGTH, KITCHEN_STATUSES, BackgroundTask, DailySalesRollup, FavouriteItem, KitchenEvent,
+    MenuItemDailyStat, OpeningHours, Order, OrderItem, PromoCode, PromoRedemption, SiteAnnouncement,
+)
+from orders.popularity import popular_item_ids, record_item_stats
+from orders.promos import get_promo, get_promo_registry
+from orders.ratelimit import SlidingWindowLimiter, rate_limit, reset_limiters
+from orders.schedule import LONDON_TZ, OpeningSchedule, get_opening_schedule, get_opening_status
+from orders.signals import basket_sync_stats
+from orders.views import ORDERS_PER_PAGE
 from orders.basket import (
     Basket,
     BASKET_SESSION_KEY,
@@ -19,6 +48,8 @@ from orders.basket import (
     DELIVERY_CHARGE,
 )
 
+LOCMEM_CACHES = {"default": {"BACKEND": "django.core.cache.backends.locmem.LocMemCache"}}
+
 
 # ---------------------------------------------------------------------------
 # Helpers
@@ -199,6 +230,30 @@ class BasketTotalsTest(TestCase):
         basket.apply_promo("BIGSAVE", Decimal("100.00"))
         self.assertGreaterEqual(basket.get_total("collection"), Decimal("0.00"))
 
+    def test_totals_computed_in_one_pass(self):
+        basket = Basket(make_mock_request())
+        basket.add(self.cheap, quantity=2)  # £8
+        basket.apply_promo("TEST10", Decimal("1.00"))
+        totals = basket.totals()
+        self.assertEqual(totals.subtotal, Decimal("8.00"))
+        self.assertEqual(totals.delivery_charge, DELIVERY_CHARGE)
+        self.assertEqual(totals.total, Decimal("9.50"))
+        self.assertEqual(totals.free_delivery_remaining, Decimal("12.00"))
+        self.assertEqual(totals.free_delivery_pct, 40)
+        self.assertIs(basket.totals(), totals)
+
+    def test_mutations_invalidate_memoized_totals(self):
+        basket = Basket(make_mock_request())
+        basket.add(self.cheap, quantity=1)
+        self.assertEqual(basket.get_subtotal(), Decimal("4.00"))
+        basket.update(self.cheap.pk, 3)
+        self.assertEqual(basket.get_subtotal(), Decimal("12.00"))
+        basket.apply_promo("TEST10", Decimal("2.00"))
+        self.assertEqual(basket.get_total("collection"), Decimal("10.00"))
+        basket.remove_promo()
+        basket.remove(self.cheap.pk)
+        self.assertEqual(basket.totals("collection").total, Decimal("0.00"))
+
 
 # ---------------------------------------------------------------------------
 # Basket — promo
@@ -468,3 +523,1506 @@ class CheckoutViewTest(TestCase):
         self._add_item()
         response = self.client.get("/orders/checkout/")
         self.assertEqual(response.status_code, 200)
+
+
+# ---------------------------------------------------------------------------
+# Admin dashboard stats
+# ---------------------------------------------------------------------------
+
+@override_settings(CACHES=LOCMEM_CACHES)
+class AdminStatsTest(TestCase):
+    def setUp(self):
+        cache.clear()
+        self.factory = RequestFactory()
+        self.user = User.objects.create_user(username="statsuser", password="pass")
+        self.order = self._make_order(total=Decimal("20.00"))
+        self._make_order(total=Decimal("10.00"), delivery_type=Order.COLLECTION,
+                         status=Order.STATUS_CANCELLED)
+        OrderItem.objects.create(order=self.order, item_name="Fried Rice",
+                                 item_price=Decimal("5.00"), quantity=4)
+        OrderItem.objects.create(order=self.order, item_name="Spring Rolls",
+                                 item_price=Decimal("3.00"), quantity=1)
+        cache.clear()
+
+    def _make_order(self, **kw):
+        defaults = dict(
+            user=self.user, full_name="Stats User", phone="0", email="s@s.com",
+            subtotal=Decimal("10.00"), total=Decimal("10.00"),
+        )
+        defaults.update(kw)
+        return Order.objects.create(**defaults)
+
+    def _stats(self):
+        return admin_stats(self.factory.get("/kitchen-panel/"))
+
+    def test_front_end_pages_skip_stats(self):
+        with self.assertNumQueries(0):
+            self.assertEqual(admin_stats(self.factory.get("/menu/")), {})
+
+    def test_figures_are_correct(self):
+        stats = self._stats()["stats"]
+        self.assertEqual(stats["today_orders"], 2)
+        self.assertEqual(stats["today_revenue"], "30.00")
+        self.assertEqual(stats["today_cancelled"], 1)
+        self.assertEqual(stats["delivery_today"], 1)
+        self.assertEqual(stats["collection_today"], 1)
+        self.assertEqual(stats["pending_orders"], 1)
+        self.assertEqual(stats["top_item"], "Fried Rice")
+        self.assertEqual(self._stats()["top_items_30d"][0], {"item_name": "Fried Rice", "qty": 4})
+
+    def test_query_count_is_bounded(self):
+        # orders, reviews, users, items, recent orders, promos, announcement
+        with self.assertNumQueries(7):
+            self._stats()
+
+    def test_second_view_served_from_cache(self):
+        self._stats()
+        with self.assertNumQueries(0):
+            self.assertEqual(self._stats()["stats"]["today_orders"], 2)
+
+    def test_order_write_invalidates_cache(self):
+        self._stats()
+        self.order.status = Order.STATUS_CANCELLED
+        self.order.save()
+        self.assertEqual(self._stats()["stats"]["today_cancelled"], 2)
+
+
+# ---------------------------------------------------------------------------
+# Daily sales rollups
+# ---------------------------------------------------------------------------
+
+class DailySalesRollupTest(TestCase):
+    def setUp(self):
+        self.user = User.objects.create_user(username="rollupuser", password="pass")
+
+    def _make_order(self, **kw):
+        defaults = dict(
+            user=self.user, full_name="Rollup User", phone="0", email="r@r.com",
+            subtotal=Decimal("10.00"), total=Decimal("10.00"),
+        )
+        defaults.update(kw)
+        return Order.objects.create(**defaults)
+
+    def _rows(self):
+        return {
+            (r.delivery_type, r.status_bucket): (r.order_count, r.revenue)
+            for r in DailySalesRollup.objects.filter(date=timezone.localdate())
+        }
+
+    def test_new_order_counted(self):
+        self._make_order(total=Decimal("12.50"))
+        self._make_order(total=Decimal("7.50"))
+        self.assertEqual(self._rows(), {("delivery", "open"): (2, Decimal("20.00"))})
+
+    def test_status_change_moves_order_between_buckets(self):
+        order = self._make_order()
+        order.status = Order.STATUS_CANCELLED
+        order.save(update_fields=["status"])
+        rows = self._rows()
+        self.assertEqual(rows[("delivery", "open")], (0, Decimal("0.00")))
+        self.assertEqual(rows[("delivery", "cancelled")], (1, Decimal("10.00")))
+
+    def test_status_change_within_bucket_is_a_no_op(self):
+        order = self._make_order()
+        order.status = Order.STATUS_PREPARING
+        with CaptureQueriesContext(connection) as ctx:
+            order.save(update_fields=["status"])
+        self.assertFalse([q for q in ctx.captured_queries if "dailysalesrollup" in q["sql"]])
+
+    def test_deferred_load_still_updates_rollup(self):
+        order = self._make_order()
+        deferred = Order.objects.only("pk", "status").get(pk=order.pk)
+        deferred.status = Order.STATUS_COMPLETED
+        deferred.save(update_fields=["status"])
+        self.assertEqual(self._rows()[("delivery", "completed")], (1, Decimal("10.00")))
+
+    def test_stale_copies_saved_in_turn_do_not_drift(self):
+        order = self._make_order()
+        cancel = Order.objects.get(pk=order.pk)
+        advance = Order.objects.get(pk=order.pk)
+        cancel.status = Order.STATUS_CANCELLED
+        cancel.save(update_fields=["status"])
+        advance.status = Order.STATUS_PREPARING
+        advance.save(update_fields=["status"])
+        rows = self._rows()
+        self.assertEqual(rows[("delivery", "open")], (1, Decimal("10.00")))
+        self.assertEqual(rows[("delivery", "cancelled")], (0, Decimal("0.00")))
+
+    def test_delete_removes_contribution(self):
+        order = self._make_order()
+        order.delete()
+        self.assertEqual(self._rows()[("delivery", "open")], (0, Decimal("0.00")))
+
+    def test_rebuild_matches_incremental(self):
+        self._make_order(total=Decimal("9.00"), delivery_type=Order.COLLECTION)
+        cancelled = self._make_order(total=Decimal("4.00"))
+        cancelled.status = Order.STATUS_CANCELLED
+        cancelled.save()
+        incremental = {k: v for k, v in self._rows().items() if v[0]}
+        DailySalesRollup.objects.all().delete()
+        call_command("rebuild_rollups", batch_size=1, stdout=StringIO())
+        self.assertEqual(self._rows(), incremental)
+
+
+# ---------------------------------------------------------------------------
+# Kitchen change feed / SSE stream
+# ---------------------------------------------------------------------------
+
+@patch("orders.kitchen_feed.STREAM_SECONDS", 0)
+class KitchenStreamTest(TestCase):
+    def setUp(self):
+        self.staff = User.objects.create_user(username="chef", password="pass123", is_staff=True)
+        self.client.login(username="chef", password="pass123")
+        self.order = Order.objects.create(
+            full_name="Walk In", phone="0", email="w@w.com",
+            subtotal=Decimal("8.00"), total=Decimal("8.00"),
+        )
+        OrderItem.objects.create(order=self.order, item_name="Chow Mein",
+                                 item_price=Decimal("8.00"), quantity=1)
+
+    def _stream(self, **kw):
+        response = self.client.get("/orders/kitchen/stream/", **kw)
+        self.assertEqual(response["Content-Type"], "text/event-stream")
+        return b"".join(response.streaming_content).decode()
+
+    def _events(self, body):
+        return [
+            json.loads(line[len("data: "):])
+            for line in body.splitlines() if line.startswith("data: ")
+        ]
+
+    def test_display_page_embeds_feed_position(self):
+        kitchen_feed.publish(self.order)
+        response = self.client.get("/orders/kitchen/")
+        self.assertContains(response, f'data-last-event="{kitchen_feed.latest_event_id()}"')
+        self.assertContains(response, "Chow Mein")
+
+    def test_status_change_is_streamed_with_card(self):
+        self.client.post(f"/orders/kitchen/update/{self.order.reference}/")
+        events = self._events(self._stream(data={"since": 0}))
+        self.assertEqual(len(events), 1)
+        self.assertEqual(events[0]["status"], Order.STATUS_CONFIRMED)
+        self.assertIn("Chow Mein", events[0]["html"])
+
+    def test_cancelled_order_streams_empty_card(self):
+        self.client.post(f"/orders/kitchen/cancel/{self.order.reference}/")
+        events = self._events(self._stream(data={"since": 0}))
+        self.assertEqual(events[0]["html"], "")
+
+    def test_last_event_id_resumes_after_seen_events(self):
+        self.client.post(f"/orders/kitchen/update/{self.order.reference}/")
+        seen = KitchenEvent.objects.latest("pk").pk
+        self.assertEqual(self._events(self._stream(HTTP_LAST_EVENT_ID=str(seen))), [])
+
+    def test_several_changes_collapse_to_latest_card(self):
+        self.client.post(f"/orders/kitchen/update/{self.order.reference}/")
+        self.client.post(f"/orders/kitchen/update/{self.order.reference}/")
+        events = self._events(self._stream(data={"since": 0}))
+        self.assertEqual([e["status"] for e in events], [Order.STATUS_PREPARING])
+
+    def test_idle_stream_checks_feed_once(self):
+        last_id = kitchen_feed.latest_event_id()
+        with self.assertNumQueries(1):
+            self.assertEqual(list(kitchen_feed.stream(last_id)), ["retry: 3000\n\n"])
+
+    def test_event_committed_late_is_still_streamed(self):
+        other = Order.objects.create(
+            full_name="Late", phone="0", email="l@l.com",
+            subtotal=Decimal("5.00"), total=Decimal("5.00"),
+        )
+        first = kitchen_feed.publish(self.order)
+        late_pk = kitchen_feed.publish(other).pk
+        last = kitchen_feed.publish(self.order)
+        KitchenEvent.objects.filter(pk=late_pk).delete()  # still uncommitted
+        with patch("orders.kitchen_feed.STREAM_SECONDS", 60), \
+                patch.object(kitchen_feed._LocalWaiter, "wait", return_value=True):
+            messages = kitchen_feed.stream(first.pk)
+            next(messages)  # retry
+            self.assertIn(self.order.reference, next(messages))
+            KitchenEvent.objects.create(
+                pk=late_pk, order_reference=other.reference, kind=KitchenEvent.KIND_CREATED, status=other.status,
+            )
+            late = next(messages)
+            messages.close()
+        self.assertIn(other.reference, late)
+        self.assertTrue(late.startswith(f"id: {last.pk}\n"))
+
+    def test_old_events_pruned_when_stream_connects(self):
+        for _ in range(3):
+            kitchen_feed.publish(self.order)
+        with patch("orders.kitchen_feed.KEEP_EVENTS", 1):
+            self._stream()
+        self.assertEqual(KitchenEvent.objects.count(), 1)
+
+    def test_streams_over_the_limit_are_turned_away(self):
+        held = [kitchen_feed.open_stream(0) for _ in range(kitchen_feed.MAX_STREAMS)]
+        try:
+            response = self.client.get("/orders/kitchen/stream/")
+            self.assertEqual(response.status_code, 503)
+        finally:
+            held.pop().close()
+            for _ in range(2):  # a finished stream gives its slot back
+                self.assertIn("retry: 3000", self._stream())
+            for events in held:
+                events.close()
+
+    def test_stream_requires_staff(self):
+        self.client.logout()
+        response = self.client.get("/orders/kitchen/stream/")
+        self.assertEqual(response.status_code, 302)
+
+    def test_publish_wakes_local_waiter(self):
+        waiter = kitchen_feed._LocalWaiter()
+        self.assertFalse(waiter.wait(0))
+        with self.captureOnCommitCallbacks(execute=True):
+            kitchen_feed.publish(self.order)
+        self.assertTrue(waiter.wait(0))
+
+
+# ---------------------------------------------------------------------------
+# Conditional GET on the polling endpoints
+# ---------------------------------------------------------------------------
+
+class ConditionalPollingTest(TestCase):
+    def setUp(self):
+        self.user = User.objects.create_user(username="poller", password="pass123", is_staff=True)
+        self.client.login(username="poller", password="pass123")
+        self.order = Order.objects.create(
+            user=self.user, full_name="Poller", phone="0", email="p@p.com",
+            subtotal=Decimal("8.00"), total=Decimal("8.00"),
+        )
+        OrderItem.objects.create(order=self.order, item_name="Chow Mein",
+                                 item_price=Decimal("8.00"), quantity=1)
+        self.status_url = f"/orders/status/{self.order.reference}/"
+
+    def test_status_api_returns_304_when_unchanged(self):
+        first = self.client.get(self.status_url)
+        self.assertEqual(first.status_code, 200)
+        self.assertIn("no-cache", first["Cache-Control"])
+        second = self.client.get(self.status_url, HTTP_IF_NONE_MATCH=first["ETag"])
+        self.assertEqual(second.status_code, 304)
+
+    def test_status_api_etag_changes_with_status(self):
+        etag = self.client.get(self.status_url)["ETag"]
+        self.client.post(f"/orders/kitchen/update/{self.order.reference}/")
+        response = self.client.get(self.status_url, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.json()["status"], Order.STATUS_CONFIRMED)
+
+    def test_status_api_hides_other_users_orders(self):
+        User.objects.create_user(username="other", password="pass123")
+        self.client.login(username="other", password="pass123")
+        self.assertEqual(self.client.get(self.status_url).status_code, 404)
+
+    def test_kitchen_partial_304_skips_items_and_render(self):
+        etag = self.client.get("/orders/kitchen/partial/")["ETag"]
+        with self.assertNumQueries(3):  # session, user, board token
+            response = self.client.get("/orders/kitchen/partial/", HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, 304)
+
+    def test_kitchen_partial_etag_changes_on_cancel(self):
+        etag = self.client.get("/orders/kitchen/partial/")["ETag"]
+        self.client.post(f"/orders/kitchen/cancel/{self.order.reference}/")
+        response = self.client.get("/orders/kitchen/partial/", HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, 200)
+        self.assertNotContains(response, "Chow Mein")
+
+
+# ---------------------------------------------------------------------------
+# Rate limiting
+# ---------------------------------------------------------------------------
+
+@override_settings(CACHES=LOCMEM_CACHES)
+class RateLimitTest(TestCase):
+    def setUp(self):
+        cache.clear()
+        reset_limiters()
+        self.factory = RequestFactory()
+
+    def tearDown(self):
+        reset_limiters()
+
+    def test_limiter_allows_exactly_limit_hits(self):
+        limiter = SlidingWindowLimiter("t-exact", limit=5, period=60)
+        results = [limiter.hit("1.2.3.4") for _ in range(8)]
+        self.assertEqual(results, [True] * 5 + [False] * 3)
+
+    def test_limiter_counts_clients_separately(self):
+        limiter = SlidingWindowLimiter("t-clients", limit=1, period=60)
+        self.assertTrue(limiter.hit("a"))
+        self.assertTrue(limiter.hit("b"))
+        self.assertFalse(limiter.hit("a"))
+
+    def test_shared_count_seen_by_other_workers(self):
+        # Two limiter instances stand in for two gunicorn workers
+        worker_a = SlidingWindowLimiter("t-shared", limit=4, period=60)
+        worker_b = SlidingWindowLimiter("t-shared", limit=4, period=60)
+        allowed = [worker_a.hit("ip") for _ in range(4)]
+        self.assertEqual(allowed, [True] * 4)
+        self.assertFalse(worker_b.hit("ip"))
+
+    def test_get_requests_not_counted(self):
+        @rate_limit("t-get", limit=1, period=60)
+        def view(request):
+            return HttpResponse(status=429 if request.rate_limited else 200)
+
+        for _ in range(3):
+            self.assertEqual(view(self.factory.get("/")).status_code, 200)
+
+    def test_apply_promo_returns_429_when_limited(self):
+        for _ in range(10):
+            self.client.post("/orders/basket/promo/apply/", {"promo_code": "NOPE"},
+                             HTTP_X_REQUESTED_WITH="XMLHttpRequest")
+        response = self.client.post("/orders/basket/promo/apply/", {"promo_code": "NOPE"},
+                                    HTTP_X_REQUESTED_WITH="XMLHttpRequest")
+        self.assertEqual(response.status_code, 429)
+
+
+@override_settings(CACHES=LOCMEM_CACHES)
+class RateLimitConcurrencyTest(TransactionTestCase):
+    def setUp(self):
+        reset_limiters()
+        self.factory = RequestFactory()
+
+    def tearDown(self):
+        reset_limiters()
+
+    def _race(self, threads, fire):
+        barrier = threading.Barrier(threads)
+
+        def run(n):
+            try:
+                barrier.wait()
+                fire(n)
+            finally:
+                connection.close()
+
+        workers = [threading.Thread(target=run, args=(n,)) for n in range(threads)]
+        for worker in workers:
+            worker.start()
+        for worker in workers:
+            worker.join()
+
+    def test_limit_holds_under_parallel_requests(self):
+        @rate_limit("t-parallel", limit=10, period=60)
+        def view(request):
+            return HttpResponse(status=429 if request.rate_limited else 200)
+
+        statuses = []
+
+        def fire(n):
+            request = self.factory.post("/", REMOTE_ADDR="10.0.0.1")
+            for _ in range(5):
+                statuses.append(view(request).status_code)
+
+        self._race(20, fire)
+        self.assertEqual(statuses.count(200), 10)
+        self.assertEqual(statuses.count(429), 90)
+
+    def test_limit_holds_across_workers(self):
+        # One limiter per thread stands in for one gunicorn worker each
+        workers = [SlidingWindowLimiter("t-workers", limit=10, period=60, local_share=0) for _ in range(20)]
+        results = []
+
+        def fire(n):
+            for _ in range(3):
+                results.append(workers[n].hit("10.0.0.2"))
+
+        self._race(20, fire)
+        self.assertEqual(results.count(True), 10)
+
+
+# ---------------------------------------------------------------------------
+# Opening schedule
+# ---------------------------------------------------------------------------
+
+def london(*args):
+    return datetime.datetime(*args, tzinfo=LONDON_TZ)
+
+
+@override_settings(CACHES=LOCMEM_CACHES)
+class OpeningScheduleTest(TestCase):
+    def setUp(self):
+        cache.clear()
+        # Mon closed, Tue-Sat 17:00-22:30, Sun 12:00-00:30 (past midnight)
+        OpeningHours.objects.create(day=0, is_closed=True)
+        for day in range(1, 6):
+            OpeningHours.objects.create(day=day, opening_time=datetime.time(17),
+                                        closing_time=datetime.time(22, 30))
+        OpeningHours.objects.create(day=6, opening_time=datetime.time(12),
+                                    closing_time=datetime.time(0, 30))
+        self.schedule = OpeningSchedule.from_database()
+
+    def test_is_open_inside_and_outside_hours(self):
+        # 2026-10-13 is a Tuesday
+        self.assertFalse(self.schedule.is_open(london(2026, 10, 13, 16, 59)))
+        self.assertTrue(self.schedule.is_open(london(2026, 10, 13, 17, 0)))
+        self.assertTrue(self.schedule.is_open(london(2026, 10, 13, 22, 30)))
+        self.assertFalse(self.schedule.is_open(london(2026, 10, 13, 22, 31)))
+
+    def test_closing_after_midnight_wraps_into_monday(self):
+        self.assertTrue(self.schedule.is_open(london(2026, 10, 19, 0, 15)))
+        self.assertFalse(self.schedule.is_open(london(2026, 10, 19, 0, 45)))
+
+    def test_next_open_text(self):
+        self.assertEqual(self.schedule.status(london(2026, 10, 13, 9, 0)),
+                         (False, "Today at 5:00 PM"))
+        self.assertEqual(self.schedule.status(london(2026, 10, 13, 23, 0)),
+                         (False, "Tomorrow at 5:00 PM"))
+        # Sunday night -> Monday closed -> Tuesday
+        self.assertEqual(self.schedule.status(london(2026, 10, 18, 23, 0)),
+                         (True, "Tuesday at 5:00 PM"))
+
+    def test_handles_utc_input_across_bst(self):
+        # 16:30 UTC in October is 17:30 BST
+        self.assertTrue(self.schedule.is_open(
+            datetime.datetime(2026, 10, 13, 16, 30, tzinfo=datetime.timezone.utc)))
+
+    def test_no_hours_means_closed_with_no_next_open(self):
+        self.assertEqual(OpeningSchedule([]).status(london(2026, 10, 13, 12, 0)), (False, None))
+
+    def test_cached_until_hours_change(self):
+        now = london(2026, 10, 13, 18, 0)
+        get_opening_status(now)
+        with self.assertNumQueries(0):
+            self.assertEqual(get_opening_status(now), (True, "Tomorrow at 5:00 PM"))
+        tuesday = OpeningHours.objects.get(day=1)
+        tuesday.is_closed = True
+        tuesday.save()
+        with self.assertNumQueries(1):
+            self.assertEqual(get_opening_status(now), (False, "Tomorrow at 5:00 PM"))
+
+    def test_cache_expires_at_next_boundary(self):
+        with patch("orders.schedule.cache") as mock_cache:
+            mock_cache.get.return_value = None
+            get_opening_schedule(london(2026, 10, 13, 22, 0))
+        self.assertEqual(mock_cache.set.call_args[0][2], 30 * 60 + 1)
+
+    def test_homepage_uses_cached_schedule(self):
+        self.client.get("/")
+        with CaptureQueriesContext(connection) as ctx:
+            response = self.client.get("/")
+        self.assertEqual(response.status_code, 200)
+        self.assertFalse([q for q in ctx.captured_queries if "openinghours" in q["sql"]])
+
+
+# ---------------------------------------------------------------------------
+# Site announcement banner
+# ---------------------------------------------------------------------------
+
+@override_settings(CACHES=LOCMEM_CACHES)
+class AnnouncementContextTest(TestCase):
+    def setUp(self):
+        cache.clear()
+        self.factory = RequestFactory()
+
+    def _context(self):
+        request = self.factory.get("/")
+        request.session = {}
+        return announcement_context(request)
+
+    def test_unread_announcement_costs_no_queries(self):
+        with self.assertNumQueries(0):
+            self._context()
+
+    def test_active_announcement_cached_between_requests(self):
+        SiteAnnouncement.objects.create(message="Closed Monday")
+        self.assertEqual(self._context()["site_announcement"].message, "Closed Monday")
+        with self.assertNumQueries(0):
+            self.assertEqual(self._context()["site_announcement"].message, "Closed Monday")
+
+    def test_no_announcement_is_cached_too(self):
+        self.assertFalse(self._context()["site_announcement"])
+        with self.assertNumQueries(0):
+            self.assertFalse(self._context()["site_announcement"])
+
+    def test_toggle_invalidates_cache(self):
+        announcement = SiteAnnouncement.objects.create(message="Closed Monday")
+        self.assertTrue(self._context()["site_announcement"])
+        announcement.is_active = False
+        announcement.save(update_fields=["is_active"])
+        self.assertFalse(self._context()["site_announcement"])
+        announcement.delete()
+        SiteAnnouncement.objects.create(message="New menu")
+        self.assertEqual(self._context()["site_announcement"].message, "New menu")
+
+    def test_banner_read_before_commit_is_not_kept(self):
+        announcement = SiteAnnouncement.objects.create(message="Closed Monday")
+        with self.captureOnCommitCallbacks(execute=True):
+            announcement.message = "Closed Tuesday"
+            announcement.save()
+            # A page rendered mid-write caches whatever it read
+            cache.set(ANNOUNCEMENT_KEY, SiteAnnouncement(message="Closed Monday"))
+        self.assertEqual(self._context()["site_announcement"].message, "Closed Tuesday")
+
+
+# ---------------------------------------------------------------------------
+# Batched basket changes
+# ---------------------------------------------------------------------------
+
+class BasketBatchTest(TestCase):
+    def setUp(self):
+        cat = make_category()
+        self.roll = make_item(cat, name="Spring Roll", price="4.00")
+        self.pork = make_item(cat, name="Sweet & Sour Pork", price="9.50")
+        self.gone = make_item(cat, name="Sold Out Soup", price="3.00")
+        self.gone.is_available = False
+        self.gone.save()
+
+    def _batch(self, *ops):
+        return self.client.post("/orders/basket/batch/", json.dumps({"ops": list(ops)}),
+                                content_type="application/json",
+                                HTTP_X_REQUESTED_WITH="XMLHttpRequest")
+
+    def _session_basket(self):
+        return self.client.session.get(BASKET_SESSION_KEY, {})
+
+    def test_applies_ops_in_order(self):
+        response = self._batch(
+            {"op": "add", "item": self.roll.pk, "quantity": 1},
+            {"op": "set", "item": self.roll.pk, "quantity": 3},
+            {"op": "set", "item": self.pork.pk, "quantity": 2},
+        )
+        data = response.json()
+        self.assertTrue(data["success"])
+        self.assertEqual(data["items"][str(self.roll.pk)], {"quantity": 3, "line_total": "12.00"})
+        self.assertEqual(data["basket_count"], 5)
+        self.assertEqual(data["subtotal"], "31.00")
+
+        data = self._batch({"op": "set", "item": self.roll.pk, "quantity": 0},
+                           {"op": "remove", "item": self.pork.pk}).json()
+        self.assertEqual(data["basket_count"], 0)
+        self.assertEqual(data["items"][str(self.roll.pk)]["quantity"], 0)
+
+    def test_invalid_op_leaves_basket_untouched(self):
+        self._batch({"op": "add", "item": self.roll.pk})
+        response = self._batch({"op": "set", "item": self.roll.pk, "quantity": 5},
+                               {"op": "explode", "item": self.roll.pk})
+        self.assertEqual(response.status_code, 400)
+        self.assertEqual(self._session_basket()[str(self.roll.pk)]["quantity"], 1)
+
+    def test_unavailable_item_rejects_whole_batch(self):
+        response = self._batch({"op": "add", "item": self.roll.pk},
+                               {"op": "set", "item": self.gone.pk, "quantity": 1})
+        self.assertEqual(response.status_code, 404)
+        self.assertEqual(self._session_basket(), {})
+
+    def test_profile_synced_once_per_batch(self):
+        User.objects.create_user(username="batcher", password="pass123")
+        self.client.login(username="batcher", password="pass123")
+        ops = [{"op": "set", "item": self.roll.pk, "quantity": qty} for qty in range(1, 6)]
+        with CaptureQueriesContext(connection) as ctx:
+            self._batch(*ops)
+        profile_writes = [q for q in ctx.captured_queries
+                          if q["sql"].startswith("UPDATE") and "userprofile" in q["sql"]]
+        self.assertEqual(len(profile_writes), 1)
+        self.assertEqual(self._session_basket()[str(self.roll.pk)]["quantity"], 5)
+
+    def test_first_order_promo_auto_applied(self):
+        PromoCode.objects.create(code="WELCOME", value=Decimal("10"), first_order_only=True)
+        User.objects.create_user(username="newbie", password="pass123")
+        self.client.login(username="newbie", password="pass123")
+        data = self._batch({"op": "set", "item": self.pork.pk, "quantity": 2}).json()
+        self.assertEqual(data["promo_code"], "WELCOME")
+        self.assertIn("auto_promo_msg", data)
+
+
+# ---------------------------------------------------------------------------
+# Basket → profile write-behind
+# ---------------------------------------------------------------------------
+
+@override_settings(CACHES=LOCMEM_CACHES, BASKET_SYNC_WINDOW=60)
+class BasketProfileSyncTest(TestCase):
+    def setUp(self):
+        cache.clear()
+        reset_limiters()
+        self.user = User.objects.create_user(username="syncer", password="pass123")
+        self.item = make_item(make_category(), name="Chow Mein", price="8.00")
+        self.client.login(username="syncer", password="pass123")
+
+    def tearDown(self):
+        reset_limiters()
+
+    def _set_qty(self, quantity):
+        self.client.post("/orders/basket/batch/",
+                         json.dumps({"ops": [{"op": "set", "item": self.item.pk, "quantity": quantity}]}),
+                         content_type="application/json")
+
+    def _saved_quantity(self):
+        self.user.profile.refresh_from_db()
+        saved = json.loads(self.user.profile.saved_basket or "{}")
+        return saved.get("items", {}).get(str(self.item.pk), {}).get("quantity")
+
+    def test_changes_within_window_are_deferred(self):
+        before = basket_sync_stats()
+        self._set_qty(1)
+        self._set_qty(2)
+        self._set_qty(3)
+        self.assertEqual(self._saved_quantity(), 1)
+        after = basket_sync_stats()
+        self.assertEqual(after["writes"] - before["writes"], 1)
+        self.assertEqual(after["writes_saved"] - before["writes_saved"], 2)
+
+    @override_settings(BASKET_SYNC_WINDOW=0)
+    def test_unchanged_snapshot_not_rewritten(self):
+        self._set_qty(2)
+        with CaptureQueriesContext(connection) as ctx:
+            self._set_qty(2)
+        self.assertFalse([q for q in ctx.captured_queries
+                          if q["sql"].startswith("UPDATE") and "userprofile" in q["sql"]])
+
+    def test_logout_flushes_pending_and_login_restores(self):
+        self._set_qty(1)
+        self._set_qty(4)
+        self.client.logout()
+        self.assertEqual(self._saved_quantity(), 4)
+        self.client.login(username="syncer", password="pass123")
+        self.assertEqual(self.client.session[BASKET_SESSION_KEY][str(self.item.pk)]["quantity"], 4)
+        self.user.profile.refresh_from_db()
+        self.assertEqual(self.user.profile.saved_basket, "")
+
+    def test_logout_with_empty_basket_keeps_other_device_snapshot(self):
+        self.user.profile.saved_basket = json.dumps(
+            {"items": {str(self.item.pk): {"quantity": 2, "price": "8.00"}}, "promo": {}})
+        self.user.profile.save()
+        self.client.logout()
+        self.assertEqual(self._saved_quantity(), 2)
+
+    def test_checkout_flushes_cleared_basket(self):
+        self._set_qty(1)
+        self._set_qty(2)
+        response = self.client.post("/orders/checkout/", {
+            "full_name": "Sync User", "email": "s@s.com", "phone": "07700000000",
+            "delivery_type": "collection", "payment_method": "cash_collection",
+        })
+        self.assertEqual(response.status_code, 302)
+        self.assertIsNone(self._saved_quantity())
+
+
+# ---------------------------------------------------------------------------
+# Order placement
+# ---------------------------------------------------------------------------
+
+@override_settings(CACHES=LOCMEM_CACHES)
+class OrderPlacementServiceTest(TestCase):
+    def setUp(self):
+        cache.clear()
+        reset_limiters()
+        self.user = User.objects.create_user(username="placer", password="pass123")
+        self.client.login(username="placer", password="pass123")
+        cat = make_category()
+        self.items = [make_item(cat, name=f"Dish {n}", price="3.00") for n in range(12)]
+
+    def tearDown(self):
+        reset_limiters()
+
+    def _fill_basket(self, count):
+        ops = [{"op": "add", "item": item.pk} for item in self.items[:count]]
+        self.client.post("/orders/basket/batch/", json.dumps({"ops": ops}),
+                         content_type="application/json")
+
+    def _checkout(self):
+        return self.client.post("/orders/checkout/", {
+            "full_name": "Placer", "email": "p@p.com", "phone": "07700000000",
+            "delivery_type": "collection", "payment_method": "cash_collection",
+        })
+
+    def _checkout_queries(self, lines):
+        Order.objects.all().delete()
+        self._fill_basket(lines)
+        with CaptureQueriesContext(connection) as ctx:
+            self.assertEqual(self._checkout().status_code, 302)
+        # The rate limiter's queries depend on when its local tier syncs, not on the basket
+        return len([q for q in ctx.captured_queries if "ratelimitcounter" not in q["sql"]])
+
+    def test_query_count_does_not_grow_with_lines(self):
+        self._checkout_queries(1)  # warm the schedule/content type caches and rollup row
+        self.assertEqual(self._checkout_queries(1), self._checkout_queries(12))
+        order = Order.objects.get()
+        self.assertEqual(order.items.count(), 12)
+        self.assertEqual(order.total, Decimal("36.00"))
+
+    def test_item_summary_written_at_placement(self):
+        self._fill_basket(2)
+        ops = [{"op": "add", "item": self.items[0].pk}]
+        self.client.post("/orders/basket/batch/", json.dumps({"ops": ops}), content_type="application/json")
+        self._checkout()
+        order = Order.objects.get()
+        self.assertEqual(order.item_count, 3)
+        self.assertEqual(order.items_summary, "2\u00d7 Dish 0, 1\u00d7 Dish 1")
+
+    def test_reference_collision_is_retried(self):
+        taken = Order.objects.create(user=self.user, full_name="x", phone="0", email="x@x.com")
+        self._fill_basket(2)
+        fresh = MagicMock(hex="feedbeef" + "0" * 24)
+        clash = MagicMock(hex=taken.reference.lower() + "0" * 24)
+        with patch("orders.models.uuid.uuid4", side_effect=[clash, fresh]):
+            self.assertEqual(self._checkout().status_code, 302)
+        order = Order.objects.get(reference="FEEDBEEF")
+        self.assertEqual(order.items.count(), 2)
+
+    def test_failure_rolls_back_whole_order(self):
+        self._fill_basket(3)
+        with patch("orders.services.OrderItem.objects.bulk_create", side_effect=RuntimeError):
+            with self.assertRaises(RuntimeError):
+                self._checkout()
+        self.assertFalse(Order.objects.exists())
+        self.assertFalse(KitchenEvent.objects.exists())
+        self.assertFalse(DailySalesRollup.objects.exists())
+
+
+# ---------------------------------------------------------------------------
+# Checkout idempotency
+# ---------------------------------------------------------------------------
+
+@override_settings(CACHES=LOCMEM_CACHES)
+class CheckoutIdempotencyTest(TestCase):
+    def setUp(self):
+        cache.clear()
+        reset_limiters()
+        self.item = make_item(make_category(), name="Chow Mein", price="8.00")
+        self.client.post(f"/orders/basket/add/{self.item.pk}/", {"quantity": 1})
+        self.token = self.client.get("/orders/checkout/").context["checkout_token"]
+
+    def tearDown(self):
+        reset_limiters()
+
+    def _submit(self, **overrides):
+        data = {
+            "full_name": "Guest", "email": "g@g.com", "phone": "07700000000",
+            "delivery_type": "collection", "payment_method": "cash_collection",
+            "checkout_token": self.token,
+        }
+        data.update(overrides)
+        return self.client.post("/orders/checkout/", data)
+
+    def test_form_carries_token(self):
+        self.assertRegex(self.token, r"^[0-9a-f]{32}$")
+
+    def test_repeat_submission_returns_first_confirmation(self):
+        first = self._submit()
+        order = Order.objects.get()
+        with CaptureQueriesContext(connection) as ctx:
+            second = self._submit()
+        self.assertEqual(second["Location"], first["Location"])
+        self.assertIn(order.reference, second["Location"])
+        self.assertEqual(Order.objects.count(), 1)
+        self.assertFalse([q for q in ctx.captured_queries if q["sql"].startswith("INSERT")])
+
+    def test_repeat_submissions_not_rate_limited(self):
+        self._submit()
+        for _ in range(5):
+            self._submit()
+        self.client.post(f"/orders/basket/add/{self.item.pk}/", {"quantity": 1})
+        self.token = self.client.get("/orders/checkout/").context["checkout_token"]
+        self._submit()
+        self.assertEqual(Order.objects.count(), 2)
+
+    def test_failed_submission_releases_token(self):
+        response = self._submit(full_name="")
+        self.assertEqual(response.status_code, 200)
+        self.assertFalse(Order.objects.exists())
+        self.assertEqual(self._submit().status_code, 302)
+        self.assertEqual(Order.objects.count(), 1)
+
+    @patch("orders.services.CHECKOUT_TOKEN_WAIT", 0)
+    def test_submission_still_in_progress(self):
+        cache.add(f"checkout:token:{self.token}", "in-progress")
+        response = self._submit()
+        self.assertRedirects(response, "/orders/checkout/", fetch_redirect_response=False)
+        self.assertFalse(Order.objects.exists())
+
+    def test_missing_token_still_places_order(self):
+        self.assertEqual(self._submit(checkout_token="").status_code, 302)
+        self.assertEqual(Order.objects.count(), 1)
+
+
+# ---------------------------------------------------------------------------
+# Background tasks
+# ---------------------------------------------------------------------------
+
+@override_settings(CACHES=LOCMEM_CACHES, BACKGROUND_TASKS_IN_PROCESS=False)
+class BackgroundTaskTest(TestCase):
+    def setUp(self):
+        cache.clear()
+        reset_limiters()
+        self.user = User.objects.create_user(username="queued", password="pass123")
+        self.client.login(username="queued", password="pass123")
+        PromoCode.objects.create(code="SAVE10", discount_type=PromoCode.PERCENT, value=Decimal("10"))
+        item = make_item(make_category(), name="Char Siu", price="12.00")
+        self.client.post(f"/orders/basket/add/{item.pk}/", {"quantity": 1})
+        self.client.post("/orders/basket/promo/apply/", {"promo_code": "SAVE10"})
+
+    def tearDown(self):
+        reset_limiters()
+
+    def _checkout(self):
+        return self.client.post("/orders/checkout/", {
+            "full_name": "Queued", "email": "q@q.com", "phone": "07700000001",
+            "delivery_type": "delivery", "payment_method": "cash_delivery",
+            "address_line1": "1 Queue Street", "address_line2": "", "city": "Leeds",
+            "postcode": "LS1 1AA", "save_address": "on",
+        })
+
+    def test_checkout_queues_side_effects(self):
+        self.assertEqual(self._checkout().status_code, 302)
+        self.assertEqual(
+            sorted(BackgroundTask.objects.values_list("name", flat=True)),
+            ["admin_log", "record_favourites", "save_profile_address"],
+        )
+        # Nothing has run yet; the promo is redeemed with the order itself
+        self.assertFalse(LogEntry.objects.exists())
+        self.assertEqual(PromoCode.objects.get().uses_count, 1)
+        self.user.profile.refresh_from_db()
+        self.assertEqual(self.user.profile.address_line1, "")
+
+        self.assertEqual(tasks.run_pending(), (3, 0))
+        self.assertFalse(BackgroundTask.objects.exists())
+        self.assertEqual(LogEntry.objects.get().object_id, str(Order.objects.get().pk))
+        self.user.profile.refresh_from_db()
+        self.assertEqual(self.user.profile.address_line1, "1 Queue Street")
+        self.assertEqual(self.user.profile.phone, "07700000001")
+
+    def test_failed_order_queues_nothing(self):
+        with patch("orders.services.OrderItem.objects.bulk_create", side_effect=RuntimeError):
+            with self.assertRaises(RuntimeError):
+                self._checkout()
+        self.assertFalse(BackgroundTask.objects.exists())
+
+    def test_failure_is_retried_then_left_failed(self):
+        handler = MagicMock(side_effect=ValueError("boom"))
+        with patch.dict(tasks._handlers, {"flaky": handler}):
+            row = BackgroundTask.objects.create(name="flaky", payload={"n": 1})
+            self.assertEqual(tasks.run_pending(), (0, 1))
+            row.refresh_from_db()
+            self.assertEqual((row.status, row.attempts), (BackgroundTask.STATUS_PENDING, 1))
+            self.assertGreater(row.run_after, timezone.now())
+            self.assertIn("boom", row.last_error)
+            # Not due again until the backoff has passed
+            self.assertEqual(tasks.run_pending(), (0, 0))
+
+            BackgroundTask.objects.filter(pk=row.pk).update(
+                attempts=tasks.MAX_ATTEMPTS - 1, run_after=timezone.now(),
+            )
+            self.assertEqual(tasks.run_pending(), (0, 1))
+            row.refresh_from_db()
+            self.assertEqual(row.status, BackgroundTask.STATUS_FAILED)
+        handler.assert_called_with(n=1)
+
+    def test_stale_running_task_is_requeued(self):
+        row = BackgroundTask.objects.create(
+            name="admin_log", payload={}, status=BackgroundTask.STATUS_RUNNING,
+            locked_at=timezone.now() - datetime.timedelta(hours=1),
+        )
+        self.assertEqual(tasks.requeue_stale(), 1)
+        row.refresh_from_db()
+        self.assertEqual(row.status, BackgroundTask.STATUS_PENDING)
+
+    def test_worker_thread_requeues_stale_tasks(self):
+        row = BackgroundTask.objects.create(
+            name="admin_log", payload={}, status=BackgroundTask.STATUS_RUNNING,
+            locked_at=timezone.now() - datetime.timedelta(hours=1),
+        )
+        # Stop the loop after its first pass
+        with patch.object(tasks._wakeup, "wait"), patch("orders.tasks.close_old_connections"), \
+                patch("orders.tasks.run_pending", side_effect=SystemExit):
+            with self.assertRaises(SystemExit):
+                tasks._worker_loop()
+        row.refresh_from_db()
+        self.assertEqual(row.status, BackgroundTask.STATUS_PENDING)
+
+    def test_unknown_task_rejected(self):
+        with self.assertRaises(ValueError):
+            tasks.enqueue("no_such_task")
+
+    def test_run_tasks_command_once(self):
+        self._checkout()
+        out = StringIO()
+        call_command("run_tasks", "--once", stdout=out)
+        self.assertIn("3 succeeded", out.getvalue())
+        self.assertFalse(BackgroundTask.objects.exists())
+        self.user.profile.refresh_from_db()
+        self.assertEqual(self.user.profile.city, "Leeds")
+
+
+# ---------------------------------------------------------------------------
+# Query plans — the order access paths must use an index
+# ---------------------------------------------------------------------------
+
+class OrderQueryPlanTest(TestCase):
+    """
+    Runs EXPLAIN on the querysets behind the kitchen board, order history,
+    first-order checks and the dashboard, and fails unless each reads the
+    orders table through the index added for it (migrations 0010 and 0012).
+    On PostgreSQL sequential scans are switched off for the test.
+    """
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.users = [User.objects.create_user(username=f"planner{n}") for n in range(20)]
+        statuses = [choice for choice, _label in Order.STATUS_CHOICES]
+        Order.objects.bulk_create([
+            Order(
+                reference=f"PLAN{n:04d}", user=cls.users[n % 20] if n % 3 else None,
+                status=statuses[n % len(statuses)], full_name="Plan", phone="0",
+                email="plan@example.com",
+            )
+            for n in range(600)
+        ])
+        cls.since = timezone.now() - datetime.timedelta(days=30)
+        with connection.cursor() as cursor:
+            cursor.execute("ANALYZE")
+
+    def setUp(self):
+        if connection.vendor == "postgresql":
+            with connection.cursor() as cursor:
+                cursor.execute("SET enable_seqscan = off")
+
+    def tearDown(self):
+        if connection.vendor == "postgresql":
+            with connection.cursor() as cursor:
+                cursor.execute("RESET enable_seqscan")
+
+    def assertUsesIndex(self, queryset, index, ordered=False):
+        """
+        The plan reads through ``index``; with ``ordered``, no sort step either.
+        The index is checked by name: with sequential scans off, PostgreSQL
+        falls back to a full scan of the primary key index rather than a
+        Seq Scan when the right index is missing.
+        """
+        plan = queryset.explain()
+        self.assertIn(index, plan, plan)
+        if ordered:
+            sort_step = "Sort Key" if connection.vendor == "postgresql" else "TEMP B-TREE FOR ORDER BY"
+            self.assertNotIn(sort_step, plan, plan)
+
+    def test_kitchen_board(self):
+        # SQLite won't match the partial index's literal status list to a
+        # bound IN (...), so there it walks order_created_at instead
+        index = "order_kitchen_active" if connection.vendor == "postgresql" else "order_created_at"
+        self.assertUsesIndex(
+            Order.objects.filter(status__in=KITCHEN_STATUSES).order_by("created_at"), index, ordered=True,
+        )
+
+    def test_history(self):
+        self.assertUsesIndex(Order.objects.filter(user=self.users[0]), "order_user_created_id", ordered=True)
+
+    def test_history_next_page(self):
+        orders = Order.objects.filter(user=self.users[0])
+        cursor = encode_cursor(orders.order_by("-created_at", "-id")[5])
+        self.assertUsesIndex(after_cursor(orders, cursor)[:10], "order_user_created_id", ordered=True)
+
+    def test_first_order_check(self):
+        self.assertUsesIndex(Order.objects.filter(user=self.users[0]).values("pk")[:1], "order_user_created_id")
+
+    def test_recent_orders(self):
+        self.assertUsesIndex(Order.objects.order_by("-created_at")[:6], "order_created_at", ordered=True)
+
+    def test_orders_since(self):
+        self.assertUsesIndex(Order.objects.filter(created_at__gte=self.since), "order_created_at")
+
+    def test_popular_items_window(self):
+        self.assertUsesIndex(
+            OrderItem.objects.filter(order__created_at__gte=self.since)
+            .values("menu_item_id").annotate(cnt=Count("id")).order_by("-cnt"),
+            "order_created_at",
+        )
+
+
+# ---------------------------------------------------------------------------
+# First-order promo eligibility
+# ---------------------------------------------------------------------------
+
+@override_settings(CACHES=LOCMEM_CACHES, BACKGROUND_TASKS_IN_PROCESS=False)
+class FirstOrderPromoTest(TestCase):
+    def setUp(self):
+        cache.clear()
+        reset_limiters()
+        self.promo = PromoCode.objects.create(code="WELCOME", value=Decimal("10"), first_order_only=True)
+        self.user = User.objects.create_user(username="firsttimer", password="pass123")
+        self.client.login(username="firsttimer", password="pass123")
+        self.item = make_item(make_category(), name="Salt & Pepper Ribs", price="11.00")
+
+    def tearDown(self):
+        reset_limiters()
+
+    def _add(self):
+        return self.client.post(f"/orders/basket/add/{self.item.pk}/", {"quantity": 1},
+                                HTTP_X_REQUESTED_WITH="XMLHttpRequest").json()
+
+    def _checkout(self):
+        return self.client.post("/orders/checkout/", {
+            "full_name": "First", "email": "f@f.com", "phone": "07700000002",
+            "delivery_type": "collection", "payment_method": "cash_collection",
+        })
+
+    def test_basket_hot_path_skips_orders_and_promo_lookup(self):
+        self.assertEqual(self._add()["promo_code"], "WELCOME")
+        self.client.get("/orders/basket/")  # warm the cache
+        with CaptureQueriesContext(connection) as ctx:
+            self.assertTrue(self._add()["promo_locked"])
+            self.client.get("/orders/basket/")
+        for query in ctx.captured_queries:
+            self.assertNotIn('"orders_order"', query["sql"])
+            self.assertNotIn("first_order_only", query["sql"].partition(" WHERE ")[2])
+
+    def test_checkout_ends_eligibility(self):
+        self._add()
+        self.assertEqual(self._checkout().status_code, 302)
+        self.user.profile.refresh_from_db()
+        self.assertTrue(self.user.profile.has_ordered)
+
+        self.assertEqual(self._add()["promo_code"], "")
+        response = self.client.post("/orders/basket/promo/apply/", {"promo_code": "WELCOME"},
+                                    HTTP_X_REQUESTED_WITH="XMLHttpRequest")
+        self.assertEqual(response.json()["error"], "This promo code is for new customers only.")
+
+    def test_failed_order_leaves_customer_eligible(self):
+        self._add()
+        with patch("orders.services.OrderItem.objects.bulk_create", side_effect=RuntimeError):
+            with self.assertRaises(RuntimeError):
+                self._checkout()
+        self.user.profile.refresh_from_db()
+        self.assertFalse(self.user.profile.has_ordered)
+
+    def test_promo_edit_refreshes_cache(self):
+        self.client.get("/orders/basket/")  # cache the promo while the basket is empty
+        self.promo.active = False
+        self.promo.save()
+        self.assertEqual(self._add()["promo_code"], "")
+
+
+# ---------------------------------------------------------------------------
+# Promo registry
+# ---------------------------------------------------------------------------
+
+@override_settings(CACHES=LOCMEM_CACHES, BACKGROUND_TASKS_IN_PROCESS=False)
+class PromoRegistryTest(TestCase):
+    def setUp(self):
+        cache.clear()
+        reset_limiters()
+        self.promo = PromoCode.objects.create(code="SPRING15", value=Decimal("15"), min_order=Decimal("20"))
+        self.item = make_item(make_category(), name="Crispy Duck", price="24.00")
+
+    def tearDown(self):
+        reset_limiters()
+
+    def _add(self):
+        return self.client.post(f"/orders/basket/add/{self.item.pk}/", {"quantity": 1},
+                                HTTP_X_REQUESTED_WITH="XMLHttpRequest").json()
+
+    def _promo_queries(self, ctx):
+        return [q for q in ctx.captured_queries if '"orders_promocode"' in q["sql"]]
+
+    def test_lookup_is_normalised(self):
+        self.assertEqual(get_promo("  spring15 ").pk, self.promo.pk)
+        self.assertIsNone(get_promo("SPRING16"))
+        self.assertIsNone(get_promo(""))
+
+    def test_registry_loaded_once(self):
+        get_promo_registry()
+        with self.assertNumQueries(0):
+            get_promo("SPRING15")
+            get_promo("NOPE")
+
+    def test_basket_interactions_skip_promo_queries(self):
+        self._add()
+        self.client.post("/orders/basket/promo/apply/", {"promo_code": "spring15"})
+        self.assertEqual(self.client.session[PROMO_SESSION_KEY]["code"], "SPRING15")
+        with CaptureQueriesContext(connection) as ctx:
+            self.assertTrue(self._add()["has_discount"])
+            self.client.get("/orders/basket/")
+            self.client.post("/orders/basket/promo/remove/")
+        self.assertEqual(self._promo_queries(ctx), [])
+
+    def test_save_and_delete_reload_registry(self):
+        self.promo.value = Decimal("20")
+        self.promo.save()
+        self.assertEqual(get_promo("SPRING15").value, Decimal("20"))
+        self.promo.delete()
+        self.assertIsNone(get_promo("SPRING15"))
+
+    def test_revalidation_uses_registry(self):
+        self._add()
+        self.client.post("/orders/basket/promo/apply/", {"promo_code": "SPRING15"})
+        PromoCode.objects.filter(pk=self.promo.pk).update(active=False)  # no signal, no reload
+        self.client.get("/orders/basket/")
+        self.assertEqual(self.client.session[PROMO_SESSION_KEY]["code"], "SPRING15")
+        self.promo.refresh_from_db()
+        self.promo.save()
+        self.client.get("/orders/basket/")
+        self.assertNotIn(PROMO_SESSION_KEY, self.client.session)
+
+    def test_checkout_rechecks_database(self):
+        self._add()
+        self.client.post("/orders/basket/promo/apply/", {"promo_code": "SPRING15"})
+        PromoCode.objects.filter(pk=self.promo.pk).update(max_uses=1, uses_count=1)
+        self.client.post("/orders/checkout/", {
+            "full_name": "Cap", "email": "c@c.com", "phone": "07700000003",
+            "delivery_type": "collection", "payment_method": "cash_collection",
+        })
+        order = Order.objects.get()
+        self.assertEqual(order.promo_code, "")
+        self.assertEqual(order.discount_amount, Decimal("0.00"))
+
+
+# ---------------------------------------------------------------------------
+# Promo redemption
+# ---------------------------------------------------------------------------
+
+def make_orders(count, user=None, promo_code="", discount="2.00"):
+    return Order.objects.bulk_create([
+        Order(reference=f"R{n:07d}", user=user, full_name="Redeemer", phone="0", email="r@r.com",
+              promo_code=promo_code, discount_amount=Decimal(discount))
+        for n in range(count)
+    ])
+
+
+@override_settings(CACHES=LOCMEM_CACHES, BACKGROUND_TASKS_IN_PROCESS=False)
+class PromoRedemptionTest(TestCase):
+    def setUp(self):
+        cache.clear()
+        reset_limiters()
+        self.promo = PromoCode.objects.create(code="LAST2", value=Decimal("10"), max_uses=2)
+
+    def tearDown(self):
+        reset_limiters()
+
+    def test_redeem_records_ledger_until_cap(self):
+        user = User.objects.create_user(username="ledger")
+        first, second, third = make_orders(3, user=user, promo_code="LAST2")
+        redemption = self.promo.redeem(first)
+        self.assertEqual((redemption.order, redemption.user), (first, user))
+        self.assertEqual(redemption.discount_amount, Decimal("2.00"))
+        self.assertIsNotNone(self.promo.redeem(second))
+        self.assertIsNone(self.promo.redeem(third))
+        self.promo.refresh_from_db()
+        self.assertEqual(self.promo.uses_count, 2)
+        self.assertEqual(list(user.promo_redemptions.order_by("order_id").values_list("order_id", flat=True)),
+                         [first.pk, second.pk])
+
+    def test_used_code_can_be_deleted(self):
+        order, = make_orders(1, promo_code="LAST2")
+        redemption = self.promo.redeem(order)
+        self.promo.delete()
+        redemption.refresh_from_db()
+        self.assertIsNone(redemption.promo)
+        self.assertEqual(str(redemption), f"LAST2 on #{order.reference}")
+
+    def test_inactive_or_expired_code_not_redeemed(self):
+        order, = make_orders(1)
+        PromoCode.objects.filter(pk=self.promo.pk).update(valid_until=timezone.now() - datetime.timedelta(days=1))
+        self.assertIsNone(self.promo.redeem(order))
+        PromoCode.objects.filter(pk=self.promo.pk).update(valid_until=None, active=False)
+        self.assertIsNone(self.promo.redeem(order))
+        self.assertFalse(PromoRedemption.objects.exists())
+
+    def test_checkout_that_loses_last_use_places_nothing(self):
+        item = make_item(make_category(), name="Peking Duck", price="30.00")
+        self.client.post(f"/orders/basket/add/{item.pk}/", {"quantity": 1})
+        self.client.post("/orders/basket/promo/apply/", {"promo_code": "LAST2"})
+        # The registry (and so the basket) still thinks a use is left
+        PromoCode.objects.filter(pk=self.promo.pk).update(uses_count=2)
+        with patch("orders.views._revalidate_promo", return_value=False):
+            response = self.client.post("/orders/checkout/", {
+                "full_name": "Late", "email": "l@l.com", "phone": "07700000004",
+                "delivery_type": "collection", "payment_method": "cash_collection",
+            })
+        self.assertRedirects(response, "/orders/basket/", fetch_redirect_response=False)
+        self.assertFalse(Order.objects.exists())
+        self.assertFalse(KitchenEvent.objects.exists())
+        self.assertNotIn(PROMO_SESSION_KEY, self.client.session)
+        self.assertEqual(len(self.client.session[BASKET_SESSION_KEY]), 1)
+
+
+@override_settings(CACHES=LOCMEM_CACHES)
+class PromoRedemptionConcurrencyTest(TransactionTestCase):
+    THREADS = 16
+    ATTEMPTS = 10   # 160 checkouts chasing 100 uses
+
+    def test_capped_code_never_oversold(self):
+        promo = PromoCode.objects.create(code="HUNDRED", value=Decimal("5"), max_uses=100)
+        orders = make_orders(self.THREADS * self.ATTEMPTS, promo_code="HUNDRED")
+        redeemed = []
+        errors = []
+        start = threading.Barrier(self.THREADS)
+
+        def checkout(batch):
+            try:
+                start.wait()
+                for order in batch:
+                    for _attempt in range(500):
+                        try:
+                            with transaction.atomic():
+                                if promo.redeem(order) is not None:
+                                    redeemed.append(order.pk)
+                            break
+                        except OperationalError:
+                            pass  # SQLite: database locked by another writer, try again
+                    else:
+                        raise AssertionError(f"order {order.pk} never got the database")
+            except Exception as exc:  # pragma: no cover - reported below
+                errors.append(exc)
+            finally:
+                connection.close()
+
+        workers = [
+            threading.Thread(target=checkout, args=(orders[n::self.THREADS],))
+            for n in range(self.THREADS)
+        ]
+        for worker in workers:
+            worker.start()
+        for worker in workers:
+            worker.join()
+
+        self.assertEqual(errors, [])
+        promo.refresh_from_db()
+        self.assertEqual(promo.uses_count, 100)
+        self.assertEqual(len(redeemed), 100)
+        self.assertEqual(PromoRedemption.objects.filter(promo=promo).count(), 100)
+
+
+# ---------------------------------------------------------------------------
+# Order history keyset pagination
+# ---------------------------------------------------------------------------
+
+@override_settings(CACHES=LOCMEM_CACHES)
+class OrderHistoryPaginationTest(TestCase):
+    def setUp(self):
+        cache.clear()
+        reset_limiters()
+        self.user = User.objects.create_user(username="historian", password="pass123")
+        self.orders = make_orders(ORDERS_PER_PAGE * 2 + 3, user=self.user)
+        # Half of them share one timestamp, so the id has to break the tie
+        Order.objects.filter(pk__in=[o.pk for o in self.orders[::2]]).update(
+            created_at=timezone.now() - datetime.timedelta(hours=1)
+        )
+        # A guest's order never shows up
+        Order.objects.create(reference="GUEST001", full_name="Guest", phone="0", email="g@g.com")
+        self.client.login(username="historian", password="pass123")
+
+    def tearDown(self):
+        reset_limiters()
+
+    def _load_more(self, cursor):
+        response = self.client.get(
+            "/orders/history/", {"after": cursor}, HTTP_X_REQUESTED_WITH="XMLHttpRequest"
+        )
+        return response.json()
+
+    def test_pages_cover_every_order_once(self):
+        response = self.client.get("/orders/history/")
+        seen = [order.reference for order in response.context["orders"]]
+        self.assertEqual(len(seen), ORDERS_PER_PAGE)
+        cursor = response.context["page"].next_cursor
+        self.assertContains(response, f"?after={cursor}")
+        pages = 1
+        while cursor:
+            data = self._load_more(cursor)
+            seen += re.findall(r"#(R\d{7})<", data["html"])
+            cursor = data["next"]
+            pages += 1
+        self.assertEqual(pages, 3)
+        expected = Order.objects.filter(user=self.user).order_by("-created_at", "-id")
+        self.assertEqual(seen, list(expected.values_list("reference", flat=True)))
+
+    def test_next_page_query_has_no_offset(self):
+        cursor = self.client.get("/orders/history/").context["page"].next_cursor
+        with CaptureQueriesContext(connection) as queries:
+            self._load_more(cursor)
+        order_queries = [q["sql"] for q in queries if 'FROM "orders_order"' in q["sql"]]
+        self.assertEqual(len(order_queries), 1)
+        self.assertNotIn("OFFSET", order_queries[0].upper())
+
+    def test_page_and_fragment_vary_on_requested_with(self):
+        page = self.client.get("/orders/history/")
+        fragment = self.client.get("/orders/history/", HTTP_X_REQUESTED_WITH="XMLHttpRequest")
+        for response in (page, fragment):
+            self.assertIn("X-Requested-With", response["Vary"])
+
+    def test_bad_cursor_shows_first_page(self):
+        response = self.client.get("/orders/history/", {"after": "nonsense"})
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(len(response.context["orders"]), ORDERS_PER_PAGE)
+
+    def test_cursor_round_trip(self):
+        order = Order.objects.get(pk=self.orders[0].pk)
+        self.assertEqual(decode_cursor(encode_cursor(order)), (order.created_at, order.pk))
+
+
+# ---------------------------------------------------------------------------
+# Stored order item summaries
+# ---------------------------------------------------------------------------
+
+@override_settings(CACHES=LOCMEM_CACHES)
+class OrderItemSummaryTest(TestCase):
+    def setUp(self):
+        cache.clear()
+        reset_limiters()
+        self.user = User.objects.create_user(username="summary", password="pass123")
+        self.orders = make_orders(3, user=self.user)
+        for n, order in enumerate(self.orders):
+            OrderItem.objects.bulk_create([
+                OrderItem(order=order, item_name=f"Dish {k}", item_price=Decimal("4.00"), quantity=k + 1)
+                for k in range(n + 1)
+            ])
+
+    def tearDown(self):
+        reset_limiters()
+
+    def test_long_summary_is_truncated(self):
+        order = Order()
+        order.set_item_summary([OrderItem(item_name="Crispy Chilli Beef" * 4, quantity=1)] * 10)
+        self.assertEqual(order.item_count, 10)
+        self.assertEqual(len(order.items_summary), ITEMS_SUMMARY_LENGTH)
+        self.assertTrue(order.items_summary.endswith("\u2026"))
+
+    def test_backfill_command(self):
+        out = StringIO()
+        call_command("backfill_order_summaries", "--batch-size", "2", stdout=out)
+        self.assertIn("3 order(s)", out.getvalue())
+        last = Order.objects.get(pk=self.orders[2].pk)
+        self.assertEqual(last.item_count, 6)
+        self.assertEqual(last.items_summary, "1\u00d7 Dish 0, 2\u00d7 Dish 1, 3\u00d7 Dish 2")
+        # Already summarised orders are skipped unless --all
+        call_command("backfill_order_summaries", stdout=out)
+        self.assertIn("0 order(s)", out.getvalue())
+        call_command("backfill_order_summaries", "--all", stdout=out)
+        self.assertIn("3 order(s)", out.getvalue().splitlines()[-1])
+
+    def test_history_loads_no_order_items(self):
+        call_command("backfill_order_summaries", stdout=StringIO())
+        self.client.login(username="summary", password="pass123")
+        with CaptureQueriesContext(connection) as queries:
+            response = self.client.get("/orders/history/")
+        self.assertContains(response, "2\u00d7 Dish 1")
+        self.assertContains(response, "6 items")
+        self.assertFalse(any('"orders_orderitem"' in q["sql"] for q in queries))
+
+
+# ---------------------------------------------------------------------------
+# Precomputed favourite items
+# ---------------------------------------------------------------------------
+
+@override_settings(CACHES=LOCMEM_CACHES, BACKGROUND_TASKS_IN_PROCESS=False)
+class FavouriteItemTest(TestCase):
+    def setUp(self):
+        cache.clear()
+        reset_limiters()
+        self.user = User.objects.create_user(username="regular", password="pass123")
+        cat = make_category()
+        self.items = [make_item(cat, name=f"Dish {n}", price="3.00") for n in range(8)]
+
+    def tearDown(self):
+        reset_limiters()
+
+    def _ranked(self):
+        return [self.items.index(MenuItem.objects.get(pk=pk)) for pk in favourite_item_ids(self.user, 10)]
+
+    def test_record_counts_lines_and_ranks(self):
+        ids = [item.pk for item in self.items]
+        day = datetime.timedelta(days=1)
+        record_favourites(self.user.pk, [ids[0], ids[1], ids[1]], timezone.now() - 2 * day)
+        record_favourites(self.user.pk, [ids[2], ids[1]], timezone.now() - day)
+        with self.assertNumQueries(3):  # existing items, insert missing rows, one count-up
+            record_favourites(self.user.pk, [ids[2], ids[3]])
+        # Equal counts: the more recently ordered item first
+        self.assertEqual(self._ranked(), [1, 2, 3, 0])
+        self.assertEqual(FavouriteItem.objects.get(user=self.user, menu_item=self.items[1]).times_ordered, 3)
+
+    def test_checkout_queues_favourites(self):
+        self.client.login(username="regular", password="pass123")
+        ops = [{"op": "add", "item": item.pk} for item in self.items[:2]]
+        self.client.post("/orders/basket/batch/", json.dumps({"ops": ops}), content_type="application/json")
+        self.client.post("/orders/checkout/", {
+            "full_name": "Regular", "email": "r@r.com", "phone": "07700000000",
+            "delivery_type": "collection", "payment_method": "cash_collection",
+        })
+        self.assertFalse(FavouriteItem.objects.exists())  # written by the task, after commit
+        tasks.run_pending()
+        self.assertEqual(sorted(self._ranked()), [0, 1])
+        order = Order.objects.get()
+        self.assertEqual(FavouriteItem.objects.first().last_ordered_at, order.created_at)
+
+    def test_menu_page_reads_favourites_without_aggregating(self):
+        record_favourites(self.user.pk, [item.pk for item in self.items[:3]] + [self.items[2].pk])
+        self.items[2].is_available = False
+        self.items[2].save()
+        self.client.login(username="regular", password="pass123")
+        with CaptureQueriesContext(connection) as queries:
+            response = self.client.get("/menu/")
+        favourites = [entry.pk for entry in response.context["favourite_items"]]
+        self.assertEqual(sorted(favourites), [self.items[0].pk, self.items[1].pk])
+        self.assertFalse(any('"orders_orderitem"' in q["sql"] for q in queries))
+
+
+# ---------------------------------------------------------------------------
+# Per-item daily counters and popular items
+# ---------------------------------------------------------------------------
+
+@override_settings(CACHES=LOCMEM_CACHES)
+class PopularityCounterTest(TestCase):
+    def setUp(self):
+        cache.clear()
+        reset_limiters()
+        cat = make_category()
+        self.cheap = make_item(cat, name="Prawn Crackers", price="2.00")
+        self.dear = make_item(cat, name="Peking Duck", price="20.00")
+        self.other = make_item(cat, name="Boiled Rice", price="3.00")
+
+    def tearDown(self):
+        reset_limiters()
+
+    def _line(self, item, quantity=1):
+        return OrderItem(menu_item=item, item_name=item.name, item_price=item.price, quantity=quantity)
+
+    def _run_command(self, *args):
+        out = StringIO()
+        call_command("update_popular_items", *args, stdout=out)
+        return out.getvalue()
+
+    def test_record_adds_lines_in_two_queries(self):
+        record_item_stats([self._line(self.cheap, 2), self._line(self.dear)])
+        with self.assertNumQueries(2):
+            record_item_stats([self._line(self.cheap, 3), self._line(self.cheap), self._line(self.other)])
+        stat = MenuItemDailyStat.objects.get(menu_item=self.cheap)
+        self.assertEqual((stat.order_count, stat.quantity, stat.revenue), (3, 6, Decimal("12.00")))
+        self.assertEqual(stat.date, timezone.localdate())
+        self.assertEqual(MenuItemDailyStat.objects.count(), 3)
+
+    def test_checkout_counts_items(self):
+        User.objects.create_user(username="counter", password="pass123")
+        self.client.login(username="counter", password="pass123")
+        ops = [{"op": "add", "item": self.dear.pk}, {"op": "add", "item": self.dear.pk}]
+        self.client.post("/orders/basket/batch/", json.dumps({"ops": ops}), content_type="application/json")
+        self.client.post("/orders/checkout/", {
+            "full_name": "Counter", "email": "c@c.com", "phone": "07700000000",
+            "delivery_type": "collection", "payment_method": "cash_collection",
+        })
+        stat = MenuItemDailyStat.objects.get()
+        self.assertEqual((stat.menu_item, stat.quantity, stat.revenue), (self.dear, 2, Decimal("40.00")))
+
+    def test_ranking_and_window(self):
+        record_item_stats([self._line(self.cheap, 5), self._line(self.cheap)])
+        record_item_stats([self._line(self.dear)])
+        record_item_stats([self._line(self.other, 20)], timezone.now() - datetime.timedelta(days=10))
+        self.assertEqual(popular_item_ids(1, 7), [self.cheap.pk])
+        self.assertEqual(popular_item_ids(1, 7, "revenue"), [self.dear.pk])
+        self.assertEqual(popular_item_ids(1, 30, "quantity"), [self.other.pk])
+
+    def test_command_only_writes_changed_flags(self):
+        MenuItem.objects.filter(pk=self.other.pk).update(is_popular=True)
+        record_item_stats([self._line(self.cheap), self._line(self.dear)])
+        output = self._run_command("--top", "2")
+        self.assertIn("2 marked popular, 1 cleared, 0 unchanged", output)
+        self.assertIn("Scored in", output)
+        self.assertEqual(
+            set(MenuItem.objects.filter(is_popular=True).values_list("pk", flat=True)),
+            {self.cheap.pk, self.dear.pk},
+        )
+        version = get_menu_version()
+        with CaptureQueriesContext(connection) as queries:
+            output = self._run_command("--top", "2")
+        self.assertIn("0 marked popular, 0 cleared, 2 unchanged", output)
+        self.assertFalse(any(q["sql"].startswith("UPDATE") for q in queries))
+        self.assertEqual(get_menu_version(), version)
@@ -12,6 +12,7 @@ urlpatterns = [
     path("basket/add/<int:item_id>/", views.basket_add, name="basket_add"),
     path("basket/update/<int:item_id>/", views.basket_update, name="basket_update"),
     path("basket/remove/<int:item_id>/", views.basket_remove, name="basket_remove"),
+    path("basket/batch/", views.basket_batch, name="basket_batch"),
     path("basket/note/<int:item_id>/", views.basket_note, name="basket_note"),
     path("basket/promo/apply/", views.apply_promo, name="apply_promo"),
     path("basket/promo/remove/", views.remove_promo, name="remove_promo"),
@@ -24,6 +25,7 @@ urlpatterns = [
     path("deal-picker/<int:item_id>/", views.deal_picker, name="deal_picker"),
     path("kitchen/", views.kitchen_display, name="kitchen_display"),
     path("kitchen/partial/", views.kitchen_orders_partial, name="kitchen_partial"),
+    path("kitchen/stream/", views.kitchen_stream, name="kitchen_stream"),
     path("kitchen/update/<str:reference>/", views.kitchen_update_status, name="kitchen_update_status"),
     path("kitchen/cancel/<str:reference>/", views.kitchen_cancel_order, name="kitchen_cancel_order"),
 ]
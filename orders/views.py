@@ -2,92 +2,51 @@
 Orders app views — basket, checkout, confirmation, and order history.
 """
 
-import datetime
+import json
 import time as _time
-from zoneinfo import ZoneInfo
 from decimal import Decimal
 
 from django.shortcuts import render, redirect, get_object_or_404
 from django.contrib.auth.decorators import login_required
 from django.contrib.admin.views.decorators import staff_member_required
-from django.contrib.auth import get_user_model
 from django.contrib import messages
-from django.contrib.admin.models import LogEntry, ADDITION
-from django.contrib.contenttypes.models import ContentType
-from django.db.models import F
-from django.http import JsonResponse
-from django.views.decorators.http import require_POST
+from django.db.models import Count, Max
+from django.http import HttpResponse, JsonResponse, StreamingHttpResponse
+from django.template.loader import render_to_string
+from django.utils.cache import patch_cache_control
+from django.views.decorators.http import condition, require_POST
+from django.views.decorators.vary import vary_on_headers
 from django.utils import timezone
 from datetime import timedelta
-from django.core.cache import cache
 
-from .basket import Basket, MIN_ORDER_DELIVERY, FREE_DELIVERY_THRESHOLD
+from despair.pagination import keyset_page
+from .basket import Basket, MIN_ORDER_DELIVERY
+from . import kitchen_feed
 from .forms import CheckoutForm
-from .models import Order, OrderItem, OpeningHours, PromoCode
-from .signals import sync_basket_to_profile
+from .kitchen_feed import KITCHEN_STATUSES
+from .models import Order, PromoCode
+from .promos import get_first_order_promo, get_promo, is_first_order_code, is_first_order_customer
+from .ratelimit import is_rate_limited, rate_limit
+from .schedule import get_opening_status
+from .services import CheckoutToken, OrderPlacementService, PromoUnavailable, new_checkout_token
+from .signals import flush_basket_sync, sync_basket_to_profile
 from menu.models import MenuItem
 
 
-def _log_admin_action(request, obj, action_flag, message=""):
-    """Create a Django admin LogEntry so the action shows in Recent Actions."""
-    User = get_user_model()
-    if request.user.is_authenticated:
-        actor_id = request.user.pk
-    else:
-        actor_id = User.objects.filter(is_superuser=True).values_list("pk", flat=True).first()
-    if actor_id is None:
-        return
-    LogEntry.objects.log_action(
-        user_id=actor_id,
-        content_type_id=ContentType.objects.get_for_model(obj).pk,
-        object_id=obj.pk,
-        object_repr=str(obj),
-        action_flag=action_flag,
-        change_message=message,
-    )
-
-
-def _check_rate_limit(request, key, limit=10, period=60):
-    """
-    Returns True if the request should proceed, False if it should be blocked.
-    Stores {count, window_start} in a single cache entry so the 60s window is
-    self-contained — not dependent on cache backend TTL accuracy.
-    """
-    ip = (
-        request.META.get("HTTP_X_FORWARDED_FOR", "").split(",")[0].strip()
-        or request.META.get("REMOTE_ADDR", "anon")
-    )
-    cache_key = f"rl:{key}:{ip}"
-    now = _time.time()
-    data = cache.get(cache_key)
-    if data is None or (now - data.get("start", 0)) >= period:
-        # New window — reset counter
-        cache.set(cache_key, {"count": 1, "start": now}, period + 10)
-        return True
-    if data["count"] >= limit:
-        return False
-    data["count"] += 1
-    remaining = int(period - (now - data["start"])) + 5
-    cache.set(cache_key, data, remaining)
-    return True
-
-
-LONDON_TZ = ZoneInfo("Europe/London")
-
-
-def _revalidate_promo(basket, request=None):
+def _revalidate_promo(basket, request=None, fresh=False):
     """
     After any basket mutation, check whether the applied promo code still meets
     its minimum-order requirement against the new subtotal. If it no longer
     qualifies, remove it from the session and optionally warn the user.
     Returns True if the promo was removed, False otherwise.
+    The code comes from the promo registry unless ``fresh`` (checkout) asks
+    for the database row, with its current uses_count.
     """
     code = basket.promo_code
     if not code:
         return False
-    try:
-        promo = PromoCode.objects.get(code=code)
-    except PromoCode.DoesNotExist:
+    promo = PromoCode.objects.filter(code=code).first() if fresh else get_promo(code)
+    if promo is None:
         basket.remove_promo()
         return True
     valid, err = promo.is_valid(subtotal=basket.get_subtotal())
@@ -102,30 +61,41 @@ def _revalidate_promo(basket, request=None):
     return False
 
 
+def _auto_apply_first_order_promo(request, basket):
+    """
+    Apply the first-order discount for a logged-in user with no orders yet
+    and no promo in the basket. Returns the message to show, or None.
+    """
+    if not (basket and not basket.promo_code and is_first_order_customer(request.user)):
+        return None
+    first_promo = get_first_order_promo()
+    if not first_promo:
+        return None
+    subtotal = basket.get_subtotal()
+    valid, _ = first_promo.is_valid(subtotal=subtotal)
+    if not valid:
+        return None
+    basket.apply_promo(first_promo.code, first_promo.get_discount(subtotal))
+    return f"\U0001f389 First order discount ({first_promo}) applied automatically!"
+
+
 def _basket_ajax_summary(basket, item_id=None):
     """Build a rich JSON-serialisable dict with all basket summary data for AJAX responses."""
-    subtotal = basket.get_subtotal()
-    delivery_charge = basket.get_delivery_charge()  # defaults to 'delivery' type
-    discount = basket.get_discount()
-    total = basket.get_total()
-    free_del_remaining = max(Decimal("0.00"), FREE_DELIVERY_THRESHOLD - subtotal)
-    free_del_pct = min(100, int(subtotal / FREE_DELIVERY_THRESHOLD * 100)) if subtotal > 0 else 0
+    totals = basket.totals()  # priced once, 'delivery' type
     result = {
-        "subtotal": str(subtotal),
-        "delivery_charge": str(delivery_charge),
-        "delivery_is_free": delivery_charge == Decimal("0.00"),
-        "discount": str(discount),
-        "has_discount": discount > Decimal("0.00"),
-        "total": str(total),
-        "free_delivery_remaining": str(free_del_remaining),
-        "free_delivery_pct": free_del_pct,
+        "subtotal": str(totals.subtotal),
+        "delivery_charge": str(totals.delivery_charge),
+        "delivery_is_free": totals.delivery_is_free,
+        "discount": str(totals.discount),
+        "has_discount": totals.discount > Decimal("0.00"),
+        "total": str(totals.total),
+        "free_delivery_remaining": str(totals.free_delivery_remaining),
+        "free_delivery_pct": totals.free_delivery_pct,
         "promo_code": basket.promo_code,
-        "promo_locked": PromoCode.objects.filter(
-            code=basket.promo_code, first_order_only=True
-        ).exists() if basket.promo_code else False,
+        "promo_locked": is_first_order_code(basket.promo_code),
         # Legacy keys kept for compatibility with menu-page AJAX JS
-        "basket_count": basket.get_total_quantity(),
-        "basket_subtotal": str(subtotal),
+        "basket_count": totals.quantity,
+        "basket_subtotal": str(totals.subtotal),
     }
     if item_id is not None:
         item_data = basket.basket.get(str(item_id), {})
@@ -142,47 +112,6 @@ _COKE_PK = 43
 _FREE_DRINK_THRESHOLD = Decimal("70.00")
 
 
-def _get_opening_status():
-    """
-    Return (is_open: bool, next_open_text: str | None) based on London time.
-    next_open_text is a human-readable string like "Tomorrow at 12:00 PM"
-    or "Saturday at 5:00 PM".
-    """
-    now_london = datetime.datetime.now(tz=LONDON_TZ)
-    today = now_london.weekday()  # 0=Monday
-    now_time = now_london.time()
-
-    hours_by_day = {h.day: h for h in OpeningHours.objects.all()}
-
-    today_hours = hours_by_day.get(today)
-    is_open = False
-    if today_hours and not today_hours.is_closed and today_hours.opening_time and today_hours.closing_time:
-        is_open = today_hours.opening_time <= now_time <= today_hours.closing_time
-
-    # Find next opening window (within 7 days)
-    next_open_text = None
-    for offset in range(1, 8):
-        check_day = (today + offset) % 7
-        h = hours_by_day.get(check_day)
-        if h and not h.is_closed and h.opening_time:
-            # If same day but before opening, that counts as "today later"
-            if offset == 0 and now_time < h.opening_time:
-                day_label = "Today"
-            elif offset == 1:
-                day_label = "Tomorrow"
-            else:
-                day_label = h.get_day_display()
-            open_str = datetime.datetime.combine(datetime.date.today(), h.opening_time).strftime("%-I:%M %p")
-            next_open_text = f"{day_label} at {open_str}"
-            break
-    # Also check if today opens later
-    if not is_open and today_hours and not today_hours.is_closed and today_hours.opening_time:
-        if now_time < today_hours.opening_time:
-            open_str = datetime.datetime.combine(datetime.date.today(), today_hours.opening_time).strftime("%-I:%M %p")
-            next_open_text = f"Today at {open_str}"
-    return is_open, next_open_text
-
-
 # Minutes remaining from *now* for each delivery type + status combination
 _STATUS_EST_MINUTES = {
     "delivery": {
@@ -245,39 +174,18 @@ def basket_view(request):
 
     # If basket is emptied (without ordering) and a first-order promo is still set,
     # clear it so the auto-apply recalculates on the next visit with items.
-    if not basket and basket.promo_code:
-        try:
-            _ = PromoCode.objects.get(code=basket.promo_code, first_order_only=True)
-            basket.remove_promo()
-            request.session.pop("_first_promo_applied", None)
-        except PromoCode.DoesNotExist:
-            pass
+    if not basket and is_first_order_code(basket.promo_code):
+        basket.remove_promo()
+        request.session.pop("_first_promo_applied", None)
         subtotal = basket.get_subtotal()
 
     # Auto-apply first-order discount for new logged-in users
-    if (
-        request.user.is_authenticated
-        and basket
-        and not basket.promo_code
-        and not Order.objects.filter(user=request.user).exists()
-    ):
-        first_promo = PromoCode.objects.filter(first_order_only=True, active=True).first()
-        if first_promo:
-            valid, _ = first_promo.is_valid(subtotal=subtotal)
-            if valid:
-                discount = first_promo.get_discount(subtotal)
-                basket.apply_promo(first_promo.code, discount)
-                messages.success(
-                    request,
-                    f"\U0001f389 First order discount ({first_promo}) applied automatically!",
-                )
+    auto_promo_msg = _auto_apply_first_order_promo(request, basket)
+    if auto_promo_msg:
+        messages.success(request, auto_promo_msg)
 
     # Is the current promo locked (first-order only — customer cannot remove it)?
-    promo_is_locked = (
-        PromoCode.objects.filter(code=basket.promo_code, first_order_only=True).exists()
-        if basket.promo_code
-        else False
-    )
+    promo_is_locked = is_first_order_code(basket.promo_code)
 
     # Contextual upsell nudges
     show_prawn_crackers = str(_PRAWN_CRACKERS_PK) not in basket_item_ids
@@ -294,7 +202,7 @@ def basket_view(request):
             coke = MenuItem.objects.get(pk=_COKE_PK, is_available=True)
         except MenuItem.DoesNotExist:
             pass
-    is_open, next_open_text = _get_opening_status()
+    is_open, next_open_text = get_opening_status()
     free_delivery_remaining = max(Decimal("0.00"), Decimal("20.00") - subtotal)
     # Sync basket to profile after any changes (auto-apply, empty-basket reset)
     sync_basket_to_profile(request)
@@ -324,21 +232,8 @@ def basket_add(request, item_id):
     quantity = int(request.POST.get("quantity", 1))
     basket.add(item, quantity=quantity)
 
-    # Auto-apply first-order promo if conditions are met (mirrors basket_view logic)
-    auto_promo_msg = None
-    if (
-        request.user.is_authenticated
-        and not basket.promo_code
-        and not Order.objects.filter(user=request.user).exists()
-    ):
-        subtotal_now = basket.get_subtotal()
-        first_promo = PromoCode.objects.filter(first_order_only=True, active=True).first()
-        if first_promo:
-            valid, _ = first_promo.is_valid(subtotal=subtotal_now)
-            if valid:
-                discount = first_promo.get_discount(subtotal_now)
-                basket.apply_promo(first_promo.code, discount)
-                auto_promo_msg = f"\U0001f389 First order discount ({first_promo}) applied automatically!"
+    # Auto-apply first-order promo if conditions are met (same rule as basket_view)
+    auto_promo_msg = _auto_apply_first_order_promo(request, basket)
 
     # Sync basket to profile for cross-device consistency
     sync_basket_to_profile(request)
@@ -404,12 +299,92 @@ def basket_remove(request, item_id):
     return redirect("orders:basket")
 
 
+BASKET_BATCH_MAX_OPS = 50
+BASKET_BATCH_OPS = ("add", "set", "remove")
+
+
+@require_POST
+def basket_batch(request):
+    """
+    Apply several basket changes in one request. Called via AJAX by the
+    menu and basket pages, which coalesce rapid +/- clicks.
+
+    Body (JSON): {"ops": [{"op": "add", "item": 12, "quantity": 1},
+                          {"op": "set", "item": 7, "quantity": 3},
+                          {"op": "remove", "item": 9}]}
+
+    "set" to 0 removes the item; "set" on an item not yet in the basket adds
+    it. Every op is validated before any is applied, so a bad op leaves the
+    basket untouched. Promo revalidation, first-order auto-apply and the
+    profile sync then run once for the whole batch.
+    """
+    try:
+        ops = json.loads(request.body or b"{}").get("ops")
+        if not isinstance(ops, list) or not 0 < len(ops) <= BASKET_BATCH_MAX_OPS:
+            raise ValueError
+        parsed = []
+        for op in ops:
+            kind = op["op"]
+            item_id = int(op["item"])
+            quantity = int(op.get("quantity", 1 if kind == "add" else 0))
+            if kind not in BASKET_BATCH_OPS or quantity < (1 if kind == "add" else 0):
+                raise ValueError
+            parsed.append((kind, item_id, quantity))
+    except (ValueError, TypeError, KeyError, AttributeError):
+        return JsonResponse({"success": False, "error": "Invalid basket operations."}, status=400)
+
+    basket = Basket(request)
+    # Dry run: which ops add an item to the basket (and so need it available)?
+    present = {int(item_id) for item_id in basket.basket}
+    steps = []
+    for kind, item_id, quantity in parsed:
+        if kind == "remove" or (kind == "set" and quantity == 0):
+            step = "remove"
+            present.discard(item_id)
+        elif kind == "set" and item_id in present:
+            step = "update"
+        else:
+            step = "add"
+            present.add(item_id)
+        steps.append((step, item_id, quantity))
+    needs_item = {item_id for step, item_id, _quantity in steps if step == "add"}
+    items = {item.pk: item for item in MenuItem.objects.filter(pk__in=needs_item, is_available=True)}
+    if needs_item - items.keys():
+        return JsonResponse({"success": False, "error": "That item is no longer available."}, status=404)
+
+    for step, item_id, quantity in steps:
+        if step == "remove":
+            basket.remove(item_id)
+        elif step == "update":
+            basket.update(item_id, quantity)
+        else:
+            basket.add(items[item_id], quantity=quantity)
+
+    promo_removed = _revalidate_promo(basket, request)
+    auto_promo_msg = _auto_apply_first_order_promo(request, basket) if needs_item else None
+    sync_basket_to_profile(request)
+
+    data = _basket_ajax_summary(basket)
+    data["success"] = True
+    data["promo_removed"] = promo_removed
+    data["items"] = {}
+    for item_id in {item_id for _kind, item_id, _quantity in parsed}:
+        entry = basket.basket.get(str(item_id))
+        quantity = entry["quantity"] if entry else 0
+        line_total = Decimal(entry["price"]) * quantity if entry else Decimal("0.00")
+        data["items"][str(item_id)] = {"quantity": quantity, "line_total": str(line_total)}
+    if auto_promo_msg:
+        data["auto_promo_msg"] = auto_promo_msg
+    return JsonResponse(data)
+
+
 @require_POST
+@rate_limit("apply_promo", limit=10, period=60)
 def apply_promo(request):
     """Validate and apply a promo code to the basket session."""
     basket = Basket(request)
     is_ajax = request.headers.get("X-Requested-With") == "XMLHttpRequest"
-    if not _check_rate_limit(request, "apply_promo"):
+    if request.rate_limited:
         err = "Too many attempts. Please wait a minute and try again."
         if is_ajax:
             return JsonResponse({"success": False, "error": err}, status=429)
@@ -422,9 +397,8 @@ def apply_promo(request):
         messages.error(request, "Please enter a promo code.")
         return redirect("orders:basket")
 
-    try:
-        promo = PromoCode.objects.get(code__iexact=code_str)
-    except PromoCode.DoesNotExist:
+    promo = get_promo(code_str)
+    if promo is None:
         if is_ajax:
             return JsonResponse({"success": False, "error": f"'{code_str}' is not a valid promo code."})
         messages.error(request, f"'{code_str}' is not a valid promo code.")
@@ -442,7 +416,7 @@ def apply_promo(request):
         fo_err = None
         if not request.user.is_authenticated:
             fo_err = "This promo code is for first-time customers only. Please sign in to use it."
-        elif Order.objects.filter(user=request.user).exists():
+        elif not is_first_order_customer(request.user):
             fo_err = "This promo code is for new customers only."
         if fo_err:
             if is_ajax:
@@ -467,15 +441,11 @@ def remove_promo(request):
     """Remove any applied promo code from the basket session."""
     basket = Basket(request)
     # Block removal of first-order-only promos — they are auto-applied and locked.
-    if basket.promo_code:
-        try:
-            _ = PromoCode.objects.get(code=basket.promo_code, first_order_only=True)
-            if request.headers.get("X-Requested-With") == "XMLHttpRequest":
-                return JsonResponse({"success": False, "error": "This discount cannot be removed."}, status=403)
-            messages.warning(request, "This discount cannot be removed.")
-            return redirect("orders:basket")
-        except PromoCode.DoesNotExist:
-            pass
+    if is_first_order_code(basket.promo_code):
+        if request.headers.get("X-Requested-With") == "XMLHttpRequest":
+            return JsonResponse({"success": False, "error": "This discount cannot be removed."}, status=403)
+        messages.warning(request, "This discount cannot be removed.")
+        return redirect("orders:basket")
     basket.remove_promo()
     if request.headers.get("X-Requested-With") == "XMLHttpRequest":
         data = _basket_ajax_summary(basket)
@@ -489,11 +459,32 @@ def checkout(request):
     """
     Checkout page. Pre-fills with saved profile data for logged-in users.
     Guests can also checkout — they just need to enter an email.
-    Creates the Order and OrderItems on POST, then clears the basket.
+    Places the order on POST (see orders/services.py), then clears the basket.
     If the restaurant is currently closed, a pre-booking notice is shown.
+    A repeated POST of the same form (double-tap, retry) is sent to the
+    confirmation of the order the first one placed, without counting
+    against the checkout rate limit.
     """
+    token = None
+    if request.method == "POST":
+        token = CheckoutToken(request.POST.get("checkout_token"))
+        if not token.claim():
+            reference = token.existing_reference()
+            if reference:
+                return redirect("orders:confirmation", reference=reference)
+            messages.info(request, "Your order is still being placed — please wait a moment.")
+            return redirect("orders:checkout")
+    try:
+        return _checkout(request, token)
+    finally:
+        if token is not None:
+            token.release()
+
+
+def _checkout(request, token):
+    """Body of ``checkout``; ``token`` is the POST's claimed CheckoutToken."""
     basket = Basket(request)
-    is_open, next_open_text = _get_opening_status()
+    is_open, next_open_text = get_opening_status()
 
     if not basket:
         messages.warning(request, "Your basket is empty.")
@@ -514,7 +505,7 @@ def checkout(request):
             }
 
     if request.method == "POST":
-        if not _check_rate_limit(request, "checkout", limit=5, period=60):
+        if is_rate_limited(request, "checkout", limit=5, period=60):
             messages.error(request, "Too many checkout attempts. Please wait a minute and try again.")
             return redirect("orders:checkout")
         form = CheckoutForm(request.POST)
@@ -540,13 +531,14 @@ def checkout(request):
                     "is_open": is_open,
                     "next_open_text": next_open_text,
                     "profile_has_address": profile_has_address_err,
+                    "checkout_token": new_checkout_token(),
                 })
             order = form.save(commit=False)
             order.user = request.user if request.user.is_authenticated else None
             order.subtotal = basket.get_subtotal()
             order.delivery_charge = basket.get_delivery_charge(delivery_type)
             # Final safety check: ensure the promo still qualifies at checkout subtotal
-            _revalidate_promo(basket)
+            _revalidate_promo(basket, fresh=True)
             order.discount_amount = basket.get_discount()
             order.promo_code = basket.promo_code
             order.total = basket.get_total(delivery_type)
@@ -555,40 +547,29 @@ def checkout(request):
                 raw_card = form.cleaned_data.get("card_number", "").replace(" ", "")
                 order.card_last_four = raw_card[-4:] if raw_card else ""
 
-            order.save()
-
-            # Increment promo code uses_count
-            if order.promo_code:
-                PromoCode.objects.filter(code=order.promo_code).update(
-                    uses_count=F("uses_count") + 1
-                )
-
-            # Log to admin Recent Actions
-            _log_admin_action(request, order, ADDITION, "Order placed via website")
-
-            for item_data in basket:
-                OrderItem.objects.create(
-                    order=order,
-                    menu_item=item_data["menu_item"],
-                    item_name=item_data["menu_item"].name,
-                    item_price=item_data["price"],
-                    quantity=item_data["quantity"],
-                    notes=item_data.get("notes", ""),
-                )
-
             # Save address back to profile if checkbox ticked
+            address = None
             if request.user.is_authenticated and request.POST.get("save_address"):
-                profile = getattr(request.user, "profile", None)
-                if profile:
-                    profile.address_line1 = form.cleaned_data.get("address_line1", "")
-                    profile.address_line2 = form.cleaned_data.get("address_line2", "")
-                    profile.city = form.cleaned_data.get("city", "")
-                    profile.postcode = form.cleaned_data.get("postcode", "")
-                    if form.cleaned_data.get("phone"):
-                        profile.phone = form.cleaned_data["phone"]
-                    profile.save()
+                address = {
+                    field: form.cleaned_data.get(field, "")
+                    for field in ("address_line1", "address_line2", "city", "postcode", "phone")
+                }
+
+            try:
+                OrderPlacementService(request, basket).place(order, address=address)
+            except PromoUnavailable:
+                # Another customer took the code's last use — nothing was saved
+                basket.remove_promo()
+                messages.error(
+                    request,
+                    f"Sorry, promo code {order.promo_code} has just run out. "
+                    "Please check your new total and try again.",
+                )
+                return redirect("orders:basket")
+            token.complete(order.reference)
 
             basket.clear()
+            flush_basket_sync(request)
             # Store reference in session so guests can access the confirmation
             request.session["last_order_reference"] = order.reference
             messages.success(request, f"Order #{order.reference} placed successfully!")
@@ -610,6 +591,7 @@ def checkout(request):
         "is_open": is_open,
         "next_open_text": next_open_text,
         "profile_has_address": profile_has_address,
+        "checkout_token": new_checkout_token(),
     })
 
 
@@ -636,11 +618,30 @@ def order_confirmation(request, reference):
     })
 
 
+ORDERS_PER_PAGE = 10
+
+
 @login_required
+@vary_on_headers("X-Requested-With")
 def order_history(request):
-    """Lists all past orders for the logged-in user."""
-    orders = Order.objects.filter(user=request.user).prefetch_related("items")
-    return render(request, "orders/history.html", {"orders": orders})
+    """
+    Lists the logged-in user's past orders, newest first, ORDERS_PER_PAGE at
+    a time. "Load more" fetches ``?after=<cursor>`` over AJAX and gets back
+    the next cards as an HTML fragment plus the cursor after them. Cards use
+    the order's stored item summary, so no OrderItem rows are loaded.
+    Both answers share a URL, so the response varies on X-Requested-With.
+    """
+    page = keyset_page(
+        Order.objects.filter(user=request.user).select_related("review"),
+        request.GET.get("after"),
+        ORDERS_PER_PAGE,
+    )
+    if request.headers.get("X-Requested-With") == "XMLHttpRequest":
+        return JsonResponse({
+            "html": render_to_string("orders/_history_cards.html", {"orders": page.items}, request=request),
+            "next": page.next_cursor,
+        })
+    return render(request, "orders/history.html", {"orders": page.items, "page": page})
 
 
 def _build_status_steps(order):
@@ -696,23 +697,47 @@ def reorder(request, reference):
     return redirect("orders:basket")
 
 
-def order_status_api(request, reference):
-    """JSON endpoint for the status-tracker polling — returns current status and est time."""
+def _status_api_orders(request, reference):
+    """Orders the current visitor may track by ``reference`` (guests: session only)."""
     if request.user.is_authenticated:
-        order = get_object_or_404(Order, reference=reference, user=request.user)
-    else:
-        session_ref = request.session.get("last_order_reference")
-        if session_ref != reference:
-            return JsonResponse({"error": "not found"}, status=404)
-        order = get_object_or_404(Order, reference=reference, user__isnull=True)
+        return Order.objects.filter(reference=reference, user=request.user)
+    if request.session.get("last_order_reference") != reference:
+        return Order.objects.none()
+    return Order.objects.filter(reference=reference, user__isnull=True)
+
+
+def _minute_bucket():
+    """Part of each ETag so time-relative text ("5 min ago", arrival time) refreshes once a minute."""
+    return int(_time.time() // 60)
+
+
+def _order_status_etag(request, reference):
+    """Change token for one order: status + last write, read without loading the row."""
+    row = _status_api_orders(request, reference).values_list("status", "updated_at").first()
+    if row is None:
+        return None  # let the view answer the 404
+    status, updated_at = row
+    return f"{reference}-{status}-{updated_at.timestamp():.6f}-{_minute_bucket()}"
+
+
+@condition(etag_func=_order_status_etag)
+def order_status_api(request, reference):
+    """JSON endpoint for the status-tracker polling — returns current status and est time.
+    Answers If-None-Match with a 304 while the order is unchanged.
+    """
+    order = _status_api_orders(request, reference).first()
+    if order is None:
+        return JsonResponse({"error": "not found"}, status=404)
     est_minutes = _est_for_status(order)
     est_arrival = timezone.now() + timedelta(minutes=est_minutes)
-    return JsonResponse({
+    response = JsonResponse({
         "status": order.status,
         "status_display": order.get_status_display(),
         "est_minutes": est_minutes,
         "est_arrival": est_arrival.strftime("%-I:%M %p"),
     })
+    patch_cache_control(response, private=True, no_cache=True)
+    return response
 
 
 def deal_picker(request, item_id):
@@ -772,7 +797,6 @@ def deal_picker(request, item_id):
 # Kitchen Display Screen
 # ---------------------------------------------------------------------------
 
-KITCHEN_STATUSES = ["pending", "confirmed", "preparing", "ready"]
 KITCHEN_NEXT_STATUS = {
     "pending": "confirmed",
     "confirmed": "preparing",
@@ -785,8 +809,12 @@ KITCHEN_NEXT_STATUS = {
 def kitchen_display(request):
     """Full-page kitchen view — designed to be left open on a tablet.
     Shows all active (non-complete, non-cancelled) orders as large cards.
-    Auto-refreshes every 5 s via JS.
+    Kept up to date by the kitchen_stream SSE endpoint, or by polling the
+    partial every 5 s when the stream isn't available.
     """
+    # Read the feed position first so nothing published while the page
+    # renders is missed by the stream
+    last_event_id = kitchen_feed.latest_event_id()
     active_orders = (
         Order.objects
         .filter(status__in=KITCHEN_STATUSES)
@@ -796,6 +824,7 @@ def kitchen_display(request):
     return render(request, "orders/kitchen_display.html", {
         "active_orders": active_orders,
         "kitchen_next_status": KITCHEN_NEXT_STATUS,
+        "last_event_id": last_event_id,
     })
 
 
@@ -807,7 +836,8 @@ def kitchen_update_status(request, reference):
     next_status = KITCHEN_NEXT_STATUS.get(order.status)
     if next_status:
         order.status = next_status
-        order.save(update_fields=["status"])
+        order.save(update_fields=["status", "updated_at"])
+        kitchen_feed.publish(order)
         return JsonResponse({"ok": True, "new_status": order.status})
     return JsonResponse({"ok": False, "error": "No next status"}, status=400)
 
@@ -819,16 +849,28 @@ def kitchen_cancel_order(request, reference):
     order = get_object_or_404(Order, reference=reference)
     if order.status not in (Order.STATUS_COMPLETED, Order.STATUS_CANCELLED):
         order.status = Order.STATUS_CANCELLED
-        order.save(update_fields=["status"])
+        order.save(update_fields=["status", "updated_at"])
+        kitchen_feed.publish(order)
         return JsonResponse({"ok": True})
     return JsonResponse({"ok": False, "error": "Order cannot be cancelled"}, status=400)
 
 
+def _kitchen_board_etag(request):
+    """Change token for the whole active board: order count + latest write."""
+    board = Order.objects.filter(status__in=KITCHEN_STATUSES).aggregate(
+        count=Count("id"), latest=Max("updated_at"),
+    )
+    latest = board["latest"].timestamp() if board["latest"] else 0
+    return f"kitchen-{board['count']}-{latest:.6f}-{_minute_bucket()}"
+
+
 @staff_member_required
+@condition(etag_func=_kitchen_board_etag)
 def kitchen_orders_partial(request):
     """Returns only the order-cards HTML fragment for AJAX polling.
-    Called every 5 s by the kitchen display JS to update the grid
-    without a full page reload.
+    Used by the kitchen display JS after a button press, and every 5 s
+    when the SSE stream isn't available. Unchanged boards get a 304
+    without loading items or rendering the template.
     """
     active_orders = (
         Order.objects
@@ -836,6 +878,33 @@ def kitchen_orders_partial(request):
         .prefetch_related("items")
         .order_by("created_at")
     )
-    return render(request, "orders/kitchen_partial.html", {
+    response = render(request, "orders/kitchen_partial.html", {
         "active_orders": active_orders,
     })
+    patch_cache_control(response, private=True, no_cache=True)
+    return response
+
+
+@staff_member_required
+def kitchen_stream(request):
+    """Server-Sent Events stream of kitchen order changes.
+    Resumes after the Last-Event-ID header sent by a reconnecting
+    EventSource, or after ``?since=`` on the first connection. Answers 503
+    when the process already serves kitchen_feed.MAX_STREAMS streams, and
+    the display falls back to polling.
+    """
+    kitchen_feed.prune_events()
+    raw_last_id = request.headers.get("Last-Event-ID") or request.GET.get("since")
+    try:
+        last_id = int(raw_last_id)
+    except (TypeError, ValueError):
+        last_id = kitchen_feed.latest_event_id()
+    events = kitchen_feed.open_stream(last_id)
+    if events is None:
+        response = HttpResponse("Too many kitchen streams.", status=503, content_type="text/plain")
+        response["Retry-After"] = str(kitchen_feed.STREAM_SECONDS)
+        return response
+    response = StreamingHttpResponse(events, content_type="text/event-stream")
+    response["Cache-Control"] = "no-cache"
+    response["X-Accel-Buffering"] = "no"  # stop proxies buffering the stream
+    return response
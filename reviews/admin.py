@@ -7,7 +7,9 @@ an owner reply that appears publicly under the review.
 from django.contrib import admin
 from django.utils import timezone
 from django.utils.html import format_html, mark_safe
+from orders.admin_context import invalidate_admin_stats
 from .models import Review
+from .summary import invalidate_rating_summary
 
 
 @admin.register(Review)
@@ -127,10 +129,14 @@ class ReviewAdmin(admin.ModelAdmin):
     @admin.action(description="✓ Approve selected reviews")
     def approve_reviews(self, request, queryset):
         updated = queryset.update(is_approved=True)
+        invalidate_admin_stats()
+        invalidate_rating_summary()  # update() skips the Review signals
         self.message_user(request, f"{updated} review(s) approved and now visible publicly.")
 
     @admin.action(description="✗ Reject (hide) selected reviews")
     def reject_reviews(self, request, queryset):
         updated = queryset.update(is_approved=False)
+        invalidate_admin_stats()
+        invalidate_rating_summary()
         self.message_user(request, f"{updated} review(s) hidden from the public page.")
 
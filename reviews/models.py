@@ -49,6 +49,10 @@ class Review(models.Model):
 
     class Meta:
         ordering = ["-created_at"]
+        indexes = [
+            # The public list: approved reviews in keyset pages on (created_at, id)
+            models.Index(fields=["is_approved", "-created_at", "-id"], name="review_approved_created"),
+        ]
 
     def __str__(self):
         username = self.user.username if self.user else "Guest"
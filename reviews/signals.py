@@ -0,0 +1,17 @@
+"""
+Review signals — any save or delete of a Review (the public views, the
+admin change form, a customer deleting their own review) drops the cached
+rating summary (see reviews/summary.py).
+"""
+
+from django.db.models.signals import post_delete, post_save
+from django.dispatch import receiver
+
+from .models import Review
+from .summary import invalidate_rating_summary
+
+
+@receiver(post_save, sender=Review)
+@receiver(post_delete, sender=Review)
+def invalidate_rating_summary_on_change(sender, **kwargs):
+    invalidate_rating_summary()
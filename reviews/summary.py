@@ -0,0 +1,64 @@
+"""
+Cached rating summary for the public reviews page.
+
+The average rating and the per-star breakdown come from a single grouped
+query — one COUNT per star over the approved reviews — and the result is
+cached until a review changes. Saves and deletes drop it through the
+Review signals (reviews/signals.py); the admin approve/reject actions use
+``queryset.update()``, which skips signals, so they drop it themselves.
+Either way it is dropped straight away and again once the write commits.
+"""
+
+from django.core.cache import cache
+from django.db import transaction
+from django.db.models import Count
+
+from .models import Review
+
+RATING_SUMMARY_KEY = "reviews:rating_summary"
+RATING_SUMMARY_TIMEOUT = 60 * 60 * 24
+
+
+def _build_rating_summary():
+    counts = dict.fromkeys(range(1, 6), 0)
+    for row in (
+        Review.objects.filter(is_approved=True)
+        .order_by()
+        .values("rating")
+        .annotate(count=Count("id"))
+    ):
+        counts[row["rating"]] = row["count"]
+    review_count = sum(counts.values())
+    if not review_count:
+        return {"avg_rating": None, "review_count": 0, "star_breakdown": []}
+    total = sum(star * count for star, count in counts.items())
+    return {
+        "avg_rating": round(total / review_count, 1),
+        "review_count": review_count,
+        "star_breakdown": [
+            {"star": star, "count": counts[star], "pct": round(counts[star] / review_count * 100)}
+            for star in range(5, 0, -1)
+        ],
+    }
+
+
+def get_rating_summary():
+    """{"avg_rating", "review_count", "star_breakdown"} over approved reviews."""
+    summary = cache.get(RATING_SUMMARY_KEY)
+    if summary is None:
+        summary = _build_rating_summary()
+        cache.set(RATING_SUMMARY_KEY, summary, RATING_SUMMARY_TIMEOUT)
+    return summary
+
+
+def _drop_cached_summary():
+    cache.delete(RATING_SUMMARY_KEY)
+
+
+def invalidate_rating_summary():
+    """
+    Drop the summary now and again on commit, so a page rendered in
+    between (still counting the old rows) doesn't leave it cached for a day.
+    """
+    _drop_cached_summary()
+    transaction.on_commit(_drop_cached_summary)
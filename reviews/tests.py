@@ -1,16 +1,25 @@
 """
 Unit tests for the reviews app.
 Covers the Review model properties, one-review-per-order constraint,
-and the public reviews list view.
+the public reviews list view, the cached rating summary and the guest
+receipt lookup.
 """
 
 from decimal import Decimal
-from django.test import TestCase
+from django.core.cache import cache
+from django.test import RequestFactory, TestCase, override_settings
+from django.contrib.admin.sites import AdminSite
 from django.contrib.auth.models import User
-from django.db import IntegrityError
+from django.db import IntegrityError, connection
+from django.test.utils import CaptureQueriesContext
+from django.utils import timezone
 
 from orders.models import Order
+from orders.ratelimit import reset_limiters
+from reviews.admin import ReviewAdmin
 from reviews.models import Review
+from reviews.summary import RATING_SUMMARY_KEY, get_rating_summary
+from reviews.views import REVIEWS_PER_PAGE
 
 
 # ---------------------------------------------------------------------------
@@ -162,3 +171,122 @@ class ReviewsListViewTest(TestCase):
         response = self.client.get("/reviews/")
         self.assertContains(response, "Great food!")
         self.assertContains(response, "Excellent!")
+
+
+# ---------------------------------------------------------------------------
+# Rating summary and load-more pagination
+# ---------------------------------------------------------------------------
+
+LOCMEM_CACHES = {"default": {"BACKEND": "django.core.cache.backends.locmem.LocMemCache"}}
+
+
+@override_settings(CACHES=LOCMEM_CACHES)
+class RatingSummaryTest(TestCase):
+    def setUp(self):
+        cache.clear()
+        self.reviews = []
+        for n, rating in enumerate([5, 5, 4, 2]):
+            user = make_user(f"rater{n}")
+            self.reviews.append(make_review(user, make_order(user), rating=rating))
+        user = make_user("pending")
+        self.pending = make_review(user, make_order(user), rating=1, approved=False)
+
+    def test_summary_from_one_query(self):
+        with self.assertNumQueries(1):
+            summary = get_rating_summary()
+        self.assertEqual(summary["review_count"], 4)
+        self.assertEqual(summary["avg_rating"], 4.0)
+        self.assertEqual(
+            [(row["star"], row["count"], row["pct"]) for row in summary["star_breakdown"]],
+            [(5, 2, 50), (4, 1, 25), (3, 0, 0), (2, 1, 25), (1, 0, 0)],
+        )
+        with self.assertNumQueries(0):
+            get_rating_summary()
+
+    def test_no_reviews(self):
+        Review.objects.all().delete()
+        self.assertEqual(get_rating_summary(), {"avg_rating": None, "review_count": 0, "star_breakdown": []})
+
+    def test_edit_and_delete_refresh_summary(self):
+        get_rating_summary()
+        self.reviews[3].rating = 4
+        self.reviews[3].save()
+        self.assertEqual(get_rating_summary()["avg_rating"], 4.5)
+        self.reviews[0].delete()
+        self.assertEqual(get_rating_summary()["review_count"], 3)
+
+    def test_admin_bulk_actions_refresh_summary(self):
+        get_rating_summary()
+        admin = ReviewAdmin(Review, AdminSite())
+        request = RequestFactory().post("/")
+        admin.message_user = lambda *args, **kwargs: None
+        admin.approve_reviews(request, Review.objects.filter(pk=self.pending.pk))
+        self.assertEqual(get_rating_summary()["review_count"], 5)
+        admin.reject_reviews(request, Review.objects.filter(rating=5))
+        self.assertEqual(get_rating_summary()["review_count"], 3)
+
+    def test_summary_built_before_commit_is_not_kept(self):
+        with self.captureOnCommitCallbacks(execute=True):
+            admin = ReviewAdmin(Review, AdminSite())
+            admin.message_user = lambda *args, **kwargs: None
+            admin.approve_reviews(RequestFactory().post("/"), Review.objects.filter(pk=self.pending.pk))
+            # A page rendered mid-write caches the count it could still see
+            cache.set(RATING_SUMMARY_KEY, {"avg_rating": 4.0, "review_count": 4, "star_breakdown": []})
+        self.assertEqual(get_rating_summary()["review_count"], 5)
+
+    def test_list_loads_more_by_cursor(self):
+        for n in range(REVIEWS_PER_PAGE):
+            user = make_user(f"bulk{n}")
+            make_review(user, make_order(user), rating=3)
+        # Same timestamp on every review, so only the id orders them
+        Review.objects.update(created_at=timezone.now())
+        response = self.client.get("/reviews/")
+        self.assertEqual(len(response.context["reviews"]), REVIEWS_PER_PAGE)
+        self.assertEqual(response.context["review_count"], REVIEWS_PER_PAGE + 4)
+        cursor = response.context["page"].next_cursor
+        self.assertContains(response, f"?after={cursor}")
+
+        self.assertIn("X-Requested-With", response["Vary"])
+
+        with CaptureQueriesContext(connection) as queries:
+            more = self.client.get("/reviews/", {"after": cursor}, HTTP_X_REQUESTED_WITH="XMLHttpRequest")
+        self.assertIn("X-Requested-With", more["Vary"])
+        data = more.json()
+        self.assertFalse(any("OFFSET" in q["sql"].upper() for q in queries))
+        self.assertIsNone(data["next"])
+        self.assertEqual(data["html"].count('class="review-card '), 4)
+        shown = {review.pk for review in response.context["reviews"]}
+        rest = Review.objects.filter(is_approved=True).exclude(pk__in=shown)
+        self.assertEqual(rest.count(), 4)
+        self.assertTrue(all(pk < min(shown) for pk in rest.values_list("pk", flat=True)))
+
+
+# ---------------------------------------------------------------------------
+# Guest review lookup
+# ---------------------------------------------------------------------------
+
+@override_settings(CACHES={"default": {"BACKEND": "django.core.cache.backends.locmem.LocMemCache"}})
+class GuestReviewLookupTest(TestCase):
+    def setUp(self):
+        cache.clear()
+        reset_limiters()
+        self.order = make_order(make_user())
+
+    def tearDown(self):
+        reset_limiters()
+
+    def _lookup(self, email="test@example.com"):
+        return self.client.post("/reviews/by-receipt/", {
+            "reference": self.order.reference, "email": email,
+        })
+
+    def test_valid_lookup_shows_review_form(self):
+        response = self._lookup()
+        self.assertContains(response, 'name="submit_review"')
+
+    def test_lookups_are_rate_limited(self):
+        for _ in range(10):
+            self._lookup(email="guess@example.com")
+        response = self._lookup()
+        self.assertContains(response, "Too many lookups")
+        self.assertNotContains(response, 'name="submit_review"')
@@ -6,62 +6,52 @@ guests who provide their order receipt number + email.
 
 from django.shortcuts import render, redirect, get_object_or_404
 from django.contrib.auth.decorators import login_required
-from django.contrib.auth import get_user_model
 from django.contrib import messages
-from django.contrib.admin.models import LogEntry, ADDITION, CHANGE, DELETION
-from django.contrib.contenttypes.models import ContentType
+from django.contrib.admin.models import ADDITION, CHANGE, DELETION
 from django.core.exceptions import PermissionDenied
+from django.db import transaction
+from django.http import JsonResponse
+from django.template.loader import render_to_string
+from django.views.decorators.vary import vary_on_headers
 
+from despair.pagination import keyset_page
 from .models import Review
 from .forms import ReviewForm, ReceiptLookupForm
+from .summary import get_rating_summary
 from orders.models import Order
+from orders.ratelimit import is_rate_limited
+from orders.tasks import enqueue_admin_log
 
-
-def _log_admin_action(request, obj, action_flag, message=""):
-    """Create a Django admin LogEntry so the action shows in Recent Actions."""
-    User = get_user_model()
-    if request.user.is_authenticated:
-        actor_id = request.user.pk
-    else:
-        actor_id = User.objects.filter(is_superuser=True).values_list("pk", flat=True).first()
-    if actor_id is None:
-        return
-    LogEntry.objects.log_action(
-        user_id=actor_id,
-        content_type_id=ContentType.objects.get_for_model(obj).pk,
-        object_id=obj.pk,
-        object_repr=str(obj),
-        action_flag=action_flag,
-        change_message=message,
-    )
+REVIEWS_PER_PAGE = 12
 
 
+@vary_on_headers("X-Requested-With")
 def reviews_list(request):
     """
-    Public reviews page. Shows all approved reviews, newest first.
-    Calculates average rating and per-star breakdown for the chart.
+    Public reviews page. Shows approved reviews newest first, REVIEWS_PER_PAGE
+    at a time, under the cached average rating and per-star breakdown.
+    "Load more" fetches ``?after=<cursor>`` over AJAX and gets back the next
+    cards as an HTML fragment plus the cursor after them. Both answers share
+    a URL, so the response varies on X-Requested-With.
     """
-    reviews = Review.objects.filter(is_approved=True).select_related("user")
-    review_count = reviews.count()
-    avg_rating = None
-    star_breakdown = []  # [{star, count, pct}, ...]
-
-    if review_count:
-        total = sum(r.rating for r in reviews)
-        avg_rating = round(total / review_count, 1)
-        counts = {i: 0 for i in range(1, 6)}
-        for r in reviews:
-            counts[r.rating] += 1
-        star_breakdown = [
-            {"star": s, "count": counts[s], "pct": round(counts[s] / review_count * 100)}
-            for s in range(5, 0, -1)
-        ]
+    page = keyset_page(
+        Review.objects.filter(is_approved=True).select_related("user"),
+        request.GET.get("after"),
+        REVIEWS_PER_PAGE,
+    )
+    if request.headers.get("X-Requested-With") == "XMLHttpRequest":
+        return JsonResponse({
+            "html": render_to_string("reviews/_review_cards.html", {"reviews": page.items}, request=request),
+            "next": page.next_cursor,
+        })
+    summary = get_rating_summary()
 
     return render(request, "reviews/reviews.html", {
-        "reviews": reviews,
-        "avg_rating": avg_rating,
-        "review_count": review_count,
-        "star_breakdown": star_breakdown,
+        "reviews": page.items,
+        "page": page,
+        "avg_rating": summary["avg_rating"],
+        "review_count": summary["review_count"],
+        "star_breakdown": summary["star_breakdown"],
     })
 
 
@@ -88,8 +78,9 @@ def add_review(request, order_reference):
             review = form.save(commit=False)
             review.user = request.user
             review.order = order
-            review.save()
-            _log_admin_action(request, review, ADDITION, "Review submitted via website")
+            with transaction.atomic():
+                review.save()
+                enqueue_admin_log(request, review, ADDITION, "Review submitted via website")
             messages.success(
                 request,
                 "Thanks for your review! It will appear once our team approves it."
@@ -122,8 +113,9 @@ def guest_review(request):
             review = form.save(commit=False)
             review.user = request.user if request.user.is_authenticated else None
             review.order = order
-            review.save()
-            _log_admin_action(request, review, ADDITION, "Guest review submitted via website")
+            with transaction.atomic():
+                review.save()
+                enqueue_admin_log(request, review, ADDITION, "Guest review submitted via website")
             # Clear session keys
             request.session.pop("guest_review_ref", None)
             request.session.pop("guest_review_email", None)
@@ -143,6 +135,12 @@ def guest_review(request):
     # Step 1: lookup form submission
     if request.method == "POST":
         lookup_form = ReceiptLookupForm(request.POST)
+        # Limit reference/email guessing
+        if is_rate_limited(request, "guest_review_lookup", limit=10, period=60):
+            messages.error(request, "Too many lookups. Please wait a minute and try again.")
+            return render(request, "reviews/guest_review.html", {
+                "lookup_form": lookup_form, "step": 1,
+            })
         if lookup_form.is_valid():
             ref = lookup_form.cleaned_data["reference"].upper().strip()
             email = lookup_form.cleaned_data["email"].lower().strip()
@@ -284,7 +282,7 @@ def delete_reply(request, pk):
         review.owner_reply = ""
         review.owner_reply_at = None
         review.save(update_fields=["owner_reply", "owner_reply_at"])
-        _log_admin_action(request, review, CHANGE, "Owner reply deleted via website")
+        enqueue_admin_log(request, review, CHANGE, "Owner reply deleted via website")
         messages.success(request, "Reply removed.")
 
     return redirect("reviews:list")
@@ -299,7 +297,7 @@ def staff_delete_review(request, pk):
     review = get_object_or_404(Review, pk=pk)
 
     if request.method == "POST":
-        _log_admin_action(request, review, DELETION, "Review deleted by staff via website")
+        enqueue_admin_log(request, review, DELETION, "Review deleted by staff via website")
         review.delete()
         messages.success(request, "Review deleted.")
         return redirect("reviews:list")
@@ -234,6 +234,37 @@ document.addEventListener('DOMContentLoaded', function () {
         });
     }
 
+    // -----------------------------------------------------------------------
+    // "Load more" (order history, reviews) — appends the next page of cards
+    // -----------------------------------------------------------------------
+    document.querySelectorAll('[data-load-more]').forEach(function (btn) {
+        const list = document.querySelector(btn.dataset.loadMore);
+        if (!list) { return; }
+
+        btn.addEventListener('click', function (e) {
+            e.preventDefault();
+            if (btn.classList.contains('disabled')) { return; }
+            btn.classList.add('disabled');
+
+            fetch(btn.href, { headers: { 'X-Requested-With': 'XMLHttpRequest' } })
+            .then(function (r) { return r.json(); })
+            .then(function (data) {
+                list.insertAdjacentHTML('beforeend', data.html);
+                if (data.next) {
+                    const url = new URL(btn.href);
+                    url.searchParams.set('after', data.next);
+                    btn.href = url.toString();
+                    btn.classList.remove('disabled');
+                } else {
+                    btn.parentElement.remove();
+                }
+            })
+            .catch(function () {
+                btn.classList.remove('disabled');
+            });
+        });
+    });
+
     // -----------------------------------------------------------------------
     // Cookie / GDPR consent banner
     // -----------------------------------------------------------------------